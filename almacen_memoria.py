@@ -0,0 +1,261 @@
+"""
+Este módulo implementa el motor de almacenamiento 'python' (ver database.configurar_backend):
+guarda usuarios, categorías y productos en diccionarios, con índices en memoria para las
+consultas de la interfaz CRUD (SKU, stock bajo y orden por nombre). No escribe en disco,
+por lo que sirve para pruebas rápidas (ver conformidad.py) y como caché del catálogo.
+Las demás funciones de database.py (historial, ubicaciones, lotes, etc.) necesitan SQLite.
+"""
+import bisect
+import copy
+import itertools
+import re
+import threading
+
+from colorama import Fore, Style
+
+import database
+
+
+def _patron_like(texto):
+    """
+    Traduce la búsqueda parcial de database.buscar_productos_en (LOWER(columna) LIKE '%texto%')
+    a una expresión regular con el mismo comportamiento: '%' y '_' son comodines y las
+    mayúsculas solo se ignoran en letras ASCII, igual que en SQLite.
+    """
+    partes = ('.*' if caracter == '%' else '.' if caracter == '_' else re.escape(caracter)
+              for caracter in f'%{texto.lower()}%')
+    return re.compile(''.join(partes), re.IGNORECASE | re.ASCII | re.DOTALL)
+
+
+class AlmacenMemoria:
+    """
+    Catálogo en memoria con el mismo contrato que las funciones CRUD de database.py
+    (mismos argumentos, valores de retorno y formatos de fila). Los productos se guardan
+    como listas [nombre, descripcion, cantidad, precio, categoria, sku] por ID, con listas
+    ordenadas (bisect) por (cantidad, nombre, id) y por (nombre, id), y un diccionario por SKU.
+    """
+
+    def __init__(self):
+        self._bloqueo = threading.RLock()
+        self._usuarios = {}
+        self._categorias = set()
+        self._productos = {}
+        self._por_sku = {}
+        self._por_cantidad = []
+        self._por_nombre = []
+        self._ids = itertools.count(1)
+
+    # --- Índices ---
+
+    def _indexar(self, id_producto, datos):
+        bisect.insort(self._por_cantidad, (datos[2], datos[0], id_producto))
+        bisect.insort(self._por_nombre, (datos[0], id_producto))
+        if datos[5] is not None:
+            self._por_sku[datos[5]] = id_producto
+
+    def _desindexar(self, id_producto, datos):
+        del self._por_cantidad[bisect.bisect_left(self._por_cantidad, (datos[2], datos[0], id_producto))]
+        del self._por_nombre[bisect.bisect_left(self._por_nombre, (datos[0], id_producto))]
+        if datos[5] is not None:
+            del self._por_sku[datos[5]]
+
+    def _fila(self, id_producto, formato):
+        datos = self._productos[id_producto]
+        if formato == 'tupla':
+            return (id_producto, *datos[:5])
+        if formato not in database.FORMATOS_FILA:
+            raise ValueError(f"Formato de fila desconocido: '{formato}'. Use uno de {database.FORMATOS_FILA}.")
+        # Producto admite acceso por clave e índice, como sqlite3.Row
+        return database.Producto(id_producto, *datos[:5])
+
+    # --- Esquema ---
+
+    def crear_tablas(self):
+        """Inicializa el almacén con las categorías por defecto (si no hay ninguna)."""
+        with self._bloqueo:
+            if not self._categorias:
+                self._categorias.update(database.CATEGORIAS_DEFECTO)
+        print(Fore.GREEN + "✅ Almacén en memoria (backend 'python') inicializado." + Style.RESET_ALL)
+
+    def cargar_productos(self, filas):
+        """
+        Carga productos en bloque, sin mensajes por producto (por ejemplo, para usar el
+        almacén como caché de una base SQLite). 'filas' son tuplas
+        (nombre, descripcion, cantidad, precio, categoria[, sku]). Retorna la cantidad cargada.
+        """
+        cargados = 0
+        with self._bloqueo:
+            for fila in filas:
+                datos = list(fila) + [None] * (6 - len(fila))
+                id_producto = next(self._ids)
+                self._productos[id_producto] = datos
+                self._indexar(id_producto, datos)
+                cargados += 1
+        return cargados
+
+    def instantanea(self):
+        """Copia del estado del almacén (ver restaurar); los IDs ya entregados no se reutilizan."""
+        with self._bloqueo:
+            return copy.deepcopy((self._usuarios, self._categorias, self._productos,
+                                  self._por_sku, self._por_cantidad, self._por_nombre))
+
+    def restaurar(self, instantanea):
+        """Vuelve al estado guardado con instantanea(), que no debe usarse de nuevo (ver database.Transaccion)."""
+        with self._bloqueo:
+            (self._usuarios, self._categorias, self._productos,
+             self._por_sku, self._por_cantidad, self._por_nombre) = instantanea
+
+    # --- Usuarios ---
+
+    def agregar_usuario(self, nombre_usuario, contrasena):
+        contrasena_hash = database.hash_contrasena(contrasena)
+        with self._bloqueo:
+            if nombre_usuario in self._usuarios:
+                print(Fore.RED + f"❌ Error: El nombre de usuario '{nombre_usuario}' ya existe." + Style.RESET_ALL)
+                return False
+            self._usuarios[nombre_usuario] = contrasena_hash
+        print(Fore.GREEN + f"✅ Usuario '{nombre_usuario}' agregado exitosamente." + Style.RESET_ALL)
+        return True
+
+    def obtener_usuario(self, nombre_usuario, contrasena):
+        with self._bloqueo:
+            guardada = self._usuarios.get(nombre_usuario)
+        correcta, actualizar = database.verificar_contrasena(contrasena, guardada)
+        if not correcta:
+            return None
+        if actualizar:
+            contrasena_hash = database.hash_contrasena(contrasena)
+            with self._bloqueo:
+                if nombre_usuario in self._usuarios:
+                    self._usuarios[nombre_usuario] = contrasena_hash
+        return nombre_usuario
+
+    def obtener_todos_los_usuarios(self):
+        with self._bloqueo:
+            return [{'nombre_usuario': nombre} for nombre in self._usuarios]
+
+    def eliminar_todos_los_usuarios(self):
+        with self._bloqueo:
+            self._usuarios.clear()
+        print(Fore.YELLOW + "🗑️ Todos los usuarios eliminados exitosamente." + Style.RESET_ALL)
+        return True
+
+    # --- Productos ---
+
+    def agregar_producto(self, nombre, descripcion, cantidad, precio, categoria):
+        if not isinstance(precio, int):
+            print(Fore.RED + f"❌ Error al agregar producto: el precio debe estar en centavos enteros, se recibió {precio!r}." + Style.RESET_ALL)
+            return None
+        if None in (nombre, cantidad, categoria):
+            print(Fore.RED + "❌ Error al agregar producto: nombre, cantidad y categoría son obligatorios." + Style.RESET_ALL)
+            return None
+        with self._bloqueo:
+            id_producto = next(self._ids)
+            datos = [nombre, descripcion, cantidad, precio, categoria, None]
+            self._productos[id_producto] = datos
+            self._indexar(id_producto, datos)
+        print(Fore.GREEN + f"✅ Producto '{nombre}' agregado exitosamente con ID {id_producto}." + Style.RESET_ALL)
+        database._notificar_productos(id_producto, None, (nombre, categoria))
+        return id_producto
+
+    def obtener_todos_los_productos(self, formato='row'):
+        with self._bloqueo:
+            return [self._fila(id_producto, formato) for _, id_producto in self._por_nombre]
+
+    def obtener_producto_por_id_nombre_o_categoria(self, termino_busqueda, formato='row'):
+        with self._bloqueo:
+            ids = []
+            if termino_busqueda in self._por_sku:
+                ids.append(self._por_sku[termino_busqueda])
+            if termino_busqueda.isdigit() and int(termino_busqueda) in self._productos:
+                ids.append(int(termino_busqueda))
+            patron = _patron_like(termino_busqueda)
+            for columna in (0, 4): # Nombre y categoría, en orden de ID como el recorrido de la tabla
+                ids.extend(id_producto for id_producto, datos in self._productos.items()
+                           if datos[columna] is not None and patron.fullmatch(datos[columna]))
+            return [self._fila(id_producto, formato) for id_producto in dict.fromkeys(ids)]
+
+    def actualizar_producto(self, id_producto, nuevo_nombre, nueva_descripcion, nueva_cantidad, nuevo_precio, nueva_categoria):
+        if not isinstance(nuevo_precio, int):
+            print(Fore.RED + f"❌ Error al actualizar producto con ID {id_producto}: el precio debe estar en centavos enteros, se recibió {nuevo_precio!r}." + Style.RESET_ALL)
+            return False
+        with self._bloqueo:
+            datos = self._productos.get(id_producto)
+            if datos is None:
+                print(Fore.YELLOW + f"⚠ No se encontró ningún producto con el ID {id_producto} para actualizar." + Style.RESET_ALL)
+                return False
+            anterior = (datos[0], datos[4])
+            self._desindexar(id_producto, datos)
+            datos[:5] = [nuevo_nombre, nueva_descripcion, nueva_cantidad, nuevo_precio, nueva_categoria]
+            self._indexar(id_producto, datos)
+        print(Fore.GREEN + f"✅ Producto con ID {id_producto} actualizado exitosamente." + Style.RESET_ALL)
+        database._notificar_productos(id_producto, anterior, (nuevo_nombre, nueva_categoria))
+        return True
+
+    def eliminar_producto(self, id_producto):
+        with self._bloqueo:
+            datos = self._productos.pop(id_producto, None)
+            if datos is None:
+                print(Fore.YELLOW + f"⚠ No se encontró ningún producto con el ID {id_producto} para eliminar." + Style.RESET_ALL)
+                return False
+            self._desindexar(id_producto, datos)
+        print(Fore.GREEN + f"✅ Producto '{datos[0]}' (ID: {id_producto}) eliminado exitosamente." + Style.RESET_ALL)
+        database._notificar_productos(id_producto, (datos[0], datos[4]), None)
+        return True
+
+    # --- SKU ---
+
+    def asignar_sku(self, id_producto, sku):
+        if sku is not None:
+            sku = sku.strip() or None
+        with self._bloqueo:
+            datos = self._productos.get(id_producto)
+            if datos is None:
+                print(Fore.YELLOW + f"⚠ No se encontró ningún producto con el ID {id_producto} para asignar el SKU." + Style.RESET_ALL)
+                return False
+            if sku is not None and self._por_sku.get(sku, id_producto) != id_producto:
+                print(Fore.RED + f"❌ Error: el SKU '{sku}' ya está asignado a otro producto." + Style.RESET_ALL)
+                return False
+            if datos[5] is not None:
+                del self._por_sku[datos[5]]
+            datos[5] = sku
+            if sku is not None:
+                self._por_sku[sku] = id_producto
+        print(Fore.GREEN + f"✅ SKU del producto con ID {id_producto} actualizado a '{sku or '(ninguno)'}'." + Style.RESET_ALL)
+        return True
+
+    def obtener_producto_por_sku(self, sku, formato='row'):
+        with self._bloqueo:
+            id_producto = self._por_sku.get(sku)
+            return None if id_producto is None else self._fila(id_producto, formato)
+
+    def incrementar_stock_por_sku(self, conteos):
+        if not conteos:
+            return []
+        with self._bloqueo:
+            desconocidos = [sku for sku in conteos if sku not in self._por_sku]
+            for sku, unidades in conteos.items():
+                if sku in self._por_sku:
+                    id_producto = self._por_sku[sku]
+                    datos = self._productos[id_producto]
+                    self._desindexar(id_producto, datos)
+                    datos[2] += unidades
+                    self._indexar(id_producto, datos)
+        print(Fore.GREEN + f"✅ Stock incrementado en {len(conteos) - len(desconocidos)} producto(s)." + Style.RESET_ALL)
+        return desconocidos
+
+    # --- Reportes y categorías ---
+
+    def obtener_productos_por_cantidad_limite(self, limite_cantidad, formato='row'):
+        with self._bloqueo:
+            fin = bisect.bisect_right(self._por_cantidad, limite_cantidad, key=lambda clave: clave[0])
+            return [self._fila(id_producto, formato) for _, _, id_producto in self._por_cantidad[:fin]]
+
+    def obtener_categorias(self):
+        with self._bloqueo:
+            return sorted(self._categorias)
+
+    def agregar_categoria(self, nombre_categoria):
+        with self._bloqueo:
+            self._categorias.add(nombre_categoria)
+        return True
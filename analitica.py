@@ -0,0 +1,303 @@
+"""
+Este módulo calcula los reportes avanzados de inventario con NumPy:
+clasificación ABC (Pareto) por valor de stock, percentiles de precio,
+distribución del valor de stock y estadísticas por categoría.
+Los datos (cantidad, precio e ID de categoría) se leen de la base en lotes de
+columnas que se convierten directamente en arreglos NumPy, y todos los reportes
+se acumulan en una sola pasada con memoria acotada: los percentiles y la
+clasificación ABC se obtienen de histogramas logarítmicos de tamaño fijo
+(BINS_POR_DECADA bins por cada potencia de 10, error relativo menor al 1.2%).
+"""
+import sqlite3
+
+from colorama import Fore, Style, init
+
+import database
+
+try:
+    import numpy as np
+except ImportError:  # NumPy es opcional: solo lo necesitan los reportes avanzados
+    np = None
+
+# Inicializar colorama para mensajes de consola
+init(autoreset=True)
+
+# Filas leídas de la base por lote
+TAMANO_LOTE = 65536
+# Resolución y rango de los histogramas logarítmicos (de 10^DECADA_MIN a 10^DECADA_MAX)
+BINS_POR_DECADA = 200
+DECADA_MIN = -2
+DECADA_MAX = 9
+# Límites de valor acumulado de las clases A y B (el resto es C)
+LIMITE_CLASE_A = 0.80
+LIMITE_CLASE_B = 0.95
+# Rangos de la distribución del valor de stock (cantidad * precio), en pesos
+RANGOS_VALOR = (0, 10, 100, 1000, 10000, 100000)
+# Percentiles de precio que se informan
+PERCENTILES_PRECIO = (10, 25, 50, 75, 90, 99)
+
+
+class _HistogramaLog:
+    """Histograma logarítmico de tamaño fijo que acumula cantidad y suma por bin."""
+
+    def __init__(self):
+        self.bordes = np.logspace(DECADA_MIN, DECADA_MAX, (DECADA_MAX - DECADA_MIN) * BINS_POR_DECADA + 1)
+        # Bin 0: valores menores al primer borde (incluye el 0); último bin: mayores o iguales al último
+        self.cuentas = np.zeros(len(self.bordes) + 1, dtype=np.int64)
+        self.sumas = np.zeros(len(self.bordes) + 1, dtype=np.float64)
+        self.minimo = np.inf
+        self.maximo = -np.inf
+
+    def agregar(self, valores):
+        indices = np.searchsorted(self.bordes, valores, side='right')
+        self.cuentas += np.bincount(indices, minlength=len(self.cuentas))
+        self.sumas += np.bincount(indices, weights=valores, minlength=len(self.sumas))
+        self.minimo = min(self.minimo, float(valores.min()))
+        self.maximo = max(self.maximo, float(valores.max()))
+
+    def limites_bin(self, i):
+        inferior = self.bordes[i - 1] if i > 0 else self.minimo
+        superior = self.bordes[i] if i < len(self.bordes) else self.maximo
+        return max(inferior, self.minimo), min(superior, self.maximo)
+
+    def percentil(self, p):
+        acumulado = np.cumsum(self.cuentas)
+        objetivo = p / 100 * acumulado[-1]
+        i = int(np.searchsorted(acumulado, objetivo))
+        inferior, superior = self.limites_bin(i)
+        anteriores = acumulado[i - 1] if i > 0 else 0
+        fraccion = (objetivo - anteriores) / self.cuentas[i] if self.cuentas[i] else 0.0
+        return inferior + (superior - inferior) * fraccion
+
+
+def _nombres_categorias(conn):
+    """Diccionario {id: nombre} de la tabla categorias (0 = categoría no registrada)."""
+    nombres = {0: '(sin registrar)'}
+    for id_categoria, nombre in conn.execute("SELECT id, nombre FROM categorias"):
+        nombres[id_categoria] = nombre
+    return nombres
+
+
+def _ampliar(arreglo, tamano, relleno=0.0):
+    """Agranda un arreglo por categoría cuando aparece un ID mayor a los vistos."""
+    if len(arreglo) >= tamano:
+        return arreglo
+    return np.concatenate([arreglo, np.full(tamano - len(arreglo), relleno, dtype=arreglo.dtype)])
+
+
+def calcular_reportes(tamano_lote=TAMANO_LOTE):
+    """
+    Recorre los productos una sola vez, en lotes, y calcula todos los reportes avanzados.
+    Retorna un diccionario con los reportes, o None si no hay productos o hubo un error.
+    """
+    if np is None:
+        print(Fore.RED + "❌ Los reportes avanzados requieren NumPy. Instálelo con: pip install numpy" + Style.RESET_ALL)
+        return None
+    conn = database.tomar_conexion_lectura()
+    if conn is None:
+        return None
+    try:
+        nombres = _nombres_categorias(conn)
+        cursor = database.aplicar_formato(conn.cursor(), 'tupla')
+        cursor.execute('''
+            SELECT p.cantidad, p.precio, COALESCE(c.id, 0)
+            FROM productos p LEFT JOIN categorias c ON c.nombre = p.categoria
+        ''')
+
+        # Los precios y valores se acumulan en centavos enteros (int64), así los totales
+        # son exactos; los histogramas (aproximados por diseño) trabajan en pesos.
+        hist_precio = _HistogramaLog()
+        hist_valor = _HistogramaLog()
+        cuentas_rango = np.zeros(len(RANGOS_VALOR), dtype=np.int64)
+        valor_rango = np.zeros(len(RANGOS_VALOR), dtype=np.int64)
+        bordes_rango = np.array(RANGOS_VALOR[1:], dtype=np.int64) * 100
+        cat_productos = np.zeros(0, dtype=np.int64)
+        cat_unidades = np.zeros(0, dtype=np.int64)
+        cat_valor = np.zeros(0, dtype=np.int64)
+        cat_suma_precio = np.zeros(0, dtype=np.int64)
+        cat_min_precio = np.zeros(0, dtype=np.int64)
+        cat_max_precio = np.zeros(0, dtype=np.int64)
+        total_productos = 0
+        valor_total = 0
+
+        while True:
+            filas = cursor.fetchmany(tamano_lote)
+            if not filas:
+                break
+            datos = np.array(filas, dtype=np.int64)
+            cantidad, precio = datos[:, 0], datos[:, 1]
+            categoria = datos[:, 2].astype(np.intp)
+            valor = cantidad * precio
+            total_productos += len(datos)
+            valor_total += int(valor.sum())
+
+            hist_precio.agregar(precio / 100)
+            hist_valor.agregar(valor / 100)
+
+            rango = np.searchsorted(bordes_rango, valor, side='right')
+            cuentas_rango += np.bincount(rango, minlength=len(RANGOS_VALOR))
+            np.add.at(valor_rango, rango, valor)
+
+            n = int(categoria.max()) + 1
+            cat_productos = _ampliar(cat_productos, n)
+            cat_unidades = _ampliar(cat_unidades, n)
+            cat_valor = _ampliar(cat_valor, n)
+            cat_suma_precio = _ampliar(cat_suma_precio, n)
+            cat_min_precio = _ampliar(cat_min_precio, n, np.iinfo(np.int64).max)
+            cat_max_precio = _ampliar(cat_max_precio, n, np.iinfo(np.int64).min)
+            n = len(cat_productos)
+            cat_productos += np.bincount(categoria, minlength=n)
+            np.add.at(cat_unidades, categoria, cantidad)
+            np.add.at(cat_valor, categoria, valor)
+            np.add.at(cat_suma_precio, categoria, precio)
+            np.minimum.at(cat_min_precio, categoria, precio)
+            np.maximum.at(cat_max_precio, categoria, precio)
+    except sqlite3.Error as e:
+        print(Fore.RED + f"❌ Error al calcular los reportes avanzados: {e}" + Style.RESET_ALL)
+        return None
+    finally:
+        database.devolver_conexion_lectura(conn)
+
+    if total_productos == 0:
+        return None
+
+    return {
+        'total_productos': total_productos,
+        'valor_total': database.a_pesos(valor_total),
+        'abc': _clasificacion_abc(hist_valor),
+        'percentiles_precio': {p: hist_precio.percentil(p) for p in PERCENTILES_PRECIO},
+        'precio_min': hist_precio.minimo,
+        'precio_max': hist_precio.maximo,
+        'distribucion_valor': [
+            (RANGOS_VALOR[i], RANGOS_VALOR[i + 1] if i + 1 < len(RANGOS_VALOR) else None,
+             int(cuentas_rango[i]), database.a_pesos(int(valor_rango[i])))
+            for i in range(len(RANGOS_VALOR))
+        ],
+        'categorias': sorted(
+            ({
+                'categoria': nombres.get(i, f"ID {i}"),
+                'productos': int(cat_productos[i]),
+                'unidades': int(cat_unidades[i]),
+                'valor': database.a_pesos(int(cat_valor[i])),
+                'precio_promedio': float(cat_suma_precio[i] / cat_productos[i] / 100),
+                'precio_min': database.a_pesos(int(cat_min_precio[i])),
+                'precio_max': database.a_pesos(int(cat_max_precio[i])),
+            } for i in np.nonzero(cat_productos)[0]),
+            key=lambda c: c['valor'], reverse=True),
+    }
+
+
+def _clasificacion_abc(hist_valor):
+    """
+    Clasificación ABC a partir del histograma de valor: recorriendo los bins de
+    mayor a menor valor, los productos que acumulan hasta LIMITE_CLASE_A del valor
+    total son A, hasta LIMITE_CLASE_B son B y el resto C.
+    """
+    total = hist_valor.sumas.sum()
+    acumulado_previo = np.cumsum(hist_valor.sumas[::-1])[::-1] - hist_valor.sumas  # Valor de los bins superiores
+    participacion = acumulado_previo / total if total else np.ones_like(acumulado_previo)
+    clases = np.where(participacion < LIMITE_CLASE_A, 0, np.where(participacion < LIMITE_CLASE_B, 1, 2))
+    clases[hist_valor.sumas == 0] = 2  # Productos sin valor de stock
+    resultado = {}
+    for numero, letra in enumerate('ABC'):
+        mascara = clases == numero
+        bins = np.nonzero(mascara & (hist_valor.cuentas > 0))[0]
+        resultado[letra] = {
+            'productos': int(hist_valor.cuentas[mascara].sum()),
+            'valor': float(hist_valor.sumas[mascara].sum()),
+            'valor_minimo': float(hist_valor.limites_bin(int(bins.min()))[0]) if len(bins) else 0.0,
+        }
+    return resultado
+
+
+def mostrar_abc(reportes):
+    """Imprime la clasificación ABC."""
+    print(Fore.CYAN + "\n--- Clasificación ABC (Pareto) por valor de stock ---" + Style.RESET_ALL)
+    total_productos, valor_total = reportes['total_productos'], float(reportes['valor_total']) or 1.0
+    print(f"{'Clase':<6} {'Productos':>10} {'% productos':>12} {'Valor':>16} {'% valor':>8} {'Valor desde':>12}")
+    for letra, datos in reportes['abc'].items():
+        print(f"{letra:<6} {datos['productos']:>10} {datos['productos'] / total_productos:>12.1%} "
+              f"${datos['valor']:>15,.2f} {datos['valor'] / valor_total:>8.1%} ${datos['valor_minimo']:>11,.2f}")
+
+
+def mostrar_percentiles_precio(reportes):
+    """Imprime los percentiles de precio."""
+    print(Fore.CYAN + "\n--- Percentiles de precio ---" + Style.RESET_ALL)
+    print(f"  Mínimo: ${reportes['precio_min']:,.2f}")
+    for p, valor in reportes['percentiles_precio'].items():
+        print(f"  P{p:<6} ${valor:,.2f}")
+    print(f"  Máximo: ${reportes['precio_max']:,.2f}")
+
+
+def mostrar_distribucion_valor(reportes):
+    """Imprime la distribución del valor de stock por rangos."""
+    print(Fore.CYAN + "\n--- Distribución del valor de stock (cantidad x precio) ---" + Style.RESET_ALL)
+    maximo = max(cuenta for _, _, cuenta, _ in reportes['distribucion_valor']) or 1
+    for desde, hasta, cuenta, valor in reportes['distribucion_valor']:
+        rango = f"${desde:,} - ${hasta:,}" if hasta is not None else f"más de ${desde:,}"
+        barra = '█' * round(30 * cuenta / maximo)
+        print(f"  {rango:<22} {cuenta:>9} productos  ${valor:>16,.2f}  {barra}")
+
+
+def mostrar_estadisticas_categoria(reportes):
+    """Imprime las estadísticas por categoría, ordenadas por valor de stock."""
+    print(Fore.CYAN + "\n--- Estadísticas por categoría ---" + Style.RESET_ALL)
+    print(f"{'Categoría':<22} {'Productos':>9} {'Unidades':>10} {'Valor':>16} {'P. prom.':>10} {'P. mín.':>9} {'P. máx.':>10}")
+    for cat in reportes['categorias']:
+        print(f"{cat['categoria'][:22]:<22} {cat['productos']:>9} {cat['unidades']:>10} ${cat['valor']:>15,.2f} "
+              f"${cat['precio_promedio']:>9,.2f} ${cat['precio_min']:>8,.2f} ${cat['precio_max']:>9,.2f}")
+
+
+def menu_reportes_avanzados():
+    """
+    Submenú de reportes avanzados. Calcula todos los reportes en una sola pasada
+    al entrar y permite consultarlos por separado.
+    """
+    print(Fore.CYAN + "\n--- Reportes Avanzados ---" + Style.RESET_ALL)
+    print("⏳ Calculando reportes...")
+    reportes = calcular_reportes()
+    if reportes is None:
+        print(Fore.YELLOW + "⚠ No hay productos para analizar." + Style.RESET_ALL)
+        return
+
+    opciones = {
+        1: mostrar_abc,
+        2: mostrar_percentiles_precio,
+        3: mostrar_distribucion_valor,
+        4: mostrar_estadisticas_categoria,
+    }
+    while True:
+        print(Fore.BLUE + "\n--- Menú de Reportes Avanzados ---" + Style.RESET_ALL)
+        print(f"Productos analizados: {reportes['total_productos']}  |  Valor total: ${reportes['valor_total']:,.2f}")
+        print("1. Clasificación ABC (Pareto)")
+        print("2. Percentiles de precio")
+        print("3. Distribución del valor de stock")
+        print("4. Estadísticas por categoría")
+        print("5. Todos los reportes")
+        print("6. Volver al menú principal")
+        opcion_str = input("👉 Selecciona una opción (1-6): ").strip()
+        try:
+            opcion = int(opcion_str)
+        except ValueError:
+            print(Fore.RED + "❌ Error: La opción debe ser un número entero." + Style.RESET_ALL)
+            continue
+
+        if opcion in opciones:
+            opciones[opcion](reportes)
+        elif opcion == 5:
+            for mostrar in opciones.values():
+                mostrar(reportes)
+        elif opcion == 6:
+            print(Fore.YELLOW + "🔙 Volviendo al menú principal..." + Style.RESET_ALL)
+            return
+        else:
+            print(Fore.RED + "❌ Opción inválida. Por favor, selecciona un número del 1 al 6." + Style.RESET_ALL)
+
+
+if __name__ == "__main__":
+    resultado = calcular_reportes()
+    if resultado:
+        mostrar_abc(resultado)
+        mostrar_percentiles_precio(resultado)
+        mostrar_distribucion_valor(resultado)
+        mostrar_estadisticas_categoria(resultado)
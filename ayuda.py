@@ -51,10 +51,24 @@ def mostrar_ayuda_general(): # Esta función muestra una guía general del uso d
     print("    Aquí podrás realizar todas las operaciones relacionadas con los productos:")
     print("    - ➕ Agregar Producto: Ingresa los detalles de un nuevo producto (nombre, descripción, cantidad, precio, categoría).")
     print("    - 👀 Ver Productos: Muestra una tabla con todos los productos registrados en tu inventario.")
-    print("    - 🔍 Buscar Producto: Busca productos por su ID, nombre (parcial) o categoría (parcial).")
+    print("    - 🔍 Buscar Producto: Busca productos por su SKU (código de barras), ID, nombre (parcial) o categoría (parcial).")
+    print("      Termine el texto con '*' (por ejemplo 'lec*') para ver sugerencias al instante y elegir una.")
     print("    - ✏️ Modificar Producto: Actualiza la información de un producto existente, identificándolo por su ID.")
     print("    - 🚫 Eliminar Producto: Borra un producto específico del inventario usando su ID.")
     print("    - 📈 Reporte de Stock Bajo: Genera una lista de productos cuya cantidad en stock es baja (definirás el límite).")
+    print("    - 📊 Reportes Avanzados: Clasificación ABC, percentiles de precio, distribución del valor de stock y estadísticas por categoría (requiere NumPy).")
+    print("    - 🧮 Actualización Masiva: Cambia el precio (porcentaje o monto), la categoría o el stock de todos los productos")
+    print("      que cumplen unos filtros (categoría, rango de precio, rango de stock) en una sola operación, con vista previa.")
+    print("    - 📦 Recepción por Escaneo: Escanee los códigos de barras de la mercadería recibida; cada lectura suma una")
+    print("      unidad al stock del producto con ese SKU. Termine con una línea vacía o 'fin'.")
+    print("    - 🕒 Historial de Precios: Muestra los precios que tuvo un producto y el vigente a una fecha (AAAA-MM-DD),")
+    print("      o el catálogo completo con los precios de esa fecha.")
+    print("    - 🏬 Stock por Ubicación: Muestra el stock de cada ubicación (salón, trastienda, depósito) o el desglose de")
+    print("      un producto, y transfiere stock entre ubicaciones (varios productos a la vez, todo o nada). El stock que")
+    print("      se carga al agregar, modificar o recibir un producto queda en la ubicación predeterminada (Salón de ventas).")
+    print("    - 📅 Lotes y Vencimientos: Registre los lotes recibidos con su fecha de vencimiento, vea los lotes de un")
+    print("      producto y los que vencen en los próximos N días. Toda salida de stock consume primero los lotes que")
+    print("      vencen antes; al agregar un producto perecedero se le pide el vencimiento del stock inicial.")
     print("    - 🚪 Salir: Cierra la aplicación de forma segura.")
     print("\n")
     print(Style.BRIGHT + Fore.GREEN + "3.  Registro de Actividad (log.txt):" + Style.RESET_ALL)
@@ -0,0 +1,217 @@
+"""
+Este módulo ofrece la lectura del registro de cambios (change data capture) de
+productos y categorías. Los triggers definidos en database.crear_tablas anotan
+cada alta, modificación y baja en la tabla 'cambios' con un número de secuencia
+creciente; los sistemas externos (tienda online, exportación contable) leen los
+cambios posteriores a la última secuencia que procesaron, en lotes, en lugar de
+releer y comparar todo el catálogo. Cada consumidor registra hasta dónde leyó y
+la compactación borra las entradas que ya procesaron todos.
+"""
+import argparse
+import sqlite3
+
+from colorama import Fore, Style, init
+
+import database
+
+# Inicializar colorama para mensajes de consola
+init(autoreset=True)
+
+# Cambios que se entregan por lote
+TAMANO_LOTE = 1000
+
+
+def leer_cambios(desde_secuencia=0, tamano_lote=TAMANO_LOTE, tabla=None, con_datos=False):
+    """
+    Generador que entrega, en lotes (listas de diccionarios), los cambios con
+    secuencia mayor a 'desde_secuencia', en orden. Cada cambio tiene 'secuencia',
+    'tabla', 'operacion' ('I', 'U' o 'D'), 'registro_id', 'columnas' (lista de las
+    columnas modificadas, solo en 'U') y 'fecha'.
+    Con con_datos=True agrega 'datos': la fila actual del registro (None si ya no existe).
+    Cada lote es una búsqueda por la clave primaria: el costo depende de la cantidad
+    de cambios y no del tamaño del catálogo.
+    """
+    ultima = desde_secuencia
+    while True:
+        conn = database.tomar_conexion_lectura()
+        if conn is None:
+            return
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT secuencia, tabla, operacion, registro_id, columnas, fecha FROM cambios
+                WHERE secuencia > ? AND (? IS NULL OR tabla = ?)
+                ORDER BY secuencia LIMIT ?
+            ''', (ultima, tabla, tabla, tamano_lote))
+            lote = [{
+                'secuencia': fila['secuencia'],
+                'tabla': fila['tabla'],
+                'operacion': fila['operacion'],
+                'registro_id': fila['registro_id'],
+                'columnas': fila['columnas'].split(',') if fila['columnas'] else [],
+                'fecha': fila['fecha'],
+            } for fila in cursor.fetchall()]
+            if con_datos and lote:
+                _agregar_datos_actuales(cursor, lote)
+        except sqlite3.Error as e:
+            print(Fore.RED + f"❌ Error al leer el registro de cambios: {e}" + Style.RESET_ALL)
+            return
+        finally:
+            database.devolver_conexion_lectura(conn)
+        if not lote:
+            return
+        ultima = lote[-1]['secuencia']
+        yield lote
+        if len(lote) < tamano_lote:
+            return
+
+
+def _agregar_datos_actuales(cursor, lote):
+    """Completa cada cambio del lote con la fila actual de su registro (una consulta por tabla)."""
+    for tabla in {cambio['tabla'] for cambio in lote}:
+        ids = sorted({cambio['registro_id'] for cambio in lote if cambio['tabla'] == tabla})
+        marcadores = ", ".join("?" * len(ids))
+        cursor.execute(f"SELECT * FROM {tabla} WHERE id IN ({marcadores})", ids)
+        filas = {fila['id']: dict(fila) for fila in cursor.fetchall()}
+        for cambio in lote:
+            if cambio['tabla'] == tabla:
+                cambio['datos'] = filas.get(cambio['registro_id'])
+
+
+def ultima_secuencia():
+    """Retorna la secuencia del cambio más reciente (0 si no hay cambios)."""
+    conn = database.tomar_conexion_lectura()
+    if conn is None:
+        return 0
+    try:
+        fila = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'cambios'").fetchone()
+        return fila['seq'] if fila else 0
+    except sqlite3.Error as e:
+        print(Fore.RED + f"❌ Error al obtener la última secuencia: {e}" + Style.RESET_ALL)
+        return 0
+    finally:
+        database.devolver_conexion_lectura(conn)
+
+
+def obtener_posicion_consumidor(consumidor):
+    """Retorna la última secuencia confirmada por un consumidor (0 si es nuevo)."""
+    conn = database.tomar_conexion_lectura()
+    if conn is None:
+        return 0
+    try:
+        fila = conn.execute("SELECT ultima_secuencia FROM consumidores_cambios WHERE nombre = ?", (consumidor,)).fetchone()
+        return fila['ultima_secuencia'] if fila else 0
+    except sqlite3.Error as e:
+        print(Fore.RED + f"❌ Error al obtener la posición del consumidor '{consumidor}': {e}" + Style.RESET_ALL)
+        return 0
+    finally:
+        database.devolver_conexion_lectura(conn)
+
+
+def confirmar_cambios(consumidor, secuencia):
+    """
+    Registra que 'consumidor' procesó todos los cambios hasta 'secuencia' inclusive.
+    La posición nunca retrocede. Retorna True si la operación fue exitosa.
+    """
+    conn = database.conectar_db()
+    if conn:
+        try:
+            database.iniciar_escritura(conn)
+            conn.execute('''
+                INSERT INTO consumidores_cambios (nombre, ultima_secuencia) VALUES (?, ?)
+                ON CONFLICT(nombre) DO UPDATE SET ultima_secuencia = MAX(ultima_secuencia, excluded.ultima_secuencia)
+            ''', (consumidor, secuencia))
+            conn.commit()
+            return True
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(Fore.RED + f"❌ Error al confirmar cambios de '{consumidor}': {e} (transacción revertida)." + Style.RESET_ALL)
+            return False
+        finally:
+            conn.close()
+    return False
+
+
+def consumir_cambios(consumidor, procesar, tamano_lote=TAMANO_LOTE, con_datos=True):
+    """
+    Entrega a 'procesar(lote)' los cambios pendientes del consumidor y confirma
+    cada lote después de procesarlo (si 'procesar' lanza una excepción, el lote
+    no se confirma y se volverá a entregar). Retorna la cantidad de cambios procesados.
+    """
+    procesados = 0
+    for lote in leer_cambios(obtener_posicion_consumidor(consumidor), tamano_lote, con_datos=con_datos):
+        procesar(lote)
+        confirmar_cambios(consumidor, lote[-1]['secuencia'])
+        procesados += len(lote)
+    return procesados
+
+
+def quitar_consumidor(consumidor):
+    """Elimina un consumidor para que deje de retener cambios en la compactación."""
+    conn = database.conectar_db()
+    if conn:
+        try:
+            database.iniciar_escritura(conn)
+            cursor = conn.execute("DELETE FROM consumidores_cambios WHERE nombre = ?", (consumidor,))
+            conn.commit()
+            return cursor.rowcount > 0
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(Fore.RED + f"❌ Error al quitar el consumidor '{consumidor}': {e} (transacción revertida)." + Style.RESET_ALL)
+            return False
+        finally:
+            conn.close()
+    return False
+
+
+def compactar_cambios():
+    """
+    Borra los cambios que ya confirmaron todos los consumidores registrados.
+    Si no hay consumidores no se borra nada. Retorna la cantidad de cambios borrados.
+    """
+    conn = database.conectar_db()
+    if conn:
+        try:
+            database.iniciar_escritura(conn)
+            cursor = conn.execute('''
+                DELETE FROM cambios
+                WHERE secuencia <= (SELECT MIN(ultima_secuencia) FROM consumidores_cambios)
+            ''')
+            conn.commit()
+            print(Fore.GREEN + f"🧹 {cursor.rowcount} cambio(s) ya consumido(s) eliminado(s) (transacción confirmada)." + Style.RESET_ALL)
+            return cursor.rowcount
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(Fore.RED + f"❌ Error al compactar el registro de cambios: {e} (transacción revertida)." + Style.RESET_ALL)
+            return 0
+        finally:
+            conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Registro de cambios de productos y categorías.")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+    p = subparsers.add_parser('leer', help="Muestra los cambios posteriores a una secuencia")
+    p.add_argument('--desde', type=int, default=0)
+    p.add_argument('--tabla', choices=sorted(database.COLUMNAS_CAMBIOS))
+    p = subparsers.add_parser('consumir', help="Muestra y confirma los cambios pendientes de un consumidor")
+    p.add_argument('consumidor')
+    p = subparsers.add_parser('quitar', help="Quita un consumidor")
+    p.add_argument('consumidor')
+    subparsers.add_parser('compactar', help="Borra los cambios ya consumidos por todos")
+    args = parser.parse_args()
+
+    if args.comando == 'leer':
+        for lote in leer_cambios(args.desde, tabla=args.tabla):
+            for cambio in lote:
+                columnas = f" ({', '.join(cambio['columnas'])})" if cambio['columnas'] else ""
+                print(f"  #{cambio['secuencia']} {cambio['fecha']} {cambio['operacion']} {cambio['tabla']} {cambio['registro_id']}{columnas}")
+        print(f"Última secuencia: {ultima_secuencia()}")
+    elif args.comando == 'consumir':
+        total = consumir_cambios(args.consumidor, lambda lote: [print(f"  #{c['secuencia']} {c['operacion']} {c['tabla']} {c['registro_id']}: {c['datos']}") for c in lote])
+        print(Fore.GREEN + f"✅ {total} cambio(s) procesado(s) por '{args.consumidor}'." + Style.RESET_ALL)
+    elif args.comando == 'quitar':
+        quitar_consumidor(args.consumidor)
+    elif args.comando == 'compactar':
+        compactar_cambios()
@@ -0,0 +1,295 @@
+"""
+Este módulo verifica que los tres motores de almacenamiento de database.py ('archivo',
+'memoria' y 'python') cumplan el mismo contrato en la interfaz CRUD: valores de retorno,
+orden de los resultados, formatos de fila, unicidad del SKU, IDs que no se reutilizan,
+transacciones agrupadas, contraseñas con hash y avisos a los observadores. Cada caso
+empieza con un almacén vacío; el motor 'archivo' usa una base temporal, por lo que
+nunca modifica 'inventario.db'. Los casos marcados con @caso_sqlite cubren funciones que
+solo existen con SQLite (por ejemplo, el stock por ubicación) y no se ejecutan con 'python'.
+Uso: python conformidad.py [archivo|memoria|python ...]   (sin argumentos, todos)
+"""
+import argparse
+import contextlib
+import os
+import sys
+import tempfile
+import traceback
+
+from colorama import Fore, Style, init
+
+import database
+
+# Inicializar colorama para mensajes de consola
+init(autoreset=True)
+
+# Casos de la verificación, en el orden en que se ejecutan (ver @caso)
+CASOS = []
+
+
+def caso(funcion):
+    """Registra una función sin argumentos como caso de la verificación."""
+    CASOS.append(funcion)
+    return funcion
+
+
+def caso_sqlite(funcion):
+    """Registra un caso que solo aplica a los motores SQLite ('archivo' y 'memoria')."""
+    funcion.solo_sqlite = True
+    return caso(funcion)
+
+
+def casos_de(backend):
+    """Casos que aplican al motor indicado, en orden."""
+    return [funcion for funcion in CASOS if backend != 'python' or not getattr(funcion, 'solo_sqlite', False)]
+
+
+@contextlib.contextmanager
+def almacen_vacio(backend):
+    """Configura el motor indicado con un almacén vacío (y tablas creadas) mientras dura el bloque 'with'."""
+    archivo_original, backend_original = database.ARCHIVO_DB, database.BACKEND
+    with tempfile.TemporaryDirectory() as directorio:
+        database.ARCHIVO_DB = os.path.join(directorio, 'inventario.db')
+        try:
+            database.configurar_backend(backend)
+            database.crear_tablas()
+            yield
+        finally:
+            database.configurar_backend(backend_original)
+            database.ARCHIVO_DB = archivo_original
+
+
+def _catalogo():
+    """Carga un catálogo pequeño y retorna los IDs en orden de alta."""
+    return [database.agregar_producto(*datos) for datos in (
+        ("Manzana roja", "Fruta fresca", 30, 250, "Fruta"),
+        ("Leche entera", "1 litro", 5, 180, "Lácteo"),
+        ("Pan integral", "500 g", 5, 320, "Panaderia"),
+        ("Banana", "Por kilo", 0, 199, "Fruta"),
+        ("Yogur de frutilla", "Lácteo bebible", 12, 150, "Lácteo"),
+    )]
+
+
+@caso
+def altas_y_listado():
+    ids = _catalogo()
+    assert ids == sorted(ids) and len(set(ids)) == 5, f"IDs de alta inesperados: {ids}"
+    nombres = [fila['nombre'] for fila in database.obtener_todos_los_productos()]
+    assert nombres == sorted(nombres), f"el listado no está ordenado por nombre: {nombres}"
+    fila = database.obtener_todos_los_productos()[0]
+    assert fila[1] == fila['nombre'] == "Banana" and fila['precio'] == 199, "acceso por índice y por clave"
+
+
+@caso
+def formatos_de_fila():
+    _catalogo()
+    filas = database.obtener_todos_los_productos(formato='tupla')
+    assert all(isinstance(fila, tuple) for fila in filas), "formato 'tupla'"
+    productos = database.obtener_todos_los_productos(formato='producto')
+    assert [(p.id, p.nombre, p.descripcion, p.cantidad, p.precio, p.categoria) for p in productos] == filas, "formato 'producto'"
+    assert [tuple(fila) for fila in database.obtener_todos_los_productos()] == filas, "formato 'row'"
+
+
+@caso
+def precio_no_entero_rechazado():
+    assert database.agregar_producto("Queso", "Por kilo", 3, 12.5, "Lácteo") is None, "se aceptó un precio en pesos"
+    assert database.obtener_todos_los_productos() == [], "el alta rechazada dejó datos"
+    id_producto = database.agregar_producto("Queso", "Por kilo", 3, 1250, "Lácteo")
+    assert database.actualizar_producto(id_producto, "Queso", "Por kilo", 3, 12.5, "Lácteo") is False
+
+
+@caso
+def busqueda():
+    ids = _catalogo()
+    encontrados = [fila['id'] for fila in database.obtener_producto_por_id_nombre_o_categoria("LÁCTEO".lower())]
+    assert encontrados == [ids[1], ids[4]], f"búsqueda por categoría: {encontrados}"
+    encontrados = [fila['id'] for fila in database.obtener_producto_por_id_nombre_o_categoria("PAN")]
+    assert encontrados == [ids[2]], f"búsqueda sin distinguir mayúsculas: {encontrados}"
+    encontrados = [fila['id'] for fila in database.obtener_producto_por_id_nombre_o_categoria(str(ids[3]))]
+    assert encontrados[0] == ids[3], f"búsqueda por ID: {encontrados}"
+    encontrados = [fila['id'] for fila in database.obtener_producto_por_id_nombre_o_categoria("frut")]
+    assert encontrados == [ids[4], ids[0], ids[3]], f"nombre primero, luego categoría, sin duplicados: {encontrados}"
+    assert database.obtener_producto_por_id_nombre_o_categoria("inexistente") == []
+
+
+@caso
+def modificacion():
+    ids = _catalogo()
+    assert database.actualizar_producto(ids[0], "Manzana verde", "Ácida", 7, 275, "Fruta") is True
+    fila = database.obtener_producto_por_id_nombre_o_categoria(str(ids[0]), formato='tupla')[0]
+    assert fila == (ids[0], "Manzana verde", "Ácida", 7, 275, "Fruta"), f"fila modificada: {fila}"
+    assert database.actualizar_producto(ids[-1] + 100, "X", "X", 1, 1, "Otros") is False, "producto inexistente"
+
+
+@caso
+def bajas_sin_reutilizar_ids():
+    ids = _catalogo()
+    assert database.eliminar_producto(ids[-1]) is True
+    assert database.eliminar_producto(ids[-1]) is False, "baja repetida"
+    assert database.obtener_producto_por_id_nombre_o_categoria(str(ids[-1])) == []
+    nuevo = database.agregar_producto("Kiwi", "Importado", 4, 90, "Fruta")
+    assert nuevo > ids[-1], f"se reutilizó un ID: {nuevo}"
+    assert len(database.obtener_todos_los_productos()) == 5
+
+
+@caso
+def sku_unico():
+    ids = _catalogo()
+    assert database.asignar_sku(ids[0], " 7790001 ") is True
+    assert database.asignar_sku(ids[1], "7790001") is False, "SKU duplicado aceptado"
+    assert database.obtener_producto_por_sku("7790001")['id'] == ids[0]
+    assert database.obtener_producto_por_id_nombre_o_categoria("7790001")[0]['id'] == ids[0], "el SKU exacto va primero"
+    assert database.asignar_sku(ids[0], "") is True and database.obtener_producto_por_sku("7790001") is None, "quitar SKU"
+    assert database.asignar_sku(ids[1], "7790001") is True, "el SKU liberado se puede reasignar"
+    assert database.asignar_sku(ids[-1] + 100, "X1") is False, "producto inexistente"
+
+
+@caso
+def stock_por_sku_y_stock_bajo():
+    ids = _catalogo()
+    database.asignar_sku(ids[1], "A1")
+    database.asignar_sku(ids[3], "B2")
+    assert database.incrementar_stock_por_sku({"A1": 3, "B2": 10, "ZZ": 1}) == ["ZZ"]
+    assert database.incrementar_stock_por_sku({}) == []
+    bajo = [(fila['cantidad'], fila['nombre']) for fila in database.obtener_productos_por_cantidad_limite(10)]
+    assert bajo == [(5, "Pan integral"), (8, "Leche entera"), (10, "Banana")], f"stock bajo (límite incluido, por cantidad y nombre): {bajo}"
+    assert database.obtener_productos_por_cantidad_limite(-1) == []
+
+
+@caso
+def categorias():
+    assert database.obtener_categorias() == sorted(database.CATEGORIAS_DEFECTO), "categorías por defecto"
+    assert database.agregar_categoria("Mascotas") is True and database.agregar_categoria("Mascotas") is True
+    assert database.obtener_categorias().count("Mascotas") == 1
+
+
+@caso
+def usuarios():
+    assert database.agregar_usuario("ana", "clave1") is True
+    assert database.agregar_usuario("ana", "otra") is False, "usuario duplicado aceptado"
+    assert database.obtener_usuario("ana", "clave1") == "ana"
+    assert database.obtener_usuario("ana", "otra") is None and database.obtener_usuario("bruno", "clave1") is None
+    assert [fila['nombre_usuario'] for fila in database.obtener_todos_los_usuarios()] == ["ana"]
+    assert database.eliminar_todos_los_usuarios() is True and database.obtener_todos_los_usuarios() == []
+
+
+@caso
+def contrasenas_con_hash():
+    assert database.agregar_usuario("ana", "clave1") is True
+    assert all('contrasena' not in fila.keys() for fila in database.obtener_todos_los_usuarios()), "se expusieron contraseñas"
+    costo_original = database.SCRYPT_N
+    database.SCRYPT_N = costo_original // 2 # Otro costo: el hash se actualiza al iniciar sesión
+    try:
+        assert database.obtener_usuario("ana", "clave1") == "ana" and database.obtener_usuario("ana", "clave1") == "ana"
+        assert database.obtener_usuario("ana", "clave2") is None
+    finally:
+        database.SCRYPT_N = costo_original
+    assert database.obtener_usuario("ana", "clave1") == "ana", "login con el costo original"
+
+
+@caso
+def lecturas_repetidas_ven_las_escrituras():
+    ids = _catalogo()
+    for _ in range(2): # La segunda vez puede venir de la caché de lecturas
+        assert len(database.obtener_todos_los_productos()) == 5
+        assert len(database.obtener_productos_por_cantidad_limite(5)) == 3
+    database.actualizar_producto(ids[0], "Manzana roja", "Fruta fresca", 1, 250, "Fruta")
+    database.eliminar_producto(ids[1])
+    database.agregar_categoria("Mascotas")
+    assert len(database.obtener_todos_los_productos()) == 4, "el listado no refleja la baja"
+    assert [fila['id'] for fila in database.obtener_productos_por_cantidad_limite(5)] == [ids[3], ids[0], ids[2]], "stock bajo desactualizado"
+    assert "Mascotas" in database.obtener_categorias(), "categorías desactualizadas"
+
+
+@caso
+def transacciones_agrupadas():
+    avisos = []
+    observador = lambda id_producto, anterior, nuevo: avisos.append(nuevo)
+    database.registrar_observador_productos(observador)
+    try:
+        with database.transaccion() as tx:
+            id_producto = database.agregar_producto("Té", "En saquitos", 10, 300, "Bebida")
+            database.asignar_sku(id_producto, "T1")
+            assert avisos == [], "aviso antes del COMMIT"
+            with database.transaccion() as interna:
+                database.agregar_producto("Mate", "Yerba", 2, 900, "Bebida")
+                database.asignar_sku(id_producto + 1, "T1") # SKU duplicado: revierte solo la interna
+    finally:
+        database.quitar_observador_productos(observador)
+    assert tx.confirmada and not interna.confirmada and tx.operaciones == 2, f"{tx.operaciones} operación(es) confirmadas"
+    assert [fila['nombre'] for fila in database.obtener_todos_los_productos()] == ["Té"], "la transacción interna no se revirtió"
+    assert avisos == [("Té", "Bebida")], f"avisos: {avisos}"
+    with database.transaccion() as tx:
+        database.eliminar_producto(id_producto)
+        database.eliminar_producto(id_producto) # Falla: revierte también la primera baja
+    assert not tx.confirmada and database.obtener_producto_por_sku("T1")['nombre'] == "Té", "todo o nada"
+    with database.transaccion(todo_o_nada=False) as tx:
+        database.actualizar_producto(id_producto + 100, "Nada", "Inexistente", 1, 100, "Otros")
+    assert (tx.operaciones, tx.fallidas) == (0, 1), f"{tx.operaciones} confirmada(s) y {tx.fallidas} fallida(s)"
+
+
+@caso_sqlite
+def bajas_descontadas_de_ubicaciones_con_stock():
+    id_producto = database.agregar_producto("Arroz", "1 kg", 10, 900, "Grano")
+    assert database.transferir_stock("Salón de ventas", "Depósito", {id_producto: 8}) is True
+    assert database.actualizar_producto(id_producto, "Arroz", "1 kg", 5, 900, "Grano") is True
+    desglose = database.obtener_stock_de_producto(id_producto)
+    assert desglose == [("Depósito", 5)], f"la baja no se descontó de donde había stock: {desglose}"
+    assert database.transferir_stock("Salón de ventas", "Trastienda", {id_producto: 1}) is False, "transferencia sin stock"
+    assert database.ajustar_stock_en_ubicacion(id_producto, "Trastienda", 3) is True
+    assert database.actualizar_producto(id_producto, "Arroz", "1 kg", 7, 900, "Grano") is True # Baja de 1: la predeterminada no tiene
+    desglose = database.obtener_stock_de_producto(id_producto)
+    assert desglose == [("Trastienda", 2), ("Depósito", 5)], f"después de la predeterminada, por orden de ubicación: {desglose}"
+    assert database.actualizar_producto(id_producto, "Arroz", "1 kg", -1, 900, "Grano") is False, "se aceptó stock negativo"
+    assert sum(cantidad for _, cantidad in database.obtener_stock_de_producto(id_producto)) == 7
+
+
+@caso
+def observadores():
+    avisos = []
+    observador = lambda id_producto, anterior, nuevo: avisos.append((anterior, nuevo))
+    database.registrar_observador_productos(observador)
+    try:
+        id_producto = database.agregar_producto("Té", "En saquitos", 10, 300, "Bebida")
+        database.actualizar_producto(id_producto, "Té verde", "En saquitos", 10, 300, "Bebida")
+        database.eliminar_producto(id_producto)
+    finally:
+        database.quitar_observador_productos(observador)
+    assert avisos == [(None, ("Té", "Bebida")), (("Té", "Bebida"), ("Té verde", "Bebida")), (("Té verde", "Bebida"), None)], f"avisos: {avisos}"
+
+
+def verificar(backend, detallado=False):
+    """
+    Ejecuta todos los casos contra un motor, cada uno con un almacén vacío.
+    Retorna la lista de (caso, detalle del error) de los casos que fallaron.
+    """
+    fallidos = []
+    for funcion in casos_de(backend):
+        try:
+            with contextlib.redirect_stdout(open(os.devnull, 'w', encoding='utf-8')):
+                with almacen_vacio(backend):
+                    funcion()
+        except Exception as e:
+            fallidos.append((funcion.__name__, traceback.format_exc() if detallado else f"{type(e).__name__}: {e}"))
+    return fallidos
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verifica que los motores de almacenamiento cumplan el mismo contrato.")
+    parser.add_argument('backends', nargs='*', help=f"Motores a verificar: {', '.join(database.BACKENDS)} (por defecto, todos)")
+    parser.add_argument('--detallado', action='store_true', help="Muestra la traza completa de cada fallo")
+    args = parser.parse_args()
+    desconocidos = set(args.backends) - set(database.BACKENDS)
+    if desconocidos:
+        parser.error(f"motor(es) desconocido(s): {', '.join(sorted(desconocidos))}")
+
+    hubo_fallos = False
+    for backend in args.backends or database.BACKENDS:
+        fallidos = verificar(backend, args.detallado)
+        hubo_fallos = hubo_fallos or bool(fallidos)
+        if fallidos:
+            print(Fore.RED + f"❌ {backend}: {len(fallidos)} de {len(casos_de(backend))} caso(s) fallaron." + Style.RESET_ALL)
+            for nombre, detalle in fallidos:
+                print(Fore.RED + f"   - {nombre}: {detalle}" + Style.RESET_ALL)
+        else:
+            print(Fore.GREEN + f"✅ {backend}: {len(casos_de(backend))} caso(s) correctos." + Style.RESET_ALL)
+    sys.exit(1 if hubo_fallos else 0)
@@ -4,7 +4,24 @@ Define las funciones para conectar a la base de datos, crear las tablas
 necesarias (usuarios y productos), y realizar todas las operaciones CRUD
 (Crear, Leer, Actualizar, Eliminar) de forma segura utilizando transacciones.
 """
+import collections
+import contextlib
+import datetime
+import functools
+import hashlib
+import hmac
+import itertools
+import os
+import queue
+import random
+import secrets
 import sqlite3
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, fields
+from decimal import Decimal, InvalidOperation
 from colorama import Fore, Style, init
 
 # Inicializar colorama para mensajes de consola
@@ -13,14 +30,189 @@ init(autoreset=True)
 # Nombre del archivo de la base de datos
 ARCHIVO_DB = 'inventario.db'
 
-def conectar_db():
+# Motor de almacenamiento, elegido con la variable de entorno INVENTARIO_BACKEND o con
+# configurar_backend(): 'archivo' (SQLite en ARCHIVO_DB, por defecto), 'memoria' (SQLite
+# ':memory:' compartida entre las conexiones del proceso) o 'python' (diccionarios e índices,
+# ver almacen_memoria.py; solo cubre las funciones de la interfaz CRUD marcadas con @_interfaz).
+BACKENDS = ('archivo', 'memoria', 'python')
+BACKEND = os.environ.get('INVENTARIO_BACKEND', 'archivo')
+_uri_memoria = None   # Base SQLite en memoria del backend 'memoria'
+_ancla_memoria = None # Conexión que la mantiene viva (la base desaparece al cerrar la última)
+_almacen = None       # Instancia de AlmacenMemoria del backend 'python'
+_secuencia_memoria = itertools.count()
+
+def configurar_backend(nombre=None):
+    """
+    Selecciona el motor de almacenamiento (ver BACKENDS); sin argumento usa BACKEND.
+    Con 'memoria' y 'python' cada llamada empieza con un almacén vacío (hay que llamar
+    a crear_tablas); los datos no persisten al terminar el proceso. Retorna el nombre elegido.
+    """
+    global BACKEND, _uri_memoria, _ancla_memoria, _almacen
+    nombre = nombre or BACKEND
+    if nombre not in BACKENDS:
+        raise ValueError(f"Backend desconocido: '{nombre}'. Use uno de {BACKENDS}.")
+    cerrar_pool_lectura()
+    if _ancla_memoria is not None:
+        _ancla_memoria.close()
+    _uri_memoria, _ancla_memoria, _almacen = None, None, None
+    if nombre == 'memoria':
+        _uri_memoria = f"file:inventario_{os.getpid()}_{next(_secuencia_memoria)}?mode=memory&cache=shared"
+        _ancla_memoria = sqlite3.connect(_uri_memoria, uri=True, check_same_thread=False)
+    elif nombre == 'python':
+        import almacen_memoria # Solo se carga si se usa este motor
+        _almacen = almacen_memoria.AlmacenMemoria()
+    BACKEND = nombre
+    return nombre
+
+def _almacen_activo():
+    """Instancia de AlmacenMemoria si el motor es 'python' (creándola la primera vez), o None."""
+    if BACKEND == 'python' and _almacen is None:
+        configurar_backend('python')
+    return _almacen
+
+def _interfaz(funcion):
+    """
+    Marca una función de la interfaz CRUD: con el motor 'python' se atiende con el método
+    del mismo nombre de AlmacenMemoria; con los motores SQLite se ejecuta la función.
+    """
+    @functools.wraps(funcion)
+    def envoltura(*args, **kwargs):
+        almacen = _almacen_activo()
+        if almacen is None:
+            return funcion(*args, **kwargs)
+        resultado = getattr(almacen, funcion.__name__)(*args, **kwargs)
+        transaccion_actual = _transaccion_actual()
+        if transaccion_actual is not None and funcion.__name__.startswith(PREFIJOS_ESCRITURA):
+            # Sin SAVEPOINTs: una escritura que retorna False o None cuenta como fallida
+            if resultado is None or resultado is False:
+                transaccion_actual.fallidas += 1
+            else:
+                transaccion_actual.operaciones += 1
+        return resultado
+    return envoltura
+
+# Prefijos de las funciones de la interfaz que escriben (las cuenta Transaccion con el motor 'python')
+PREFIJOS_ESCRITURA = ('agregar_', 'actualizar_', 'eliminar_', 'asignar_', 'incrementar_')
+
+# Formatos de fila disponibles para las lecturas de productos:
+# 'row' (sqlite3.Row, por defecto), 'producto' (dataclass Producto liviana) y 'tupla' (tuplas simples)
+FORMATOS_FILA = ('row', 'producto', 'tupla')
+
+@dataclass(slots=True)
+class Producto:
+    """
+    Fila de producto compacta (usa __slots__, sin diccionario por instancia).
+    Permite acceso por atributo (p.nombre), por clave (p['nombre']) y por
+    índice (p[0]), igual que sqlite3.Row, para que el resto del código no cambie.
+    """
+    id: int
+    nombre: str
+    descripcion: str
+    cantidad: int
+    precio: int  # En centavos
+    categoria: str
+
+    def __getitem__(self, clave):
+        if isinstance(clave, int):
+            return getattr(self, _CAMPOS_PRODUCTO[clave])
+        return getattr(self, clave)
+
+    def keys(self):
+        return list(_CAMPOS_PRODUCTO)
+
+_CAMPOS_PRODUCTO = tuple(campo.name for campo in fields(Producto))
+
+def fabrica_producto(cursor, fila):
+    """
+    Row factory que construye un Producto a partir de una fila.
+    Las consultas deben seleccionar las columnas en el orden de Producto.
+    """
+    return Producto(*fila)
+
+def a_centavos(valor):
+    """
+    Convierte un precio en pesos ('12.5', '12,50', Decimal, int) a centavos enteros sin
+    pasar por float, para que no haya errores de redondeo. Lanza ValueError si el valor
+    no es un número o tiene más de dos decimales.
+    """
+    try:
+        importe = Decimal(str(valor).strip().replace(',', '.'))
+    except InvalidOperation:
+        raise ValueError(f"precio inválido '{valor}'") from None
+    if not importe.is_finite():
+        raise ValueError(f"precio inválido '{valor}'")
+    centavos = importe * 100
+    if centavos != centavos.to_integral_value():
+        raise ValueError(f"el precio '{valor}' tiene más de dos decimales")
+    return int(centavos)
+
+def a_pesos(centavos):
+    """Convierte centavos enteros a un Decimal exacto en pesos (ej. 1250 -> Decimal('12.50'))."""
+    return Decimal(int(centavos)).scaleb(-2)
+
+def formatear_precio(centavos):
+    """Texto del precio con dos decimales a partir de centavos enteros (ej. 1250 -> '12.50')."""
+    return f"{a_pesos(centavos):.2f}"
+
+def aplicar_formato(cursor, formato):
+    """
+    Configura la row factory del cursor según el formato pedido ('row', 'producto' o 'tupla')
+    y lo retorna. Sirve a los módulos que consultan con su propia conexión (reportes,
+    sucursales) para leer filas con el mismo formato que las funciones de lectura de este
+    módulo. Lanza ValueError si el formato no está en FORMATOS_FILA.
+    """
+    if formato == 'producto':
+        cursor.row_factory = fabrica_producto
+    elif formato == 'tupla':
+        cursor.row_factory = None
+    elif formato != 'row':
+        raise ValueError(f"Formato de fila desconocido: '{formato}'. Use uno de {FORMATOS_FILA}.")
+    return cursor
+
+# Escrituras concurrentes (varias terminales o procesos sobre la misma base):
+# segundos que SQLite espera por el bloqueo antes de informar "database is locked",
+# y reintentos adicionales con espera exponencial aleatoria si aun así está ocupada
+ESPERA_OCUPADA = 5.0
+REINTENTOS_ESCRITURA = 6
+ESPERA_BASE_REINTENTO = 0.05
+ESPERA_MAXIMA_REINTENTO = 2.0
+
+# Contadores de contención de este proceso (ver obtener_contadores_contencion)
+_contadores_contencion = {'transacciones': 0, 'reintentos': 0, 'fallidas': 0, 'segundos_espera': 0.0}
+_bloqueo_contadores = threading.Lock()
+
+class _ConexionEscritura(sqlite3.Connection):
+    """Conexión de conectar_db: al confirmar una transacción invalida la caché de lecturas."""
+
+    def commit(self):
+        super().commit()
+        invalidar_cache()
+
+def conectar_db(ruta_db=None):
     """
     Establece una conexión con la base de datos SQLite.
     Crea el archivo de la base de datos si no existe.
-    Retorna el objeto de conexión.
+    Si no se indica 'ruta_db' se usa la base del motor configurado (ARCHIVO_DB o la base en
+    memoria). Retorna el objeto de conexión, o None si hubo un error o el motor es 'python'.
+    Dentro de 'with transaccion()' retorna la conexión de esa transacción (ver Transaccion).
     """
+    if ruta_db is None and _transaccion_actual() is not None:
+        return _ConexionDeTransaccion(_transaccion_actual())
+    if ruta_db is None and BACKEND != 'archivo':
+        if BACKEND == 'python':
+            print(Fore.RED + "❌ Esta operación necesita SQLite y no está disponible con el backend 'python'." + Style.RESET_ALL)
+            return None
+        if _uri_memoria is None:
+            configurar_backend('memoria')
+        try:
+            conn = sqlite3.connect(_uri_memoria, uri=True, timeout=ESPERA_OCUPADA, factory=_ConexionEscritura)
+            conn.row_factory = sqlite3.Row
+            return conn
+        except sqlite3.Error as e:
+            print(Fore.RED + f"❌ Error al conectar a la base de datos en memoria: {e}" + Style.RESET_ALL)
+            return None
     try:
-        conn = sqlite3.connect(ARCHIVO_DB)
+        conn = sqlite3.connect(ruta_db or ARCHIVO_DB, timeout=ESPERA_OCUPADA, factory=_ConexionEscritura)
         # Permite acceder a las columnas por nombre (como si fueran diccionarios)
         conn.row_factory = sqlite3.Row
         # print(Fore.GREEN + f"✅ Conexión a la base de datos '{ARCHIVO_DB}' establecida." + Style.RESET_ALL) - se comento para evitar mensajes repetidos
@@ -29,17 +221,814 @@ def conectar_db():
         print(Fore.RED + f"❌ Error al conectar a la base de datos: {e}" + Style.RESET_ALL)
         return None
 
+def _base_ocupada(error):
+    """Indica si un error de SQLite se debe a que otra conexión tiene el bloqueo (SQLITE_BUSY / SQLITE_LOCKED)."""
+    nombre = getattr(error, 'sqlite_errorname', '')
+    return isinstance(error, sqlite3.OperationalError) and nombre.startswith(('SQLITE_BUSY', 'SQLITE_LOCKED'))
+
+def iniciar_escritura(conn):
+    """
+    Inicia una transacción de escritura con BEGIN IMMEDIATE: el bloqueo de escritura se
+    toma al principio, así una transacción nunca falla a mitad de camino por otro escritor.
+    Si la base sigue ocupada después de ESPERA_OCUPADA, reintenta hasta REINTENTOS_ESCRITURA
+    veces con espera exponencial aleatoria. Lanza el último sqlite3.OperationalError si no lo logra.
+    Dentro de una transacción agrupada solo abre un SAVEPOINT para la operación.
+    """
+    if isinstance(conn, _ConexionDeTransaccion):
+        conn.iniciar_paso()
+        return
+    espera_total = 0.0
+    for intento in range(REINTENTOS_ESCRITURA + 1):
+        inicio = time.perf_counter()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            with _bloqueo_contadores:
+                _contadores_contencion['transacciones'] += 1
+                _contadores_contencion['reintentos'] += intento
+                _contadores_contencion['segundos_espera'] += espera_total + time.perf_counter() - inicio
+            return
+        except sqlite3.OperationalError as e:
+            espera_total += time.perf_counter() - inicio
+            if not _base_ocupada(e) or intento == REINTENTOS_ESCRITURA:
+                with _bloqueo_contadores:
+                    _contadores_contencion['fallidas'] += 1
+                    _contadores_contencion['reintentos'] += intento
+                    _contadores_contencion['segundos_espera'] += espera_total
+                raise
+            pausa = random.uniform(0, min(ESPERA_MAXIMA_REINTENTO, ESPERA_BASE_REINTENTO * 2 ** intento))
+            time.sleep(pausa)
+            espera_total += pausa
+
+def obtener_contadores_contencion():
+    """
+    Retorna una copia de los contadores de escritura de este proceso: transacciones
+    iniciadas, reintentos por base ocupada, transacciones que no pudieron iniciarse
+    y segundos totales esperando el bloqueo.
+    """
+    with _bloqueo_contadores:
+        return dict(_contadores_contencion)
+
+def reiniciar_contadores_contencion():
+    """Pone en cero los contadores de contención."""
+    with _bloqueo_contadores:
+        for clave in _contadores_contencion:
+            _contadores_contencion[clave] = 0 if clave != 'segundos_espera' else 0.0
+
+class _ConexionLectura(sqlite3.Connection):
+    """Conexión de solo lectura que recuerda a qué base pertenece (para devolverla a su pool)."""
+    ruta_pool = None
+
+def conectar_db_solo_lectura(ruta_db=None, silencioso=False):
+    """
+    Abre una conexión de solo lectura (URI 'file:...?mode=ro' con PRAGMA query_only).
+    A diferencia de conectar_db, no crea el archivo si no existe.
+    La conexión puede pasarse a otro hilo (pero no usarse desde dos hilos a la vez).
+    Retorna el objeto de conexión, o None si no se pudo abrir.
+    """
+    try:
+        ruta = os.path.abspath(ruta_db or ARCHIVO_DB)
+        conn = sqlite3.connect(f"file:{urllib.parse.quote(ruta)}?mode=ro", uri=True,
+                               check_same_thread=False, factory=_ConexionLectura)
+        conn.ruta_pool = ruta
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA query_only = ON")
+        return conn
+    except sqlite3.Error as e:
+        if not silencioso:
+            print(Fore.RED + f"❌ Error al abrir '{ruta_db or ARCHIVO_DB}' en modo solo lectura: {e}" + Style.RESET_ALL)
+        return None
+
+# --- Pool de conexiones de solo lectura ---
+# Las lecturas (listados, búsquedas y reportes) toman una conexión de este pool en lugar
+# de abrir una de lectura/escritura, así varios reportes pueden ejecutarse en paralelo
+# entre sí y junto a un escritor (la base usa journal_mode=WAL, ver crear_tablas).
+
+# Conexiones libres que se conservan por cada base de datos
+TAMANO_POOL_LECTURA = 8
+_pools_lectura = {}
+_candado_pools = threading.Lock()
+
+def tomar_conexion_lectura(ruta_db=None):
+    """
+    Toma una conexión de solo lectura del pool de la base indicada (ARCHIVO_DB por defecto).
+    Si no hay conexiones libres abre una nueva; si la base todavía no existe se usa
+    conectar_db como respaldo. Siempre debe devolverse con devolver_conexion_lectura.
+    Con los motores 'memoria' y 'python' equivale a conectar_db (no hay pool), y dentro de
+    una transacción agrupada retorna su conexión, para leer lo que todavía no se confirmó.
+    """
+    if ruta_db is None and (BACKEND != 'archivo' or _transaccion_actual() is not None):
+        return conectar_db()
+    ruta = os.path.abspath(ruta_db or ARCHIVO_DB)
+    with _candado_pools:
+        pool = _pools_lectura.setdefault(ruta, queue.LifoQueue(maxsize=TAMANO_POOL_LECTURA))
+    try:
+        return pool.get_nowait()
+    except queue.Empty:
+        return conectar_db_solo_lectura(ruta, silencioso=True) or conectar_db(ruta)
+
+def devolver_conexion_lectura(conn):
+    """Devuelve una conexión al pool. Si el pool está lleno, o no es de solo lectura, la cierra."""
+    if conn is None:
+        return
+    ruta = getattr(conn, 'ruta_pool', None)
+    with _candado_pools:
+        pool = _pools_lectura.get(ruta)
+    try:
+        if pool is None:
+            raise queue.Full
+        pool.put_nowait(conn)
+    except queue.Full:
+        conn.close()
+
+def cerrar_pool_lectura():
+    """Cierra todas las conexiones libres de los pools de lectura (y vacía la caché de lecturas)."""
+    _cerrar_vigilancia_cache()
+    with _candado_pools:
+        pools = list(_pools_lectura.values())
+        _pools_lectura.clear()
+    for pool in pools:
+        while True:
+            try:
+                pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+def ejecutar_lecturas_en_paralelo(lecturas, hilos=None):
+    """
+    Ejecuta varias lecturas independientes a la vez en un pool de hilos.
+    'lecturas' es una lista de funciones sin argumentos (por ejemplo,
+    lambda: obtener_productos_por_cantidad_limite(10)). Retorna sus resultados en el mismo orden.
+    """
+    if not lecturas:
+        return []
+    with ThreadPoolExecutor(max_workers=hilos or min(TAMANO_POOL_LECTURA, len(lecturas))) as pool:
+        return list(pool.map(lambda lectura: lectura(), lecturas))
+
+# --- Caché de resultados de lectura ---
+# Las lecturas marcadas con @_en_cache (listado, búsqueda, stock bajo, categorías y
+# ubicaciones) guardan sus resultados en una caché LRU. Todas las entradas se descartan
+# cuando la base cambia: las escrituras de este proceso lo avisan al confirmar (ver
+# _ConexionEscritura) y las de otros procesos se detectan antes de cada lectura con
+# PRAGMA data_version, que cambia cuando otra conexión confirmó cambios.
+
+# Activa o desactiva la caché, y cantidad máxima de resultados que conserva
+CACHE_LECTURAS = True
+TAMANO_CACHE_LECTURAS = 64
+
+_cache_lecturas = collections.OrderedDict()
+_generacion_cache = 0   # Aumenta con cada invalidación; evita guardar resultados leídos antes de ella
+_vigilancia_cache = {}  # Base -> [conexión de solo lectura, último data_version visto]
+_candado_cache = threading.Lock()
+_estadisticas_cache = {'aciertos': 0, 'fallos': 0, 'invalidaciones': 0}
+
+def invalidar_cache():
+    """Descarta todos los resultados guardados en la caché de lecturas."""
+    global _generacion_cache
+    with _candado_cache:
+        _generacion_cache += 1
+        if _cache_lecturas:
+            _cache_lecturas.clear()
+            _estadisticas_cache['invalidaciones'] += 1
+
+def _cerrar_vigilancia_cache():
+    """Vacía la caché y cierra las conexiones que vigilan data_version."""
+    invalidar_cache()
+    with _candado_cache:
+        for conn, _ in _vigilancia_cache.values():
+            conn.close()
+        _vigilancia_cache.clear()
+
+def _base_sin_cambios(base):
+    """
+    Consulta PRAGMA data_version en la conexión que vigila 'base' (debe llamarse con
+    _candado_cache tomado). Si otra conexión confirmó cambios desde la última consulta,
+    descarta la caché. Retorna False si la base no se puede vigilar (no se usa la caché).
+    """
+    global _generacion_cache
+    vigilancia = _vigilancia_cache.get(base)
+    if vigilancia is None:
+        if BACKEND == 'memoria':
+            conn = sqlite3.connect(base, uri=True, check_same_thread=False)
+        else:
+            conn = conectar_db_solo_lectura(base, silencioso=True)
+        if conn is None:
+            return False
+        vigilancia = _vigilancia_cache[base] = [conn, None]
+    try:
+        version = vigilancia[0].execute("PRAGMA data_version").fetchone()[0]
+    except sqlite3.Error:
+        return False
+    if version != vigilancia[1]:
+        vigilancia[1] = version
+        _generacion_cache += 1
+        if _cache_lecturas:
+            _cache_lecturas.clear()
+            _estadisticas_cache['invalidaciones'] += 1
+    return True
+
+def _en_cache(funcion):
+    """
+    Guarda en la caché de lecturas el resultado de una función de lectura, según sus
+    argumentos y la base en uso. Se guarda una versión inmutable y en cada acierto se
+    arma una lista nueva (ver _congelar), así nadie modifica lo que recibe otro llamador.
+    Los resultados vacíos no se guardan (también son el resultado de un error de lectura).
+    """
+    @functools.wraps(funcion)
+    def envoltura(*args, **kwargs):
+        if not CACHE_LECTURAS or _transaccion_actual() is not None: # Sin confirmar: no se guarda
+            return funcion(*args, **kwargs)
+        if BACKEND == 'memoria' and _uri_memoria is None:
+            configurar_backend('memoria')
+        base = _uri_memoria if BACKEND == 'memoria' else os.path.abspath(ARCHIVO_DB)
+        clave = (base, funcion.__name__, args, tuple(sorted(kwargs.items())))
+        with _candado_cache:
+            vigilada = _base_sin_cambios(base)
+            if vigilada and clave in _cache_lecturas:
+                _cache_lecturas.move_to_end(clave)
+                _estadisticas_cache['aciertos'] += 1
+                return _descongelar(_cache_lecturas[clave])
+            _estadisticas_cache['fallos'] += 1
+            generacion = _generacion_cache
+        resultado = funcion(*args, **kwargs)
+        if vigilada and resultado:
+            with _candado_cache:
+                if generacion == _generacion_cache: # Nadie invalidó la caché mientras se leía
+                    _cache_lecturas[clave] = _congelar(resultado)
+                    if len(_cache_lecturas) > TAMANO_CACHE_LECTURAS:
+                        _cache_lecturas.popitem(last=False)
+        return resultado
+    return envoltura
+
+def _congelar(resultado):
+    """
+    Versión inmutable de un resultado para la caché: las filas Producto (mutables) se
+    guardan como tuplas; sqlite3.Row, tuplas y textos no se pueden modificar y se comparten.
+    """
+    if isinstance(resultado[0], Producto):
+        return Producto, tuple((fila.id, fila.nombre, fila.descripcion, fila.cantidad, fila.precio, fila.categoria)
+                               for fila in resultado)
+    return None, tuple(resultado)
+
+def _descongelar(entrada):
+    """Lista nueva (con Producto nuevos, si corresponde) a partir de una entrada de la caché."""
+    tipo, filas = entrada
+    return list(itertools.starmap(Producto, filas)) if tipo is Producto else list(filas)
+
+@contextlib.contextmanager
+def sin_cache_lecturas():
+    """Desactiva la caché de lecturas mientras dura el bloque 'with' (las mediciones no deben medir aciertos)."""
+    global CACHE_LECTURAS
+    anterior, CACHE_LECTURAS = CACHE_LECTURAS, False
+    try:
+        yield
+    finally:
+        CACHE_LECTURAS = anterior
+
+def obtener_estadisticas_cache():
+    """
+    Devuelve las estadísticas de la caché de lecturas de este proceso: aciertos, fallos,
+    invalidaciones (veces que se descartó con resultados guardados) y entradas actuales.
+    """
+    with _candado_cache:
+        return dict(_estadisticas_cache, entradas=len(_cache_lecturas))
+
+def reiniciar_estadisticas_cache():
+    """Pone en cero los contadores de la caché de lecturas."""
+    with _candado_cache:
+        for clave in _estadisticas_cache:
+            _estadisticas_cache[clave] = 0
+
+# --- Transacciones agrupadas (unidad de trabajo) ---
+# Dentro de 'with transaccion() as tx:', las funciones de este módulo que usan la base del
+# motor configurado (sin 'ruta_db' explícita) trabajan en el mismo hilo sobre la conexión
+# de la transacción: cada operación queda en un SAVEPOINT propio y el COMMIT se hace una
+# sola vez al final. Las lecturas ven lo escrito en la transacción y no usan la caché.
+
+_transaccion_local = threading.local()
+
+def _transaccion_actual():
+    """Transacción agrupada abierta en este hilo (la más interna), o None."""
+    return getattr(_transaccion_local, 'actual', None)
+
+class _ConexionDeTransaccion:
+    """
+    Conexión que reciben las funciones de este módulo dentro de una transacción agrupada.
+    iniciar_escritura abre un SAVEPOINT para la operación; commit lo libera, rollback
+    deshace solo esa operación (y la cuenta como fallida) y close no cierra la conexión.
+    """
+
+    def __init__(self, transaccion):
+        self._transaccion = transaccion
+        self._paso = None
+
+    def __getattr__(self, nombre):
+        return getattr(self._transaccion.conn, nombre)
+
+    def iniciar_paso(self):
+        self._paso = self._transaccion._nuevo_savepoint('paso')
+
+    def commit(self):
+        if self._paso:
+            self._transaccion.conn.execute(f"RELEASE {self._paso}")
+            self._paso = None
+            self._transaccion.operaciones += 1
+
+    def rollback(self):
+        self._transaccion.fallidas += 1
+        if self._paso:
+            self._transaccion.conn.execute(f"ROLLBACK TO {self._paso}")
+            self._transaccion.conn.execute(f"RELEASE {self._paso}")
+            self._paso = None
+
+    def close(self):
+        pass
+
+class Transaccion:
+    """
+    Unidad de trabajo que agrupa varias operaciones de este módulo en una sola transacción
+    (se obtiene con transaccion()). Al salir del bloque 'with' se confirma todo junto, o se
+    revierte todo si hubo una excepción o, con todo_o_nada=True, si alguna operación falló.
+    Anidada dentro de otra, usa un SAVEPOINT: revertirla no revierte la exterior.
+    Con el motor 'python' se guarda una instantánea del almacén y se restaura al revertir.
+    Atributos: operaciones (confirmadas), fallidas, confirmada y conn (para SQL propio).
+    """
+
+    def __init__(self, todo_o_nada=True):
+        self.todo_o_nada = todo_o_nada
+        self.operaciones = 0
+        self.fallidas = 0
+        self.confirmada = False
+        self.conn = None
+        self._padre = None
+        self._savepoint = None
+        self._secuencia = None
+        self._instantanea = None # Motor 'python': estado del almacén al entrar
+        self._avisos = [] # Avisos a los observadores de productos, pendientes hasta el COMMIT
+
+    def _nuevo_savepoint(self, prefijo):
+        nombre = f"{prefijo}_{next(self._secuencia)}"
+        self.conn.execute(f"SAVEPOINT {nombre}")
+        return nombre
+
+    def __enter__(self):
+        self._padre = _transaccion_actual()
+        if BACKEND == 'python':
+            self._instantanea = _almacen_activo().instantanea()
+        elif self._padre is not None:
+            self.conn, self._secuencia = self._padre.conn, self._padre._secuencia
+            self._savepoint = self._nuevo_savepoint('transaccion')
+        else:
+            conn = conectar_db()
+            if conn is None:
+                raise sqlite3.OperationalError("no se pudo abrir la conexión para la transacción")
+            conn.isolation_level = None # BEGIN, SAVEPOINT y COMMIT se emiten explícitamente
+            try:
+                iniciar_escritura(conn)
+            except sqlite3.Error:
+                conn.close()
+                raise
+            self.conn, self._secuencia = conn, itertools.count()
+        _transaccion_local.actual = self
+        return self
+
+    def __exit__(self, tipo, valor, traza):
+        _transaccion_local.actual = self._padre
+        revertir = tipo is not None or (self.todo_o_nada and self.fallidas > 0)
+        if self._instantanea is not None:
+            if revertir:
+                _almacen_activo().restaurar(self._instantanea)
+            else:
+                self.confirmada = True
+                if self._padre is not None:
+                    self._padre.operaciones += self.operaciones
+                    self._padre._avisos.extend(self._avisos)
+                else:
+                    for aviso in self._avisos:
+                        _notificar_productos(*aviso)
+        elif self._padre is not None:
+            if revertir:
+                self.conn.execute(f"ROLLBACK TO {self._savepoint}")
+            self.conn.execute(f"RELEASE {self._savepoint}")
+            if not revertir:
+                self.confirmada = True
+                self._padre.operaciones += self.operaciones
+                self._padre._avisos.extend(self._avisos)
+        else:
+            try:
+                if revertir:
+                    self.conn.rollback()
+                else:
+                    self.conn.commit()
+                    self.confirmada = True
+            except sqlite3.Error as e:
+                self.conn.rollback()
+                print(Fore.RED + f"❌ Error al confirmar la transacción: {e} (transacción revertida)." + Style.RESET_ALL)
+            finally:
+                self.conn.close()
+            if self.confirmada:
+                for aviso in self._avisos:
+                    _notificar_productos(*aviso)
+        if revertir and tipo is None:
+            print(Fore.YELLOW + f"⚠ {self.fallidas} operación(es) fallaron: se revirtieron las {self.operaciones} operación(es) agrupadas." + Style.RESET_ALL)
+        return False
+
+def transaccion(todo_o_nada=True):
+    """
+    Agrupa varias operaciones de este módulo en una sola transacción, con un único COMMIT:
+        with database.transaccion() as tx:
+            database.agregar_categoria('Mascotas')
+            database.agregar_producto('Alimento', '1 kg', 10, 2500, 'Mascotas')
+    Retorna un objeto Transaccion (ver su documentación). Las transacciones pueden anidarse.
+    """
+    return Transaccion(todo_o_nada)
+
+# Columnas de cada tabla que se vigilan en el registro de cambios
+COLUMNAS_CAMBIOS = {
+    'productos': ('nombre', 'descripcion', 'cantidad', 'precio', 'categoria', 'sku'),
+    'categorias': ('nombre',),
+}
+
+# Fecha de cada cambio con milisegundos (la usa la sincronización entre réplicas para desempatar)
+AHORA_CAMBIOS = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+def _crear_triggers_cambios(cursor):
+    """
+    (Re)crea los triggers que anotan en la tabla 'cambios' cada alta ('I'), modificación ('U')
+    y baja ('D') de las tablas de COLUMNAS_CAMBIOS. En las modificaciones se guardan solo
+    los nombres de las columnas que cambiaron, y si no cambió ninguna no se anota nada;
+    si cambió la cantidad, también su valor anterior (la sincronización entre réplicas
+    suma así las ventas hechas en ambas). Se recrean siempre para que reflejen la lista
+    de columnas actual.
+    """
+    for tabla, columnas in COLUMNAS_CAMBIOS.items():
+        distintas = " OR ".join(f"OLD.{c} IS NOT NEW.{c}" for c in columnas)
+        lista = " || ".join(f"CASE WHEN OLD.{c} IS NOT NEW.{c} THEN '{c},' ELSE '' END" for c in columnas)
+        anterior = "CASE WHEN OLD.cantidad IS NOT NEW.cantidad THEN OLD.cantidad END" if 'cantidad' in columnas else "NULL"
+        cursor.execute(f"DROP TRIGGER IF EXISTS cambios_{tabla}_alta")
+        cursor.execute(f"DROP TRIGGER IF EXISTS cambios_{tabla}_modificacion")
+        cursor.execute(f"DROP TRIGGER IF EXISTS cambios_{tabla}_baja")
+        cursor.execute(f"""
+            CREATE TRIGGER cambios_{tabla}_alta AFTER INSERT ON {tabla}
+            BEGIN
+                INSERT INTO cambios (tabla, operacion, registro_id, fecha) VALUES ('{tabla}', 'I', NEW.id, {AHORA_CAMBIOS});
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER cambios_{tabla}_modificacion AFTER UPDATE ON {tabla}
+            WHEN {distintas}
+            BEGIN
+                INSERT INTO cambios (tabla, operacion, registro_id, columnas, fecha, cantidad_anterior)
+                VALUES ('{tabla}', 'U', NEW.id, RTRIM({lista}, ','), {AHORA_CAMBIOS}, {anterior});
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER cambios_{tabla}_baja AFTER DELETE ON {tabla}
+            BEGIN
+                INSERT INTO cambios (tabla, operacion, registro_id, fecha) VALUES ('{tabla}', 'D', OLD.id, {AHORA_CAMBIOS});
+            END
+        """)
+
+def _crear_historial_precios(cursor):
+    """
+    Crea la tabla historial_precios y sus triggers: cada alta de producto y cada cambio
+    de precio anota (producto_id, vigente_desde, precio). La clave primaria de una tabla
+    WITHOUT ROWID es el propio índice (producto_id, vigente_desde), así que el precio
+    vigente a una fecha es una sola búsqueda en el índice. Las bajas conservan su historial.
+    En una base existente, el precio actual de cada producto se registra vigente desde su
+    último cambio de precio (o su alta) según el registro de cambios, o desde ahora.
+    """
+    existia = cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'historial_precios'").fetchone()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS historial_precios (
+            producto_id INTEGER NOT NULL,
+            vigente_desde TEXT NOT NULL,
+            precio INTEGER NOT NULL,
+            PRIMARY KEY (producto_id, vigente_desde)
+        ) WITHOUT ROWID
+    ''')
+    if not existia:
+        cursor.execute(f'''
+            INSERT INTO historial_precios (producto_id, vigente_desde, precio)
+            SELECT p.id, COALESCE(
+                (SELECT MAX(c.fecha) FROM cambios c WHERE c.tabla = 'productos' AND c.registro_id = p.id
+                 AND (c.operacion = 'I' OR ',' || c.columnas || ',' LIKE '%,precio,%')), {AHORA_CAMBIOS}), p.precio
+            FROM productos p
+        ''')
+    # Dos cambios en el mismo milisegundo: queda el último (INSERT OR REPLACE)
+    cursor.execute("DROP TRIGGER IF EXISTS historial_precios_alta")
+    cursor.execute("DROP TRIGGER IF EXISTS historial_precios_modificacion")
+    cursor.execute(f'''
+        CREATE TRIGGER historial_precios_alta AFTER INSERT ON productos
+        BEGIN
+            INSERT OR REPLACE INTO historial_precios (producto_id, vigente_desde, precio) VALUES (NEW.id, {AHORA_CAMBIOS}, NEW.precio);
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER historial_precios_modificacion AFTER UPDATE OF precio ON productos
+        WHEN OLD.precio IS NOT NEW.precio
+        BEGIN
+            INSERT OR REPLACE INTO historial_precios (producto_id, vigente_desde, precio) VALUES (NEW.id, {AHORA_CAMBIOS}, NEW.precio);
+        END
+    ''')
+
+# Ubicaciones por defecto; la primera es la predeterminada (ID 1), que absorbe los cambios
+# de stock hechos sobre el total del producto (altas, modificaciones, recepción, importación)
+UBICACIONES_DEFECTO = ('Salón de ventas', 'Trastienda', 'Depósito')
+UBICACION_PREDETERMINADA_ID = 1
+
+def _crear_stock_ubicacion(cursor):
+    """
+    Crea las tablas de ubicaciones y de stock por ubicación. productos.cantidad sigue siendo
+    el total del producto (así el reporte de stock bajo no cambia): los triggers de productos
+    suman cada aumento del total a la ubicación predeterminada y descuentan cada baja primero
+    de ella y después de las demás ubicaciones con stock (en orden de ID); un total negativo
+    se rechaza. Las transferencias entre ubicaciones no modifican el total. Se mantiene
+    SUM(stock_ubicacion.cantidad) = productos.cantidad, sin cantidades negativas.
+    En una base existente, todo el stock actual queda en la ubicación predeterminada; las
+    creadas por versiones anteriores (sin CHECK) se reconstruyen sin cantidades negativas.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ubicaciones (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nombre TEXT UNIQUE NOT NULL
+        )
+    ''')
+    if cursor.execute("SELECT COUNT(*) FROM ubicaciones").fetchone()[0] == 0:
+        cursor.executemany("INSERT INTO ubicaciones (nombre) VALUES (?)", ((nombre,) for nombre in UBICACIONES_DEFECTO))
+    existente = cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'stock_ubicacion'").fetchone()
+    for nombre in ('stock_ubicacion_alta', 'stock_ubicacion_total', 'stock_ubicacion_salida', 'stock_ubicacion_baja'):
+        cursor.execute(f"DROP TRIGGER IF EXISTS {nombre}")
+    reconstruir = existente is not None and 'CHECK' not in existente[0]
+    if reconstruir:
+        cursor.execute("ALTER TABLE stock_ubicacion RENAME TO stock_ubicacion_anterior")
+    # La clave (producto_id, ubicacion_id) de la tabla WITHOUT ROWID incluye la cantidad:
+    # el desglose de un producto se lee del propio índice, sin buscar filas aparte
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stock_ubicacion (
+            producto_id INTEGER NOT NULL,
+            ubicacion_id INTEGER NOT NULL,
+            cantidad INTEGER NOT NULL CHECK (cantidad >= 0),
+            PRIMARY KEY (producto_id, ubicacion_id)
+        ) WITHOUT ROWID
+    ''')
+    if existente is None:
+        cursor.execute("INSERT INTO stock_ubicacion (producto_id, ubicacion_id, cantidad) SELECT id, ?, cantidad FROM productos",
+                       (UBICACION_PREDETERMINADA_ID,))
+    elif reconstruir:
+        cursor.execute('''
+            INSERT INTO stock_ubicacion (producto_id, ubicacion_id, cantidad)
+            SELECT producto_id, ubicacion_id, MAX(cantidad, 0) FROM stock_ubicacion_anterior
+        ''')
+        cursor.execute("DROP TABLE stock_ubicacion_anterior")
+        # Sin los negativos, la suma puede superar el total: el exceso se descuenta como una baja
+        cursor.execute(f'''
+            UPDATE stock_ubicacion SET cantidad = MAX(0, exceso.acumulado - exceso.unidades)
+            FROM (
+                SELECT s.producto_id, s.ubicacion_id, s.cantidad, suma.total - p.cantidad AS unidades,
+                       SUM(s.cantidad) OVER (PARTITION BY s.producto_id
+                                             ORDER BY s.ubicacion_id <> {UBICACION_PREDETERMINADA_ID}, s.ubicacion_id) AS acumulado
+                FROM stock_ubicacion AS s
+                JOIN productos AS p ON p.id = s.producto_id
+                JOIN (SELECT producto_id, SUM(cantidad) AS total FROM stock_ubicacion GROUP BY producto_id) AS suma
+                  ON suma.producto_id = s.producto_id
+                WHERE s.cantidad > 0 AND suma.total > p.cantidad
+            ) AS exceso
+            WHERE stock_ubicacion.producto_id = exceso.producto_id AND stock_ubicacion.ubicacion_id = exceso.ubicacion_id
+              AND exceso.acumulado - exceso.cantidad < exceso.unidades
+        ''')
+    # Índice que cubre el listado por ubicación (no necesita leer la tabla)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_stock_ubicacion_ubicacion ON stock_ubicacion (ubicacion_id, producto_id, cantidad)")
+    cursor.execute(f'''
+        CREATE TRIGGER stock_ubicacion_alta AFTER INSERT ON productos
+        BEGIN
+            INSERT INTO stock_ubicacion (producto_id, ubicacion_id, cantidad) VALUES (NEW.id, {UBICACION_PREDETERMINADA_ID}, NEW.cantidad);
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER stock_ubicacion_total AFTER UPDATE OF cantidad ON productos
+        WHEN NEW.cantidad > OLD.cantidad
+        BEGIN
+            INSERT INTO stock_ubicacion (producto_id, ubicacion_id, cantidad) VALUES (NEW.id, {UBICACION_PREDETERMINADA_ID}, NEW.cantidad - OLD.cantidad)
+            ON CONFLICT (producto_id, ubicacion_id) DO UPDATE SET cantidad = cantidad + excluded.cantidad;
+        END
+    ''')
+    # Igual que la salida FEFO de los lotes: cada ubicación cuyo acumulado previo (la
+    # predeterminada primero) no cubre la baja queda con lo que sobra de su acumulado
+    cursor.execute(f'''
+        CREATE TRIGGER stock_ubicacion_salida AFTER UPDATE OF cantidad ON productos
+        WHEN NEW.cantidad < OLD.cantidad
+        BEGIN
+            SELECT RAISE(ABORT, 'el stock de un producto no puede ser negativo') WHERE NEW.cantidad < 0;
+            UPDATE stock_ubicacion SET cantidad = MAX(0, salida.acumulado - (OLD.cantidad - NEW.cantidad))
+            FROM (
+                SELECT ubicacion_id, cantidad,
+                       SUM(cantidad) OVER (ORDER BY ubicacion_id <> {UBICACION_PREDETERMINADA_ID}, ubicacion_id) AS acumulado
+                FROM stock_ubicacion WHERE producto_id = NEW.id AND cantidad > 0
+            ) AS salida
+            WHERE stock_ubicacion.producto_id = NEW.id AND stock_ubicacion.ubicacion_id = salida.ubicacion_id
+              AND salida.acumulado - salida.cantidad < OLD.cantidad - NEW.cantidad;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER stock_ubicacion_baja AFTER DELETE ON productos
+        BEGIN
+            DELETE FROM stock_ubicacion WHERE producto_id = OLD.id;
+        END
+    ''')
+
+# Categorías con las que se inicializa una base nueva
+CATEGORIAS_DEFECTO = (
+    'Fruta', 'Verdura', 'Lácteo', 'Grano', 'Bebida', 'Alcohol',
+    'Papeleria', 'Golosinas', 'Perfumeria', 'Panaderia',
+    'Carnes', 'Congelados', 'Especias y condimentos', 'Limpieza', 'Otros'
+)
+
+# Categorías cuyos productos se reciben por lotes con fecha de vencimiento
+CATEGORIAS_PERECEDERAS = ('Fruta', 'Verdura', 'Lácteo', 'Panaderia', 'Carnes')
+
+def _crear_lotes(cursor):
+    """
+    Crea la tabla de lotes (cantidad con fecha de vencimiento 'AAAA-MM-DD' por producto).
+    El stock en lotes es parte del total del producto (productos.cantidad); lo que no está
+    en ningún lote es stock sin vencimiento conocido. Cualquier baja del total (salidas,
+    modificaciones, actualizaciones masivas) consume primero los lotes que vencen antes
+    (FEFO) mediante un trigger, con un único UPDATE en la misma transacción que la baja.
+    """
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS lotes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            producto_id INTEGER NOT NULL,
+            vencimiento TEXT NOT NULL,
+            cantidad INTEGER NOT NULL,
+            ingresado TEXT NOT NULL DEFAULT ({AHORA_CAMBIOS})
+        )
+    ''')
+    # Lotes de un producto en orden de vencimiento (la salida FEFO recorre este índice)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_lotes_producto_vencimiento ON lotes (producto_id, vencimiento)")
+    # Reporte de vencimientos: recorre solo el rango de fechas pedido, y solo lotes con stock
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_lotes_vencimiento ON lotes (vencimiento, producto_id, id, cantidad) WHERE cantidad > 0")
+    cursor.execute("DROP TRIGGER IF EXISTS lotes_salida_fefo")
+    cursor.execute("DROP TRIGGER IF EXISTS lotes_baja")
+    # Cada lote cuyo acumulado previo (en orden de vencimiento) no cubre la salida queda con
+    # lo que sobra de su acumulado; la subconsulta se evalúa completa antes de escribir.
+    cursor.execute('''
+        CREATE TRIGGER lotes_salida_fefo AFTER UPDATE OF cantidad ON productos
+        WHEN NEW.cantidad < OLD.cantidad
+        BEGIN
+            UPDATE lotes SET cantidad = MAX(0, fefo.acumulado - (OLD.cantidad - NEW.cantidad))
+            FROM (
+                SELECT id, cantidad, SUM(cantidad) OVER (ORDER BY vencimiento, id) AS acumulado
+                FROM lotes WHERE producto_id = NEW.id AND cantidad > 0
+            ) AS fefo
+            WHERE lotes.id = fefo.id AND fefo.acumulado - fefo.cantidad < OLD.cantidad - NEW.cantidad;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER lotes_baja AFTER DELETE ON productos
+        BEGIN
+            DELETE FROM lotes WHERE producto_id = OLD.id;
+        END
+    ''')
+
+# Esquema de la tabla de productos. El precio se guarda en centavos (INTEGER): las sumas
+# son exactas y las comparaciones más baratas que con REAL. Ver a_centavos y formatear_precio.
+# El SKU (código de barras) es opcional y único; ver idx_productos_sku en crear_tablas.
+ESQUEMA_PRODUCTOS = '''
+    CREATE TABLE IF NOT EXISTS {tabla} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nombre TEXT NOT NULL,
+        descripcion TEXT,
+        cantidad INTEGER NOT NULL,
+        precio INTEGER NOT NULL,
+        categoria TEXT NOT NULL,
+        sku TEXT
+    )
+'''
+
+def _migrar_precios_a_centavos(cursor):
+    """
+    Convierte el precio de las bases creadas con versiones anteriores (REAL, en pesos)
+    a centavos enteros. SQLite no permite cambiar el tipo de una columna, así que la tabla
+    se reconstruye dentro de un savepoint conservando los IDs y la secuencia de IDs.
+    Los triggers de la tabla se recrean después en crear_tablas. Retorna True si hubo que migrar.
+    """
+    tipos = {fila['name']: fila['type'].upper() for fila in cursor.execute("PRAGMA table_info(productos)").fetchall()}
+    if tipos.get('precio') != 'REAL':
+        return False
+    fila = cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'productos'").fetchone()
+    secuencia = fila['seq'] if fila else 0
+    cursor.execute("SAVEPOINT migracion_precios")
+    cursor.execute("DROP TABLE IF EXISTS productos_centavos")
+    cursor.execute(ESQUEMA_PRODUCTOS.format(tabla='productos_centavos'))
+    cursor.execute('''
+        INSERT INTO productos_centavos (id, nombre, descripcion, cantidad, precio, categoria)
+        SELECT id, nombre, descripcion, cantidad, CAST(ROUND(precio * 100) AS INTEGER), categoria FROM productos
+    ''')
+    cursor.execute("DROP TABLE productos")
+    cursor.execute("ALTER TABLE productos_centavos RENAME TO productos")
+    cursor.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'productos'", (secuencia,))
+    cursor.execute("RELEASE migracion_precios")
+    return True
+
+def _migrar_columna_sku(cursor):
+    """Agrega la columna sku a las bases creadas con versiones anteriores. Retorna True si hubo que agregarla."""
+    columnas = {fila['name'] for fila in cursor.execute("PRAGMA table_info(productos)").fetchall()}
+    if 'sku' in columnas:
+        return False
+    cursor.execute("ALTER TABLE productos ADD COLUMN sku TEXT")
+    return True
+
+# --- Contraseñas ---
+# Las contraseñas se guardan como 'scrypt$n$r$p$sal$hash' (sal y hash en hexadecimal), con
+# sal aleatoria por usuario. El costo se ajusta por instalación con la variable de entorno
+# INVENTARIO_SCRYPT_N (potencia de 2; cada login usa 128 * SCRYPT_R * SCRYPT_N bytes de
+# memoria, 16 MiB por defecto); 'python rendimiento.py contrasenas' ayuda a elegirlo.
+# Los hashes con otro costo (y las contraseñas en texto plano de versiones anteriores)
+# se actualizan al iniciar sesión.
+SCRYPT_N = int(os.environ.get('INVENTARIO_SCRYPT_N', 2 ** 14))
+SCRYPT_R = 8
+SCRYPT_P = 1
+PREFIJO_HASH = 'scrypt$'
+_hashes_ficticios = {} # Hash de una contraseña cualquiera por costo (ver verificar_contrasena)
+
+def _scrypt(contrasena, sal, n, r, p):
+    # maxmem: lo que pide OpenSSL para estos parámetros (el límite por defecto es 32 MiB)
+    return hashlib.scrypt(contrasena.encode('utf-8'), salt=sal, n=n, r=r, p=p,
+                          maxmem=128 * r * (n + p + 2) + 1024 * 1024, dklen=32)
+
+def hash_contrasena(contrasena, n=None):
+    """Retorna el hash de 'contrasena' para guardar en la tabla usuarios (costo SCRYPT_N si n es None)."""
+    n = n or SCRYPT_N
+    sal = secrets.token_bytes(16)
+    return f"{PREFIJO_HASH}{n}${SCRYPT_R}${SCRYPT_P}${sal.hex()}${_scrypt(contrasena, sal, n, SCRYPT_R, SCRYPT_P).hex()}"
+
+def _preparar_hash_ficticio():
+    """Calcula por adelantado el hash ficticio del costo actual (lo usa crear_tablas)."""
+    if SCRYPT_N not in _hashes_ficticios:
+        _hashes_ficticios[SCRYPT_N] = hash_contrasena(secrets.token_hex(8))
+
+def verificar_contrasena(contrasena, guardada):
+    """
+    Compara 'contrasena' con el valor guardado en tiempo constante. Con guardada=None
+    (usuario inexistente) igual calcula un hash, para que la demora no revele si el
+    usuario existe. Retorna (es_correcta, hay_que_actualizar_el_hash).
+    """
+    if guardada is None:
+        if SCRYPT_N in _hashes_ficticios:
+            verificar_contrasena(contrasena, _hashes_ficticios[SCRYPT_N])
+        else: # Costo cambiado en ejecución: armar el hash ya cuesta un scrypt, igual que verificarlo
+            _preparar_hash_ficticio()
+        return False, False
+    if not guardada.startswith(PREFIJO_HASH): # Texto plano de una versión anterior
+        return hmac.compare_digest(contrasena.encode('utf-8'), guardada.encode('utf-8')), True
+    try:
+        n, r, p, sal, esperado = guardada[len(PREFIJO_HASH):].split('$')
+        n, r, p = int(n), int(r), int(p)
+        calculado = _scrypt(contrasena, bytes.fromhex(sal), n, r, p)
+    except ValueError:
+        print(Fore.RED + "❌ Error: hash de contraseña con formato inválido." + Style.RESET_ALL)
+        return False, False
+    return hmac.compare_digest(calculado, bytes.fromhex(esperado)), (n, r, p) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+
+def _migrar_contrasenas(cursor):
+    """Reemplaza las contraseñas en texto plano de versiones anteriores por su hash. Retorna cuántas migró."""
+    pendientes = cursor.execute("SELECT id, contrasena FROM usuarios WHERE contrasena NOT LIKE ?",
+                                (PREFIJO_HASH + '%',)).fetchall()
+    cursor.executemany("UPDATE usuarios SET contrasena = ? WHERE id = ?",
+                       [(hash_contrasena(fila['contrasena']), fila['id']) for fila in pendientes])
+    return len(pendientes)
+
+def _migrar_columna_cantidad_anterior(cursor):
+    """Agrega la columna cantidad_anterior al registro de cambios de versiones anteriores. Retorna True si hubo que agregarla."""
+    columnas = {fila['name'] for fila in cursor.execute("PRAGMA table_info(cambios)").fetchall()}
+    if 'cantidad_anterior' in columnas:
+        return False
+    cursor.execute("ALTER TABLE cambios ADD COLUMN cantidad_anterior INTEGER")
+    return True
+
 def crear_tablas():
     """
     Crea las tablas necesarias en la base de datos si no existen.
     Esta función de configuración no usa BEGIN/COMMIT/ROLLBACK explícitos porque es una operación
     de inicialización y sqlite3 maneja la transacción implícitamente para CREATE TABLE.
     """
+    _preparar_hash_ficticio() # Así el primer login de un usuario inexistente no tarda el doble
+    almacen = _almacen_activo()
+    if almacen is not None:
+        almacen.crear_tablas()
+        return
     conn = conectar_db()
     if conn:
         try:
             cursor = conn.cursor()
 
+            # Las páginas que liberan las bajas se devuelven en pasos con PRAGMA incremental_vacuum
+            # (ver mantenimiento.py). Solo tiene efecto en una base nueva, antes de crear tablas.
+            cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+
+            # WAL permite que las lecturas del pool de solo lectura avancen mientras hay un escritor
+            cursor.execute("PRAGMA journal_mode=WAL")
+
             # Tabla de Usuarios 
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS usuarios (
@@ -49,6 +1038,9 @@ def crear_tablas():
                 )
             ''')
             print(Fore.GREEN + "✅ Tabla 'usuarios' verificada/creada." + Style.RESET_ALL)
+            migradas = _migrar_contrasenas(cursor)
+            if migradas:
+                print(Fore.GREEN + f"✅ {migradas} contraseña(s) en texto plano reemplazada(s) por su hash." + Style.RESET_ALL)
 
             # Tabla de Categorías
             cursor.execute('''
@@ -61,29 +1053,57 @@ def crear_tablas():
              # Poblar categorías por defecto si está vacía
             cursor.execute("SELECT COUNT(*) as cuenta FROM categorias")
             if cursor.fetchone()['cuenta'] == 0:
-                categorias_defecto = [
-                    'Fruta', 'Verdura', 'Lácteo', 'Grano', 'Bebida', 'Alcohol',
-                    'Papeleria', 'Golosinas', 'Perfumeria', 'Panaderia',
-                    'Carnes', 'Congelados', 'Especias y condimentos', 'Limpieza', 'Otros'
-                ]
-                for cat in categorias_defecto:
+                for cat in CATEGORIAS_DEFECTO:
                     cursor.execute("INSERT INTO categorias (nombre) VALUES (?)", (cat,))
                 conn.commit()
                 print(Fore.GREEN + "✅ Categorías por defecto insertadas." + Style.RESET_ALL)
 
 
-            # Tabla de Productos - Esquema Actualizado
+            # Tabla de Productos - Esquema Actualizado (precio en centavos enteros)
+            cursor.execute(ESQUEMA_PRODUCTOS.format(tabla='productos'))
+            if _migrar_precios_a_centavos(cursor):
+                print(Fore.GREEN + "✅ Precios convertidos a centavos enteros." + Style.RESET_ALL)
+            if _migrar_columna_sku(cursor):
+                print(Fore.GREEN + "✅ Columna 'sku' agregada a la tabla 'productos'." + Style.RESET_ALL)
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_productos_precio ON productos (precio)")
+            # Único e indexado: la recepción por escaneo busca cada código por este índice.
+            # Los productos sin SKU (NULL) no cuentan como duplicados.
+            cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_productos_sku ON productos (sku)")
+            print(Fore.GREEN + "✅ Tabla 'productos' verificada/creada con esquema actualizado." + Style.RESET_ALL)
+
+            # Registro de cambios (change data capture) para sistemas externos, ver cambios.py
             cursor.execute('''
-                CREATE TABLE IF NOT EXISTS productos (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    nombre TEXT NOT NULL,
-                    descripcion TEXT,
-                    cantidad INTEGER NOT NULL,
-                    precio REAL NOT NULL,
-                    categoria TEXT NOT NULL
+                CREATE TABLE IF NOT EXISTS cambios (
+                    secuencia INTEGER PRIMARY KEY AUTOINCREMENT,
+                    tabla TEXT NOT NULL,
+                    operacion TEXT NOT NULL,
+                    registro_id INTEGER NOT NULL,
+                    columnas TEXT,
+                    fecha TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                    cantidad_anterior INTEGER
                 )
             ''')
-            print(Fore.GREEN + "✅ Tabla 'productos' verificada/creada con esquema actualizado." + Style.RESET_ALL)
+            _migrar_columna_cantidad_anterior(cursor)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS consumidores_cambios (
+                    nombre TEXT PRIMARY KEY,
+                    ultima_secuencia INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+            _crear_triggers_cambios(cursor)
+            print(Fore.GREEN + "✅ Registro de cambios verificado/creado." + Style.RESET_ALL)
+
+            # Historial de precios (después del registro de cambios, que se usa para completarlo)
+            _crear_historial_precios(cursor)
+            print(Fore.GREEN + "✅ Historial de precios verificado/creado." + Style.RESET_ALL)
+
+            # Stock por ubicación (salón, trastienda, depósito...)
+            _crear_stock_ubicacion(cursor)
+            print(Fore.GREEN + "✅ Stock por ubicación verificado/creado." + Style.RESET_ALL)
+
+            # Lotes con fecha de vencimiento (salida FEFO)
+            _crear_lotes(cursor)
+            print(Fore.GREEN + "✅ Tabla 'lotes' verificada/creada." + Style.RESET_ALL)
 
             conn.commit() # Confirma los cambios de CREATE TABLE  
         except sqlite3.Error as e:
@@ -97,17 +1117,20 @@ def crear_tablas():
 
 # --- Funciones para Usuarios ---
 
+@_interfaz
 def agregar_usuario(nombre_usuario, contrasena): #parametros obligatorios
     """
     Agrega un nuevo usuario a la base de datos dentro de una transacción.
+    La contraseña se guarda como hash (ver hash_contrasena), nunca en texto plano.
     Retorna True si la operación fue exitosa, False en caso contrario.
     """
+    contrasena_hash = hash_contrasena(contrasena) # Antes de tomar el bloqueo de escritura
     conn = conectar_db()
     if conn:
         try:
-            conn.execute("BEGIN TRANSACTION") # Inicia la transacción
+            iniciar_escritura(conn) # Inicia la transacción (BEGIN IMMEDIATE, con reintentos si la base está ocupada)
             cursor = conn.cursor()
-            cursor.execute("INSERT INTO usuarios (nombre_usuario, contrasena) VALUES (?, ?)", (nombre_usuario, contrasena)) # Inserta el nuevo usuario
+            cursor.execute("INSERT INTO usuarios (nombre_usuario, contrasena) VALUES (?, ?)", (nombre_usuario, contrasena_hash)) # Inserta el nuevo usuario
             conn.commit() # Confirma los cambios si todo fue bien  
             print(Fore.GREEN + f"✅ Usuario '{nombre_usuario}' agregado exitosamente (transacción confirmada)." + Style.RESET_ALL)
             return True
@@ -123,48 +1146,70 @@ def agregar_usuario(nombre_usuario, contrasena): #parametros obligatorios
             conn.close()
     return False
 
+@_interfaz
 def obtener_usuario(nombre_usuario, contrasena): #parametros obligatorios   
     """
-    Verifica las credenciales de un usuario.
-    (Operación de lectura, no requiere transacción explícita).
+    Verifica las credenciales de un usuario: busca el hash por nombre de usuario (índice
+    único) y lo compara en tiempo constante (ver verificar_contrasena). Si el hash guardado
+    está en texto plano o con otro costo, lo actualiza.
     Retorna el nombre de usuario si las credenciales son correctas, None en caso contrario.
     """
-    conn = conectar_db() # Conectar a la base de datos
+    conn = tomar_conexion_lectura() # Conectar a la base de datos
     # Si la conexión es exitosa, se procede a buscar el usuario
+    if not conn:
+        return None
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT contrasena FROM usuarios WHERE nombre_usuario = ?", (nombre_usuario,))
+        usuario = cursor.fetchone()
+    except sqlite3.Error as e:
+        print(Fore.RED + f"❌ Error al obtener usuario: {e}" + Style.RESET_ALL)
+        return None
+    finally: # Devuelve la conexión antes de calcular el hash, que es lo que más demora
+        devolver_conexion_lectura(conn)
+    correcta, actualizar = verificar_contrasena(contrasena, usuario['contrasena'] if usuario else None)
+    if not correcta:
+        return None # Usuario inexistente o contraseña incorrecta
+    if actualizar:
+        _actualizar_hash_usuario(nombre_usuario, contrasena)
+    return nombre_usuario
+
+def _actualizar_hash_usuario(nombre_usuario, contrasena):
+    """Guarda el hash de la contraseña con el costo actual (migración al iniciar sesión)."""
+    contrasena_hash = hash_contrasena(contrasena)
+    conn = conectar_db()
     if conn:
         try:
-            cursor = conn.cursor()
-            cursor.execute("SELECT nombre_usuario FROM usuarios WHERE nombre_usuario = ? AND contrasena = ?", (nombre_usuario, contrasena))
-            usuario = cursor.fetchone()
-            if usuario:
-                return usuario['nombre_usuario']
-            return None # Si no se encuentra el usuario, retorna None
+            iniciar_escritura(conn)
+            conn.execute("UPDATE usuarios SET contrasena = ? WHERE nombre_usuario = ?", (contrasena_hash, nombre_usuario))
+            conn.commit()
         except sqlite3.Error as e:
-            print(Fore.RED + f"❌ Error al obtener usuario: {e}" + Style.RESET_ALL)
-            return None
-        finally: # Cierra la conexión a la base de datos
+            conn.rollback() # El inicio de sesión sigue siendo válido; se reintenta en el próximo
+            print(Fore.YELLOW + f"⚠ No se pudo actualizar el hash de la contraseña de '{nombre_usuario}': {e}" + Style.RESET_ALL)
+        finally:
             conn.close()
-    return None
 
+@_interfaz
 def obtener_todos_los_usuarios():
     """
     Obtiene todos los usuarios registrados en la base de datos.
     (Operación de lectura, no requiere transacción explícita).
-    Retorna una lista de objetos (sqlite3.Row) para facilitar el acceso por nombre de columna.
+    Retorna una lista de objetos (sqlite3.Row) con la columna nombre_usuario (sin contraseñas).
     """
-    conn = conectar_db()
+    conn = tomar_conexion_lectura()
     if conn:
         try:
             cursor = conn.cursor()
-            cursor.execute("SELECT nombre_usuario, contrasena FROM usuarios")
+            cursor.execute("SELECT nombre_usuario FROM usuarios")
             return cursor.fetchall()
         except sqlite3.Error as e:
             print(Fore.RED + f"❌ Error al obtener todos los usuarios: {e}" + Style.RESET_ALL)
             return []
         finally:
-            conn.close()
+            devolver_conexion_lectura(conn)
     return []
 
+@_interfaz
 def eliminar_todos_los_usuarios():
     """
     Elimina todos los usuarios de la base de datos dentro de una transacción.
@@ -173,7 +1218,7 @@ def eliminar_todos_los_usuarios():
     conn = conectar_db()
     if conn:
         try:
-            conn.execute("BEGIN TRANSACTION") # Inicia la transacción
+            iniciar_escritura(conn) # Inicia la transacción (BEGIN IMMEDIATE, con reintentos si la base está ocupada)
             cursor = conn.cursor()
             cursor.execute("DELETE FROM usuarios")
             conn.commit() # Confirma los cambios
@@ -189,21 +1234,59 @@ def eliminar_todos_los_usuarios():
 
 # --- Funciones para Productos ---
 
+# Funciones avisadas después de confirmar un alta, modificación o baja de producto
+# (por ejemplo, el índice de sugerencias en memoria de sugerencias.py)
+_observadores_productos = []
+
+def registrar_observador_productos(funcion):
+    """
+    Registra funcion(id_producto, anterior, nuevo), que se llama después de confirmar
+    cada cambio hecho con agregar_producto, actualizar_producto o eliminar_producto.
+    'anterior' y 'nuevo' son tuplas (nombre, categoria), o None en altas y bajas respectivamente.
+    """
+    if funcion not in _observadores_productos:
+        _observadores_productos.append(funcion)
+
+def quitar_observador_productos(funcion):
+    """Deja de avisar a una función registrada con registrar_observador_productos."""
+    if funcion in _observadores_productos:
+        _observadores_productos.remove(funcion)
+
+def _notificar_productos(id_producto, anterior, nuevo):
+    """
+    Avisa un cambio confirmado a los observadores; sus errores no afectan la operación.
+    Dentro de una transacción agrupada el aviso espera a que se confirme la transacción.
+    """
+    if _transaccion_actual() is not None:
+        _transaccion_actual()._avisos.append((id_producto, anterior, nuevo))
+        return
+    for funcion in list(_observadores_productos):
+        try:
+            funcion(id_producto, anterior, nuevo)
+        except Exception as e:
+            print(Fore.YELLOW + f"⚠ Error al notificar el cambio del producto {id_producto}: {e}" + Style.RESET_ALL)
+
+@_interfaz
 def agregar_producto(nombre, descripcion, cantidad, precio, categoria): #parametros obligatorios
     """
     Agrega un nuevo producto a la base de datos dentro de una transacción.
+    El precio se indica en centavos enteros (ver a_centavos).
     Retorna el ID del nuevo producto si la operación fue exitosa, None en caso contrario.
     """
+    if not isinstance(precio, int):
+        print(Fore.RED + f"❌ Error al agregar producto: el precio debe estar en centavos enteros, se recibió {precio!r}." + Style.RESET_ALL)
+        return None
     conn = conectar_db()
     if conn:
         try:
-            conn.execute("BEGIN TRANSACTION") # Inicia la transacción
+            iniciar_escritura(conn) # Inicia la transacción (BEGIN IMMEDIATE, con reintentos si la base está ocupada)
             cursor = conn.cursor()
             cursor.execute("INSERT INTO productos (nombre, descripcion, cantidad, precio, categoria) VALUES (?, ?, ?, ?, ?)",
                            (nombre, descripcion, cantidad, precio, categoria))
             conn.commit() # Confirma los cambios
             last_id = cursor.lastrowid # Obtiene el ID autoincremental del producto insertado
             print(Fore.GREEN + f"✅ Producto '{nombre}' agregado exitosamente con ID {last_id} (transacción confirmada)." + Style.RESET_ALL)
+            _notificar_productos(last_id, None, (nombre, categoria))
             return last_id
         except sqlite3.Error as e:
             conn.rollback() # Revierte los cambios si hay un error de DB
@@ -213,88 +1296,123 @@ def agregar_producto(nombre, descripcion, cantidad, precio, categoria): #paramet
             conn.close()
     return None
 
-def obtener_todos_los_productos():
+@_interfaz
+@_en_cache
+def obtener_todos_los_productos(formato='row'):
     """
     Obtiene todos los productos registrados en la base de datos.
     (Operación de lectura, no requiere transacción explícita).
     Retorna una lista de objetos (sqlite3.Row) para facilitar el acceso por nombre de columna.
+    Con formato='producto' retorna objetos Producto (más livianos) y con formato='tupla', tuplas.
     """
-    conn = conectar_db()
+    conn = tomar_conexion_lectura()
     if conn:
         try:
-            cursor = conn.cursor()
+            cursor = aplicar_formato(conn.cursor(), formato)
             cursor.execute("SELECT id, nombre, descripcion, cantidad, precio, categoria FROM productos ORDER BY nombre ASC")
             return cursor.fetchall()
         except sqlite3.Error as e:
             print(Fore.RED + f"❌ Error al obtener todos los productos: {e}" + Style.RESET_ALL)
             return []
         finally:
-            conn.close()
+            devolver_conexion_lectura(conn)
     return []
 
-def obtener_producto_por_id_nombre_o_categoria(termino_busqueda):
+def buscar_productos_en(cursor, termino_busqueda):
+    """
+    Ejecuta la búsqueda por ID exacto, nombre (parcial) o categoría (parcial)
+    sobre un cursor ya abierto (de cualquier base de datos con el mismo esquema).
+    Retorna la lista de filas sin duplicados; los errores de SQLite se propagan.
+    """
+    resultados = []
+    ids_vistos = set() # IDs ya agregados, para evitar duplicados sin comparar filas completas
+
+    # 0. Buscar por SKU exacto (por ejemplo, un código de barras escaneado)
+    cursor.execute("SELECT id, nombre, descripcion, cantidad, precio, categoria FROM productos WHERE sku = ?", (termino_busqueda,))
+    producto = cursor.fetchone()
+    if producto:
+        resultados.append(producto)
+        ids_vistos.add(producto[0])
+
+    # 1. Intentar buscar por ID (si es numérico)
+    if termino_busqueda.isdigit():
+        id_busqueda = int(termino_busqueda)
+        cursor.execute("SELECT id, nombre, descripcion, cantidad, precio, categoria FROM productos WHERE id = ?", (id_busqueda,))
+        producto = cursor.fetchone()
+        if producto and producto[0] not in ids_vistos:
+            resultados.append(producto)
+            ids_vistos.add(producto[0])
+
+    # 2. Buscar por nombre (parcial, insensible a mayúsculas/minúsculas)
+    # Esto se ejecuta incluso si se encontró por ID para permitir búsquedas múltiples.
+    cursor.execute("SELECT id, nombre, descripcion, cantidad, precio, categoria FROM productos WHERE LOWER(nombre) LIKE ?",
+                   (f'%{termino_busqueda.lower()}%',))
+    # Añadir resultados, evitando duplicados si ya se encontró por ID
+    for row in cursor.fetchall():
+        if row[0] not in ids_vistos:
+            resultados.append(row)
+            ids_vistos.add(row[0])
+
+    # 3. Buscar por categoría (parcial, insensible a mayúsculas/minúsculas)
+    cursor.execute("SELECT id, nombre, descripcion, cantidad, precio, categoria FROM productos WHERE LOWER(categoria) LIKE ?",
+                   (f'%{termino_busqueda.lower()}%',))
+    # Añadir resultados, evitando duplicados
+    for row in cursor.fetchall():
+        if row[0] not in ids_vistos:
+            resultados.append(row)
+            ids_vistos.add(row[0])
+
+    return resultados
+
+@_interfaz
+@_en_cache
+def obtener_producto_por_id_nombre_o_categoria(termino_busqueda, formato='row'):
     """
     Busca productos por ID exacto, nombre (parcial) o categoría (parcial).
     (Operación de lectura, no requiere transacción explícita).
     Retorna una lista de objetos (sqlite3.Row) de productos encontrados.
+    El parámetro 'formato' funciona igual que en obtener_todos_los_productos.
     """
-    conn = conectar_db()
+    conn = tomar_conexion_lectura()
     if conn:
         try:
-            cursor = conn.cursor()
-            resultados = []
-
-            # 1. Intentar buscar por ID (si es numérico)
-            if termino_busqueda.isdigit():
-                id_busqueda = int(termino_busqueda)
-                cursor.execute("SELECT id, nombre, descripcion, cantidad, precio, categoria FROM productos WHERE id = ?", (id_busqueda,))
-                producto = cursor.fetchone()
-                if producto:
-                    resultados.append(producto)
-            
-            # 2. Buscar por nombre (parcial, insensible a mayúsculas/minúsculas)
-            # Esto se ejecuta incluso si se encontró por ID para permitir búsquedas múltiples.
-            cursor.execute("SELECT id, nombre, descripcion, cantidad, precio, categoria FROM productos WHERE LOWER(nombre) LIKE ?",
-                           (f'%{termino_busqueda.lower()}%',))
-            # Añadir resultados, evitando duplicados si ya se encontró por ID
-            for row in cursor.fetchall():
-                if row not in resultados:
-                    resultados.append(row)
-
-            # 3. Buscar por categoría (parcial, insensible a mayúsculas/minúsculas)
-            cursor.execute("SELECT id, nombre, descripcion, cantidad, precio, categoria FROM productos WHERE LOWER(categoria) LIKE ?",
-                           (f'%{termino_busqueda.lower()}%',))
-            # Añadir resultados, evitando duplicados
-            for row in cursor.fetchall():
-                if row not in resultados:
-                    resultados.append(row)
-
-            return resultados
+            cursor = aplicar_formato(conn.cursor(), formato)
+            return buscar_productos_en(cursor, termino_busqueda)
         except sqlite3.Error as e:
             print(Fore.RED + f"❌ Error al buscar productos: {e}" + Style.RESET_ALL)
             return []
         finally:
-            conn.close()
+            devolver_conexion_lectura(conn)
     return []
 
+@_interfaz
 def actualizar_producto(id_producto, nuevo_nombre, nueva_descripcion, nueva_cantidad, nuevo_precio, nueva_categoria):
     """
     Actualiza los datos de un producto existente por su ID dentro de una transacción.
+    El precio se indica en centavos enteros (ver a_centavos).
     Retorna True si la operación fue exitosa, False en caso contrario.
     """
+    if not isinstance(nuevo_precio, int):
+        print(Fore.RED + f"❌ Error al actualizar producto con ID {id_producto}: el precio debe estar en centavos enteros, se recibió {nuevo_precio!r}." + Style.RESET_ALL)
+        return False
     conn = conectar_db()
     if conn:
         try:
-            conn.execute("BEGIN TRANSACTION") # Inicia la transacción
+            iniciar_escritura(conn) # Inicia la transacción (BEGIN IMMEDIATE, con reintentos si la base está ocupada)
             cursor = conn.cursor()
+            anterior = None
+            if _observadores_productos: # Los observadores necesitan el nombre y la categoría previos
+                anterior = cursor.execute("SELECT nombre, categoria FROM productos WHERE id = ?", (id_producto,)).fetchone()
             cursor.execute('''
                 UPDATE productos
                 SET nombre = ?, descripcion = ?, cantidad = ?, precio = ?, categoria = ?
                 WHERE id = ?
             ''', (nuevo_nombre, nueva_descripcion, nueva_cantidad, nuevo_precio, nueva_categoria, id_producto))
-            conn.commit() # Confirma los cambios
             if cursor.rowcount > 0:
+                conn.commit() # Confirma los cambios
                 print(Fore.GREEN + f"✅ Producto con ID {id_producto} actualizado exitosamente (transacción confirmada)." + Style.RESET_ALL)
+                if anterior:
+                    _notificar_productos(id_producto, tuple(anterior), (nuevo_nombre, nueva_categoria))
                 return True
             else:
                 conn.rollback() # Revierte si no se encontró el producto (aunque no es un error, mantiene la consistencia)
@@ -309,6 +1427,7 @@ def actualizar_producto(id_producto, nuevo_nombre, nueva_descripcion, nueva_cant
     return False
 
 
+@_interfaz
 def eliminar_producto(id_producto):
     """
     Elimina un producto de la base de datos por su ID dentro de una transacción.
@@ -317,18 +1436,19 @@ def eliminar_producto(id_producto):
     conn = conectar_db()
     if conn:
         try:
-            conn.execute("BEGIN TRANSACTION") # Inicia la transacción
+            iniciar_escritura(conn) # Inicia la transacción (BEGIN IMMEDIATE, con reintentos si la base está ocupada)
             cursor = conn.cursor()
             # Primero, obtenemos el nombre del producto para el mensaje de confirmación
-            cursor.execute("SELECT nombre FROM productos WHERE id = ?", (id_producto,))
+            cursor.execute("SELECT nombre, categoria FROM productos WHERE id = ?", (id_producto,))
             nombre_producto_fila = cursor.fetchone()
 
             if nombre_producto_fila: # Si el producto existe
                 nombre_producto = nombre_producto_fila['nombre']
                 cursor.execute("DELETE FROM productos WHERE id = ?", (id_producto,))
-                conn.commit() # Confirma los cambios
                 if cursor.rowcount > 0: # Se eliminó al menos un producto
+                    conn.commit() # Confirma los cambios
                     print(Fore.GREEN + f"✅ Producto '{nombre_producto}' (ID: {id_producto}) eliminado exitosamente (transacción confirmada)." + Style.RESET_ALL)
+                    _notificar_productos(id_producto, tuple(nombre_producto_fila), None)
                     return True
                 else:
                     # Este caso es poco probable si nombre_producto_fila ya encontró algo
@@ -347,31 +1467,561 @@ def eliminar_producto(id_producto):
             conn.close()
     return False
 
-def obtener_productos_por_cantidad_limite(limite_cantidad):
+# --- Funciones de SKU / código de barras ---
+
+@_interfaz
+def asignar_sku(id_producto, sku):
+    """
+    Asigna (o quita, con sku=None) el SKU de un producto dentro de una transacción.
+    El SKU es único: si ya lo tiene otro producto la operación se revierte.
+    Retorna True si la operación fue exitosa, False en caso contrario.
+    """
+    if sku is not None:
+        sku = sku.strip() or None # Un SKU vacío equivale a quitarlo
+    conn = conectar_db()
+    if conn:
+        try:
+            iniciar_escritura(conn)
+            cursor = conn.cursor()
+            cursor.execute("UPDATE productos SET sku = ? WHERE id = ?", (sku, id_producto))
+            if cursor.rowcount == 0:
+                conn.rollback()
+                print(Fore.YELLOW + f"⚠ No se encontró ningún producto con el ID {id_producto} para asignar el SKU (transacción revertida)." + Style.RESET_ALL)
+                return False
+            conn.commit()
+            print(Fore.GREEN + f"✅ SKU del producto con ID {id_producto} actualizado a '{sku or '(ninguno)'}' (transacción confirmada)." + Style.RESET_ALL)
+            return True
+        except sqlite3.IntegrityError:
+            conn.rollback()
+            print(Fore.RED + f"❌ Error: el SKU '{sku}' ya está asignado a otro producto (transacción revertida)." + Style.RESET_ALL)
+            return False
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(Fore.RED + f"❌ Error al asignar el SKU al producto con ID {id_producto}: {e} (transacción revertida)." + Style.RESET_ALL)
+            return False
+        finally:
+            conn.close()
+    return False
+
+@_interfaz
+def obtener_producto_por_sku(sku, formato='row'):
+    """
+    Obtiene el producto con el SKU indicado (búsqueda exacta por el índice único).
+    Retorna la fila, o None si no existe o hubo un error.
+    El parámetro 'formato' funciona igual que en obtener_todos_los_productos.
+    """
+    conn = tomar_conexion_lectura()
+    if conn:
+        try:
+            cursor = aplicar_formato(conn.cursor(), formato)
+            cursor.execute("SELECT id, nombre, descripcion, cantidad, precio, categoria FROM productos WHERE sku = ?", (sku,))
+            return cursor.fetchone()
+        except sqlite3.Error as e:
+            print(Fore.RED + f"❌ Error al buscar el SKU '{sku}': {e}" + Style.RESET_ALL)
+            return None
+        finally:
+            devolver_conexion_lectura(conn)
+    return None
+
+@_interfaz
+def incrementar_stock_por_sku(conteos):
+    """
+    Suma al stock las unidades recibidas, indicadas como {sku: unidades}, en una sola
+    transacción: un UPDATE por SKU distinto, resuelto con el índice único de sku.
+    Retorna la lista de SKU que no corresponden a ningún producto (vacía si se
+    aplicaron todos), o None si hubo un error y se revirtió la transacción.
+    """
+    if not conteos:
+        return []
+    conn = conectar_db()
+    if conn:
+        try:
+            iniciar_escritura(conn)
+            cursor = conn.cursor()
+            desconocidos = []
+            for sku, unidades in conteos.items():
+                cursor.execute("UPDATE productos SET cantidad = cantidad + ? WHERE sku = ?", (unidades, sku))
+                if cursor.rowcount == 0:
+                    desconocidos.append(sku)
+            conn.commit()
+            print(Fore.GREEN + f"✅ Stock incrementado en {len(conteos) - len(desconocidos)} producto(s) (transacción confirmada)." + Style.RESET_ALL)
+            return desconocidos
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(Fore.RED + f"❌ Error al incrementar el stock por SKU: {e} (transacción revertida)." + Style.RESET_ALL)
+            return None
+        finally:
+            conn.close()
+    return None
+
+# --- Funciones de historial de precios ---
+
+def _limite_fecha(fecha):
+    """
+    Convierte una fecha (datetime, date o texto 'AAAA-MM-DD[ HH:MM[:SS]]') al formato de
+    vigente_desde. Una fecha sin hora abarca el día completo (hasta las 23:59:59.999).
+    """
+    if isinstance(fecha, datetime.datetime):
+        return fecha.strftime('%Y-%m-%d %H:%M:%S.%f')[:23]
+    if isinstance(fecha, datetime.date):
+        fecha = fecha.isoformat()
+    fecha = str(fecha).strip().replace('T', ' ')
+    return fecha + ' 23:59:59.999' if len(fecha) == 10 else fecha
+
+def precio_vigente_en(cursor, id_producto, fecha):
+    """
+    Precio (en centavos) que tenía un producto en 'fecha', con una sola búsqueda en la
+    clave (producto_id, vigente_desde) sobre un cursor ya abierto. None si no existía.
+    """
+    fila = cursor.execute('''
+        SELECT precio FROM historial_precios
+        WHERE producto_id = ? AND vigente_desde <= ?
+        ORDER BY vigente_desde DESC LIMIT 1
+    ''', (id_producto, _limite_fecha(fecha))).fetchone()
+    return fila[0] if fila else None
+
+def obtener_precio_vigente(id_producto, fecha):
+    """
+    Retorna el precio (en centavos) que tenía el producto en 'fecha' (ver _limite_fecha;
+    las fechas son UTC, como las del registro de cambios), o None si el producto no
+    existía en esa fecha o hubo un error.
+    """
+    conn = tomar_conexion_lectura()
+    if conn:
+        try:
+            return precio_vigente_en(conn.cursor(), id_producto, fecha)
+        except sqlite3.Error as e:
+            print(Fore.RED + f"❌ Error al consultar el precio del producto {id_producto}: {e}" + Style.RESET_ALL)
+            return None
+        finally:
+            devolver_conexion_lectura(conn)
+    return None
+
+def obtener_historial_precios(id_producto):
+    """
+    Retorna la lista de (vigente_desde, precio en centavos) de un producto, del más
+    reciente al más antiguo, o una lista vacía si no tiene historial o hubo un error.
+    """
+    conn = tomar_conexion_lectura()
+    if conn:
+        try:
+            cursor = aplicar_formato(conn.cursor(), 'tupla')
+            cursor.execute('''
+                SELECT vigente_desde, precio FROM historial_precios
+                WHERE producto_id = ? ORDER BY vigente_desde DESC
+            ''', (id_producto,))
+            return cursor.fetchall()
+        except sqlite3.Error as e:
+            print(Fore.RED + f"❌ Error al obtener el historial de precios del producto {id_producto}: {e}" + Style.RESET_ALL)
+            return []
+        finally:
+            devolver_conexion_lectura(conn)
+    return []
+
+def obtener_precios_vigentes(fecha, formato='row'):
+    """
+    Catálogo de precios a una fecha: (id, nombre, categoria, precio en centavos) de cada
+    producto actual que ya existía en 'fecha'. Es una búsqueda en el índice por producto,
+    así que el costo no crece con los años de historial acumulado.
+    El parámetro 'formato' acepta 'row' o 'tupla'.
+    """
+    conn = tomar_conexion_lectura()
+    if conn:
+        try:
+            cursor = aplicar_formato(conn.cursor(), formato)
+            cursor.execute('''
+                SELECT id, nombre, categoria, precio FROM (
+                    SELECT p.id, p.nombre, p.categoria,
+                           (SELECT h.precio FROM historial_precios h
+                            WHERE h.producto_id = p.id AND h.vigente_desde <= ?
+                            ORDER BY h.vigente_desde DESC LIMIT 1) AS precio
+                    FROM productos p
+                ) WHERE precio IS NOT NULL ORDER BY nombre ASC
+            ''', (_limite_fecha(fecha),))
+            return cursor.fetchall()
+        except sqlite3.Error as e:
+            print(Fore.RED + f"❌ Error al obtener los precios vigentes: {e}" + Style.RESET_ALL)
+            return []
+        finally:
+            devolver_conexion_lectura(conn)
+    return []
+
+# --- Funciones de stock por ubicación ---
+
+@_en_cache
+def obtener_ubicaciones():
+    """Devuelve la lista de nombres de ubicaciones, la predeterminada primero."""
+    conn = tomar_conexion_lectura()
+    if conn:
+        try:
+            return [fila[0] for fila in conn.execute("SELECT nombre FROM ubicaciones ORDER BY id ASC")]
+        except sqlite3.Error as e:
+            print(Fore.RED + f"❌ Error al obtener ubicaciones: {e}" + Style.RESET_ALL)
+            return []
+        finally:
+            devolver_conexion_lectura(conn)
+    return []
+
+def agregar_ubicacion(nombre_ubicacion):
+    """
+    Agrega una nueva ubicación si no existe. Retorna True si se agregó o ya existía, False si hubo error.
+    """
+    conn = conectar_db()
+    if conn:
+        try:
+            iniciar_escritura(conn)
+            conn.execute("INSERT OR IGNORE INTO ubicaciones (nombre) VALUES (?)", (nombre_ubicacion,))
+            conn.commit()
+            return True
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(Fore.RED + f"❌ Error al agregar ubicación: {e}" + Style.RESET_ALL)
+            return False
+        finally:
+            conn.close()
+    return False
+
+def obtener_stock_por_ubicacion(nombre_ubicacion, formato='row'):
+    """
+    Lista (id, nombre, cantidad) de los productos con stock distinto de cero en una
+    ubicación, ordenados por nombre. Recorre solo el índice idx_stock_ubicacion_ubicacion
+    de esa ubicación. El parámetro 'formato' acepta 'row' o 'tupla'.
+    """
+    conn = tomar_conexion_lectura()
+    if conn:
+        try:
+            cursor = aplicar_formato(conn.cursor(), formato)
+            cursor.execute('''
+                SELECT p.id, p.nombre, s.cantidad
+                FROM ubicaciones u
+                JOIN stock_ubicacion s ON s.ubicacion_id = u.id
+                JOIN productos p ON p.id = s.producto_id
+                WHERE u.nombre = ? AND s.cantidad != 0
+                ORDER BY p.nombre ASC
+            ''', (nombre_ubicacion,))
+            return cursor.fetchall()
+        except sqlite3.Error as e:
+            print(Fore.RED + f"❌ Error al obtener el stock de la ubicación '{nombre_ubicacion}': {e}" + Style.RESET_ALL)
+            return []
+        finally:
+            devolver_conexion_lectura(conn)
+    return []
+
+def obtener_stock_de_producto(id_producto):
+    """
+    Desglose del stock de un producto: lista de (ubicación, cantidad) con las ubicaciones
+    donde tiene stock, leída de la clave (producto_id, ubicacion_id).
+    """
+    conn = tomar_conexion_lectura()
+    if conn:
+        try:
+            return [tuple(fila) for fila in conn.execute('''
+                SELECT u.nombre, s.cantidad FROM stock_ubicacion s JOIN ubicaciones u ON u.id = s.ubicacion_id
+                WHERE s.producto_id = ? AND s.cantidad != 0 ORDER BY s.ubicacion_id
+            ''', (id_producto,))]
+        except sqlite3.Error as e:
+            print(Fore.RED + f"❌ Error al obtener el stock por ubicación del producto {id_producto}: {e}" + Style.RESET_ALL)
+            return []
+        finally:
+            devolver_conexion_lectura(conn)
+    return []
+
+def _id_ubicacion(cursor, nombre_ubicacion):
+    fila = cursor.execute("SELECT id FROM ubicaciones WHERE nombre = ?", (nombre_ubicacion,)).fetchone()
+    if fila is None:
+        raise ValueError(f"la ubicación '{nombre_ubicacion}' no existe")
+    return fila[0]
+
+def _mover_stock(cursor, id_producto, origen_id, destino_id, unidades):
+    """Mueve unidades entre dos ubicaciones (sin cambiar el total). Lanza ValueError si el origen no alcanza."""
+    cursor.execute("UPDATE stock_ubicacion SET cantidad = cantidad - ? WHERE producto_id = ? AND ubicacion_id = ? AND cantidad >= ?",
+                   (unidades, id_producto, origen_id, unidades))
+    if cursor.rowcount == 0:
+        raise ValueError(f"no hay {unidades} unidad(es) del producto {id_producto} en el origen")
+    cursor.execute('''
+        INSERT INTO stock_ubicacion (producto_id, ubicacion_id, cantidad) VALUES (?, ?, ?)
+        ON CONFLICT (producto_id, ubicacion_id) DO UPDATE SET cantidad = cantidad + excluded.cantidad
+    ''', (id_producto, destino_id, unidades))
+
+def transferir_stock(origen, destino, cantidades):
+    """
+    Transfiere stock entre dos ubicaciones (por nombre). 'cantidades' es {id de producto: unidades}.
+    Todas las transferencias se aplican en una sola transacción: si a algún producto no le
+    alcanza el stock del origen no se aplica ninguna. El total de cada producto no cambia.
+    Retorna True si la operación fue exitosa, False en caso contrario.
+    """
+    conn = conectar_db()
+    if conn:
+        try:
+            iniciar_escritura(conn)
+            cursor = conn.cursor()
+            origen_id, destino_id = _id_ubicacion(cursor, origen), _id_ubicacion(cursor, destino)
+            for id_producto, unidades in cantidades.items():
+                if unidades <= 0:
+                    raise ValueError(f"la cantidad a transferir del producto {id_producto} debe ser positiva")
+                _mover_stock(cursor, id_producto, origen_id, destino_id, unidades)
+            conn.commit()
+            print(Fore.GREEN + f"✅ {sum(cantidades.values())} unidad(es) de {len(cantidades)} producto(s) transferida(s) "
+                  f"de '{origen}' a '{destino}' (transacción confirmada)." + Style.RESET_ALL)
+            return True
+        except (sqlite3.Error, ValueError) as e:
+            conn.rollback()
+            print(Fore.RED + f"❌ Error al transferir stock: {e} (transacción revertida)." + Style.RESET_ALL)
+            return False
+        finally:
+            conn.close()
+    return False
+
+def ajustar_stock_en_ubicacion(id_producto, nombre_ubicacion, diferencia):
+    """
+    Suma (o resta, con 'diferencia' negativa) unidades al stock de un producto en una
+    ubicación, actualizando también su total, en una sola transacción. El cambio del total
+    pasa por la ubicación predeterminada (ver _crear_stock_ubicacion) y se mueve a la indicada
+    (en una baja, las unidades se mueven antes a la predeterminada, que se descuenta primero).
+    Retorna True si la operación fue exitosa, False en caso contrario.
+    """
+    conn = conectar_db()
+    if conn:
+        try:
+            iniciar_escritura(conn)
+            cursor = conn.cursor()
+            ubicacion_id = _id_ubicacion(cursor, nombre_ubicacion)
+            if diferencia < 0 and ubicacion_id != UBICACION_PREDETERMINADA_ID:
+                _mover_stock(cursor, id_producto, ubicacion_id, UBICACION_PREDETERMINADA_ID, -diferencia)
+            cursor.execute("UPDATE productos SET cantidad = cantidad + ? WHERE id = ?", (diferencia, id_producto))
+            if cursor.rowcount == 0:
+                raise ValueError(f"no existe el producto con ID {id_producto}")
+            if diferencia > 0 and ubicacion_id != UBICACION_PREDETERMINADA_ID:
+                _mover_stock(cursor, id_producto, UBICACION_PREDETERMINADA_ID, ubicacion_id, diferencia)
+            conn.commit()
+            print(Fore.GREEN + f"✅ Stock del producto {id_producto} en '{nombre_ubicacion}' ajustado en {diferencia:+d} (transacción confirmada)." + Style.RESET_ALL)
+            return True
+        except (sqlite3.Error, ValueError) as e:
+            conn.rollback()
+            print(Fore.RED + f"❌ Error al ajustar el stock: {e} (transacción revertida)." + Style.RESET_ALL)
+            return False
+        finally:
+            conn.close()
+    return False
+
+# --- Funciones de lotes y vencimientos ---
+
+def _fecha_vencimiento(fecha):
+    """Normaliza una fecha de vencimiento (date o texto 'AAAA-MM-DD') a 'AAAA-MM-DD'. Lanza ValueError si no es válida."""
+    if isinstance(fecha, datetime.date):
+        return fecha.isoformat()[:10]
+    return datetime.date.fromisoformat(str(fecha).strip()).isoformat()
+
+def registrar_lote(id_producto, cantidad, vencimiento, sumar_al_stock=True):
+    """
+    Registra un lote de 'cantidad' unidades de un producto con su fecha de vencimiento.
+    Con 'sumar_al_stock' (recepción de mercadería) también suma la cantidad al total del
+    producto; sin él, asigna el vencimiento a stock ya cargado, que no puede superar el
+    stock del producto que todavía no está en ningún lote.
+    Retorna el ID del lote, o None si hubo un error.
+    """
+    conn = conectar_db()
+    if conn:
+        try:
+            vencimiento = _fecha_vencimiento(vencimiento)
+            if cantidad <= 0:
+                raise ValueError("la cantidad del lote debe ser positiva")
+            iniciar_escritura(conn)
+            cursor = conn.cursor()
+            fila = cursor.execute('''
+                SELECT p.cantidad - COALESCE((SELECT SUM(l.cantidad) FROM lotes l WHERE l.producto_id = p.id), 0)
+                FROM productos p WHERE p.id = ?
+            ''', (id_producto,)).fetchone()
+            if fila is None:
+                raise ValueError(f"no existe el producto con ID {id_producto}")
+            if sumar_al_stock:
+                cursor.execute("UPDATE productos SET cantidad = cantidad + ? WHERE id = ?", (cantidad, id_producto))
+            elif cantidad > fila[0]:
+                raise ValueError(f"el producto solo tiene {max(fila[0], 0)} unidad(es) sin lote")
+            cursor.execute("INSERT INTO lotes (producto_id, vencimiento, cantidad) VALUES (?, ?, ?)",
+                           (id_producto, vencimiento, cantidad))
+            conn.commit()
+            print(Fore.GREEN + f"✅ Lote de {cantidad} unidad(es) del producto {id_producto} con vencimiento {vencimiento} registrado (transacción confirmada)." + Style.RESET_ALL)
+            return cursor.lastrowid
+        except (sqlite3.Error, ValueError) as e:
+            conn.rollback()
+            print(Fore.RED + f"❌ Error al registrar el lote: {e}" + Style.RESET_ALL)
+            return None
+        finally:
+            conn.close()
+    return None
+
+def registrar_salidas(salidas):
+    """
+    Registra salidas de stock: 'salidas' es {id de producto: unidades}. Todas se aplican en
+    una sola transacción; si algún producto no tiene stock suficiente no se aplica ninguna.
+    Los lotes se consumen en orden de vencimiento (trigger lotes_salida_fefo) y, agotados
+    los lotes, el stock sin lote.
+    Retorna True si la operación fue exitosa, False en caso contrario.
+    """
+    conn = conectar_db()
+    if conn:
+        try:
+            iniciar_escritura(conn)
+            cursor = conn.cursor()
+            for id_producto, unidades in salidas.items():
+                if unidades <= 0:
+                    raise ValueError(f"la salida del producto {id_producto} debe ser positiva")
+                cursor.execute("UPDATE productos SET cantidad = cantidad - ? WHERE id = ? AND cantidad >= ?",
+                               (unidades, id_producto, unidades))
+                if cursor.rowcount == 0:
+                    raise ValueError(f"el producto {id_producto} no existe o no tiene {unidades} unidad(es)")
+            conn.commit()
+            print(Fore.GREEN + f"✅ Salida de {sum(salidas.values())} unidad(es) de {len(salidas)} producto(s) registrada (transacción confirmada)." + Style.RESET_ALL)
+            return True
+        except (sqlite3.Error, ValueError) as e:
+            conn.rollback()
+            print(Fore.RED + f"❌ Error al registrar la salida: {e} (transacción revertida)." + Style.RESET_ALL)
+            return False
+        finally:
+            conn.close()
+    return False
+
+def obtener_lotes_de_producto(id_producto):
+    """
+    Lotes con stock de un producto, en el orden en que se consumen (vencimiento más
+    próximo primero): lista de (id del lote, vencimiento, cantidad).
+    """
+    conn = tomar_conexion_lectura()
+    if conn:
+        try:
+            return [tuple(fila) for fila in conn.execute(
+                "SELECT id, vencimiento, cantidad FROM lotes WHERE producto_id = ? AND cantidad > 0 ORDER BY vencimiento, id",
+                (id_producto,))]
+        except sqlite3.Error as e:
+            print(Fore.RED + f"❌ Error al obtener los lotes del producto {id_producto}: {e}" + Style.RESET_ALL)
+            return []
+        finally:
+            devolver_conexion_lectura(conn)
+    return []
+
+def obtener_lotes_por_vencer(dias, formato='row'):
+    """
+    Lotes con stock que vencen dentro de 'dias' días (incluidos los ya vencidos), del más
+    próximo al más lejano: filas (lote, producto_id, nombre, categoria, vencimiento, cantidad).
+    Recorre solo ese rango del índice idx_lotes_vencimiento. El parámetro 'formato' acepta 'row' o 'tupla'.
+    """
+    conn = tomar_conexion_lectura()
+    if conn:
+        try:
+            limite = (datetime.date.today() + datetime.timedelta(days=dias)).isoformat()
+            cursor = aplicar_formato(conn.cursor(), formato)
+            cursor.execute('''
+                SELECT l.id AS lote, l.producto_id, p.nombre, p.categoria, l.vencimiento, l.cantidad
+                FROM lotes l JOIN productos p ON p.id = l.producto_id
+                WHERE l.vencimiento <= ? AND l.cantidad > 0
+                ORDER BY l.vencimiento, l.producto_id, l.id
+            ''', (limite,))
+            return cursor.fetchall()
+        except sqlite3.Error as e:
+            print(Fore.RED + f"❌ Error al obtener los lotes por vencer: {e}" + Style.RESET_ALL)
+            return []
+        finally:
+            devolver_conexion_lectura(conn)
+    return []
+
+# Operaciones masivas: columna que modifican y expresión SQL del nuevo valor ('?' es el valor indicado)
+OPERACIONES_MASIVAS = {
+    'porcentaje': ('precio', "MAX(CAST(ROUND(precio * (1 + ? / 100.0)) AS INTEGER), 0)"),
+    'monto': ('precio', "MAX(precio + ?, 0)"),
+    'categoria': ('categoria', "?"),
+    'stock': ('cantidad', "?"),
+}
+
+def _filtro_masivo(categoria=None, precio_min=None, precio_max=None, cantidad_min=None, cantidad_max=None):
+    """Arma la condición WHERE (y sus parámetros) de una operación masiva; los filtros en None no se aplican."""
+    condiciones, parametros = [], []
+    for condicion, valor in (("categoria = ?", categoria), ("precio >= ?", precio_min), ("precio <= ?", precio_max),
+                             ("cantidad >= ?", cantidad_min), ("cantidad <= ?", cantidad_max)):
+        if valor is not None:
+            condiciones.append(condicion)
+            parametros.append(valor)
+    return " AND ".join(condiciones) or "1", parametros
+
+def actualizar_productos_en_lote(operacion, valor, categoria=None, precio_min=None, precio_max=None,
+                                 cantidad_min=None, cantidad_max=None, simular=False):
+    """
+    Aplica una operación de OPERACIONES_MASIVAS a todos los productos que cumplen los
+    filtros con una sola sentencia UPDATE, dentro de una transacción: 'porcentaje' y
+    'monto' (en centavos) cambian el precio (nunca queda negativo), 'categoria' reasigna la categoría
+    y 'stock' fija la cantidad. Los productos que ya tienen el valor final no se tocan.
+    Los filtros de precio también se indican en centavos.
+    Retorna la lista de cambios (id, nombre, valor anterior, valor nuevo), o None si hubo un error.
+    Con simular=True solo calcula esa lista, sin modificar la base.
+    """
+    columna, expresion = OPERACIONES_MASIVAS[operacion]
+    donde, parametros = _filtro_masivo(categoria, precio_min, precio_max, cantidad_min, cantidad_max)
+    donde = f"{donde} AND {columna} IS NOT {expresion}"
+    parametros = parametros + [valor]
+    consulta_previa = f"SELECT id, nombre, {columna}, {expresion} FROM productos WHERE {donde} ORDER BY id"
+    conn = tomar_conexion_lectura() if simular else conectar_db()
+    if conn:
+        try:
+            if simular:
+                return [tuple(fila) for fila in conn.execute(consulta_previa, [valor] + parametros)]
+            iniciar_escritura(conn) # Nadie puede modificar los productos entre la consulta y el UPDATE
+            cambios = [tuple(fila) for fila in conn.execute(consulta_previa, [valor] + parametros)]
+            cursor = conn.execute(f"UPDATE productos SET {columna} = {expresion} WHERE {donde}", [valor] + parametros)
+            conn.commit()
+            print(Fore.GREEN + f"✅ {cursor.rowcount} producto(s) actualizado(s) en una sola operación (transacción confirmada)." + Style.RESET_ALL)
+            if columna == 'categoria':
+                for id_producto, nombre, anterior, nuevo in cambios:
+                    _notificar_productos(id_producto, (nombre, anterior), (nombre, nuevo))
+            return cambios
+        except sqlite3.Error as e:
+            if not simular:
+                conn.rollback()
+            print(Fore.RED + f"❌ Error en la actualización masiva: {e} (transacción revertida)." + Style.RESET_ALL)
+            return None
+        finally:
+            if simular:
+                devolver_conexion_lectura(conn)
+            else:
+                conn.close()
+    return None
+
+def productos_bajo_limite_en(cursor, limite_cantidad):
+    """
+    Ejecuta la consulta de productos con cantidad igual o inferior al límite sobre
+    un cursor ya abierto. Retorna las filas; los errores de SQLite se propagan.
+    """
+    cursor.execute("SELECT id, nombre, descripcion, cantidad, precio, categoria FROM productos WHERE cantidad <= ? ORDER BY cantidad ASC, nombre ASC", (limite_cantidad,))
+    return cursor.fetchall()
+
+@_interfaz
+@_en_cache
+def obtener_productos_por_cantidad_limite(limite_cantidad, formato='row'):
     """
     Obtiene productos cuya cantidad es igual o inferior a un límite especificado.
     (Operación de lectura, no requiere transacción explícita).
     Retorna una lista de objetos (sqlite3.Row) de productos.
+    El parámetro 'formato' funciona igual que en obtener_todos_los_productos.
     """
-    conn = conectar_db()
+    conn = tomar_conexion_lectura()
     if conn:
         try:
-            cursor = conn.cursor()
-            cursor.execute("SELECT id, nombre, descripcion, cantidad, precio, categoria FROM productos WHERE cantidad <= ? ORDER BY cantidad ASC, nombre ASC", (limite_cantidad,))
-            return cursor.fetchall() # Retorna todos los productos que cumplen con la condición
+            cursor = aplicar_formato(conn.cursor(), formato)
+            return productos_bajo_limite_en(cursor, limite_cantidad) # Retorna todos los productos que cumplen con la condición
         except sqlite3.Error as e: # Manejo de errores de la base de datos
             # Si ocurre un error, se imprime un mensaje y se retorna una lista vacía
             print(Fore.RED + f"❌ Error al obtener productos por cantidad límite: {e}" + Style.RESET_ALL)
             return []
         finally:
-            conn.close()
+            devolver_conexion_lectura(conn)
     return []
 
+@_interfaz
+@_en_cache
 def obtener_categorias():
     """
     Devuelve una lista de nombres de todas las categorías ordenadas alfabéticamente.
     """
-    conn = conectar_db()
+    conn = tomar_conexion_lectura()
     if conn:
         try:
             cursor = conn.cursor()
@@ -381,9 +2031,10 @@ def obtener_categorias():
             print(Fore.RED + f"❌ Error al obtener categorías: {e}" + Style.RESET_ALL)
             return []
         finally:
-            conn.close()
+            devolver_conexion_lectura(conn)
     return []
 
+@_interfaz
 def agregar_categoria(nombre_categoria):
     """
     Agrega una nueva categoría si no existe. Retorna True si se agregó o ya existía, False si hubo error.
@@ -391,11 +2042,13 @@ def agregar_categoria(nombre_categoria):
     conn = conectar_db()
     if conn:
         try:
+            iniciar_escritura(conn)
             cursor = conn.cursor()
             cursor.execute("INSERT OR IGNORE INTO categorias (nombre) VALUES (?)", (nombre_categoria,))
             conn.commit()
             return True
         except sqlite3.Error as e:
+            conn.rollback()
             print(Fore.RED + f"❌ Error al agregar categoría: {e}" + Style.RESET_ALL)
             return False
         finally:
@@ -454,31 +2107,31 @@ if __name__ == "__main__":
     # --- Pruebas de Productos ---
     print(Fore.BLUE + "\n--- Pruebas de Productos ---" + Style.RESET_ALL)
     # agregar_producto(nombre, descripcion, cantidad, precio, categoria)
-    id1 = agregar_producto("Manzana", "Manzanas rojas frescas", 100, 2.50, "Fruta")
-    id2 = agregar_producto("Leche Entera", "Leche de vaca, 1 litro", 50, 1.80, "Lácteo")
-    id3 = agregar_producto("Pan Integral", "Pan de molde integral 500g", 20, 3.20, "Panaderia")
+    id1 = agregar_producto("Manzana", "Manzanas rojas frescas", 100, 250, "Fruta")
+    id2 = agregar_producto("Leche Entera", "Leche de vaca, 1 litro", 50, 180, "Lácteo")
+    id3 = agregar_producto("Pan Integral", "Pan de molde integral 500g", 20, 320, "Panaderia")
     # Simular un error (ej. si una columna no existiera o el tipo de dato fuera incorrecto)
-    # database.agregar_producto("Producto Fallido", "Una descripcion", "cantidad_invalida", 10.0, "Categoria") # Esto causaría un error y rollback
+    # database.agregar_producto("Producto Fallido", "Una descripcion", "cantidad_invalida", 1000, "Categoria") # Esto causaría un error y rollback
 
     print("\nTodos los productos:")
     productos = obtener_todos_los_productos()
     for prod in productos:
-        print(f"  ID: {prod['id']}, Nombre: {prod['nombre']}, Cantidad: {prod['cantidad']}, Precio: {prod['precio']:.2f}, Categoría: {prod['categoria']}")
+        print(f"  ID: {prod['id']}, Nombre: {prod['nombre']}, Cantidad: {prod['cantidad']}, Precio: {formatear_precio(prod['precio'])}, Categoría: {prod['categoria']}")
 
     print(Fore.BLUE + "\n--- Pruebas de Actualización de Productos (con transacción) ---" + Style.RESET_ALL)
     # Actualizar Leche Entera (ID 2)
     if id2: # Asegurarse de que el ID exista de la adición anterior
-        actualizar_producto(id2, "Leche Desnatada", "Leche descremada, 1 litro", 60, 1.90, "Lácteo")
+        actualizar_producto(id2, "Leche Desnatada", "Leche descremada, 1 litro", 60, 190, "Lácteo")
     else:
         print(Fore.RED + "Error: ID de leche no disponible para actualizar." + Style.RESET_ALL)
 
     # Actualizar un producto que no existe
-    actualizar_producto(9999, "Producto Falso", "Descripción", 10, 10.0, "Categoría")
+    actualizar_producto(9999, "Producto Falso", "Descripción", 10, 1000, "Categoría")
 
     print("\nTodos los productos después de actualizar:")
     productos = obtener_todos_los_productos()
     for prod in productos:
-        print(f"  ID: {prod['id']}, Nombre: {prod['nombre']}, Cantidad: {prod['cantidad']}, Precio: {prod['precio']:.2f}, Categoría: {prod['categoria']}")
+        print(f"  ID: {prod['id']}, Nombre: {prod['nombre']}, Cantidad: {prod['cantidad']}, Precio: {formatear_precio(prod['precio'])}, Categoría: {prod['categoria']}")
 
     print(Fore.BLUE + "\n--- Pruebas de Eliminación de Productos (con transacción) ---" + Style.RESET_ALL)
     eliminar_producto(id3) # Eliminar "Pan Integral"
@@ -487,7 +2140,7 @@ if __name__ == "__main__":
     print("\nTodos los productos después de eliminar:")
     productos = obtener_todos_los_productos()
     for prod in productos:
-        print(f"  ID: {prod['id']}, Nombre: {prod['nombre']}, Cantidad: {prod['cantidad']}, Precio: {prod['precio']:.2f}, Categoría: {prod['categoria']}")
+        print(f"  ID: {prod['id']}, Nombre: {prod['nombre']}, Cantidad: {prod['cantidad']}, Precio: {formatear_precio(prod['precio'])}, Categoría: {prod['categoria']}")
 
     print(Fore.BLUE + "\n--- Pruebas de Reporte por Cantidad ---" + Style.RESET_ALL)
     limite = 25
@@ -0,0 +1,298 @@
+"""
+Este módulo federa las bases de datos de varias sucursales (un 'inventario.db'
+por sucursal) para hacer búsquedas y reportes de stock bajo consolidados.
+Las sucursales se registran en 'sucursales.json'. Cada consulta se ejecuta en
+todas las sucursales a la vez, sobre conexiones de solo lectura en un pool de
+hilos, o bien con ATTACH en una sola conexión cuando son pocas sucursales.
+Los resultados se combinan indicando a qué sucursal pertenece cada producto.
+"""
+import argparse
+import heapq
+import json
+import os
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from colorama import Fore, Style, init
+
+import database
+
+# Inicializar colorama para mensajes de consola
+init(autoreset=True)
+
+# Archivo con el registro de sucursales {nombre: ruta de la base}
+ARCHIVO_SUCURSALES = 'sucursales.json'
+# En modo 'auto', hasta esta cantidad de sucursales se usa ATTACH (SQLite admite 10 por defecto)
+LIMITE_ATTACH = 4
+# Hilos máximos para consultar sucursales en paralelo
+HILOS_MAXIMOS = 16
+MODOS = ('auto', 'hilos', 'attach')
+
+
+def cargar_sucursales():
+    """Retorna el diccionario {nombre: ruta} de sucursales registradas."""
+    if not os.path.exists(ARCHIVO_SUCURSALES):
+        return {}
+    try:
+        with open(ARCHIVO_SUCURSALES, 'r', encoding='utf-8') as archivo:
+            return json.load(archivo)
+    except (OSError, json.JSONDecodeError) as e:
+        print(Fore.RED + f"❌ Error al leer '{ARCHIVO_SUCURSALES}': {e}" + Style.RESET_ALL)
+        return {}
+
+
+def _guardar_sucursales(sucursales):
+    with open(ARCHIVO_SUCURSALES, 'w', encoding='utf-8') as archivo:
+        json.dump(sucursales, archivo, ensure_ascii=False, indent=2)
+
+
+def registrar_sucursal(nombre, ruta_db):
+    """
+    Registra (o actualiza) una sucursal después de verificar que su base se puede
+    abrir en solo lectura y tiene la tabla de productos.
+    Retorna True si se registró.
+    """
+    conn = database.conectar_db_solo_lectura(ruta_db)
+    if conn is None:
+        return False
+    try:
+        conn.execute("SELECT 1 FROM productos LIMIT 1")
+    except sqlite3.Error as e:
+        print(Fore.RED + f"❌ '{ruta_db}' no es una base de inventario válida: {e}" + Style.RESET_ALL)
+        return False
+    finally:
+        conn.close()
+    sucursales = cargar_sucursales()
+    sucursales[nombre] = os.path.abspath(ruta_db)
+    _guardar_sucursales(sucursales)
+    print(Fore.GREEN + f"✅ Sucursal '{nombre}' registrada ({sucursales[nombre]})." + Style.RESET_ALL)
+    return True
+
+
+def quitar_sucursal(nombre):
+    """Quita una sucursal del registro. Retorna True si existía."""
+    sucursales = cargar_sucursales()
+    if sucursales.pop(nombre, None) is None:
+        print(Fore.YELLOW + f"⚠ No hay ninguna sucursal registrada con el nombre '{nombre}'." + Style.RESET_ALL)
+        return False
+    _guardar_sucursales(sucursales)
+    print(Fore.GREEN + f"✅ Sucursal '{nombre}' quitada del registro." + Style.RESET_ALL)
+    return True
+
+
+# --- Ejecución con un pool de hilos ---
+
+def _consultar_sucursal(nombre, ruta_db, consulta, argumento):
+    """Ejecuta 'consulta(cursor, argumento)' en una sucursal. Retorna (nombre, filas, error)."""
+    conn = database.conectar_db_solo_lectura(ruta_db)
+    if conn is None:
+        return nombre, [], "no se pudo abrir la base"
+    try:
+        cursor = database.aplicar_formato(conn.cursor(), 'producto')
+        return nombre, consulta(cursor, argumento), None
+    except sqlite3.Error as e:
+        return nombre, [], str(e)
+    finally:
+        conn.close()
+
+
+def _en_paralelo(sucursales, consulta, argumento, hilos=None):
+    """Ejecuta la consulta en todas las sucursales a la vez. Retorna [(sucursal, filas)] en orden de registro."""
+    hilos = hilos or min(HILOS_MAXIMOS, len(sucursales))
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        futuros = [pool.submit(_consultar_sucursal, nombre, ruta, consulta, argumento)
+                   for nombre, ruta in sucursales.items()]
+        respuestas = [futuro.result() for futuro in futuros]
+    por_sucursal = []
+    for nombre, filas, error in respuestas:
+        if error:
+            print(Fore.RED + f"❌ Error en la sucursal '{nombre}': {error}" + Style.RESET_ALL)
+        por_sucursal.append((nombre, filas))
+    return por_sucursal
+
+
+# --- Ejecución con ATTACH en una sola conexión ---
+
+def _conectar_con_attach(sucursales):
+    """Abre una conexión en memoria con cada sucursal adjunta en solo lectura como s0, s1, ..."""
+    conn = sqlite3.connect("file::memory:", uri=True)
+    for i, ruta in enumerate(sucursales.values()):
+        conn.execute(f"ATTACH DATABASE ? AS s{i}", (f"file:{urllib.parse.quote(ruta)}?mode=ro",))
+    conn.execute("PRAGMA query_only = ON")
+    return conn
+
+
+def _union_attach(sucursales, plantilla):
+    """Arma un UNION ALL de 'plantilla' (con {esquema}) sobre todas las sucursales adjuntas."""
+    return " UNION ALL ".join(
+        f"SELECT {i} AS orden_sucursal, id, nombre, descripcion, cantidad, precio, categoria"
+        f"{plantilla.format(esquema=f's{i}')}" for i in range(len(sucursales)))
+
+
+def _con_attach(sucursales, sql, parametros_por_sucursal, parametros_finales=()):
+    """Ejecuta un UNION ALL sobre las sucursales adjuntas. Retorna [(sucursal, Producto)]."""
+    nombres = list(sucursales)
+    conn = _conectar_con_attach(sucursales)
+    try:
+        parametros = list(parametros_por_sucursal) * len(nombres) + list(parametros_finales)
+        return [(nombres[fila[0]], database.Producto(*fila[1:7])) for fila in conn.execute(sql, parametros)]
+    finally:
+        conn.close()
+
+
+def _elegir_modo(sucursales, modo):
+    if modo not in MODOS:
+        raise ValueError(f"Modo desconocido: '{modo}'. Use uno de {MODOS}.")
+    if modo == 'auto':
+        return 'attach' if len(sucursales) <= LIMITE_ATTACH else 'hilos'
+    return modo
+
+
+# --- Consultas consolidadas ---
+
+def buscar_en_sucursales(termino_busqueda, modo='auto', sucursales=None):
+    """
+    Busca por SKU exacto, ID, nombre o categoría (como obtener_producto_por_id_nombre_o_categoria)
+    en todas las sucursales. Retorna una lista de tuplas (sucursal, Producto).
+    """
+    sucursales = sucursales if sucursales is not None else cargar_sucursales()
+    if not sucursales:
+        return []
+    try:
+        if _elegir_modo(sucursales, modo) == 'hilos':
+            return [(nombre, fila) for nombre, filas in
+                    _en_paralelo(sucursales, database.buscar_productos_en, termino_busqueda) for fila in filas]
+        id_busqueda = int(termino_busqueda) if termino_busqueda.isdigit() else None
+        patron = f'%{termino_busqueda.lower()}%'
+        # Mismo orden que database.buscar_productos_en: SKU exacto, ID, nombre y categoría
+        sql = _union_attach(sucursales,
+                            ", CASE WHEN sku = ? THEN 0 WHEN id = ? THEN 1 WHEN LOWER(nombre) LIKE ? THEN 2 ELSE 3 END AS orden_busqueda"
+                            " FROM {esquema}.productos WHERE sku = ? OR id = ? OR LOWER(nombre) LIKE ? OR LOWER(categoria) LIKE ?")
+        sql += " ORDER BY orden_sucursal, orden_busqueda"
+        return _con_attach(sucursales, sql, (termino_busqueda, id_busqueda, patron,
+                                             termino_busqueda, id_busqueda, patron, patron))
+    except sqlite3.Error as e:
+        print(Fore.RED + f"❌ Error en la búsqueda consolidada: {e}" + Style.RESET_ALL)
+        return []
+
+
+def stock_bajo_en_sucursales(limite_cantidad, modo='auto', sucursales=None):
+    """
+    Reporte de stock bajo (como obtener_productos_por_cantidad_limite) de todas las
+    sucursales, ordenado por cantidad y nombre. Retorna una lista de tuplas (sucursal, Producto).
+    """
+    sucursales = sucursales if sucursales is not None else cargar_sucursales()
+    if not sucursales:
+        return []
+    try:
+        if _elegir_modo(sucursales, modo) == 'hilos':
+            por_sucursal = _en_paralelo(sucursales, database.productos_bajo_limite_en, limite_cantidad)
+            # Cada sucursal ya viene ordenada: basta con intercalar las listas
+            return list(heapq.merge(*([(nombre, fila) for fila in filas] for nombre, filas in por_sucursal),
+                                    key=lambda par: (par[1].cantidad, par[1].nombre)))
+        sql = _union_attach(sucursales, " FROM {esquema}.productos WHERE cantidad <= ?")
+        sql += " ORDER BY cantidad ASC, nombre ASC"
+        return _con_attach(sucursales, sql, (limite_cantidad,))
+    except sqlite3.Error as e:
+        print(Fore.RED + f"❌ Error en el reporte consolidado: {e}" + Style.RESET_ALL)
+        return []
+
+
+def mostrar_resultados_consolidados(resultados):
+    """Imprime una lista de (sucursal, producto) en formato de tabla."""
+    if not resultados:
+        print(Fore.RED + "❌ No hay productos para mostrar." + Style.RESET_ALL)
+        return
+    print("\n┌──────────────┬───────┬─────────────────┬──────────┬───────────┬──────────────────┐")
+    print("│ {:<12} │ {:<5} │ {:<15} │ {:<8} │ {:<9} │ {:<16} │".format("Sucursal", "ID", "Nombre", "Cantidad", "Precio", "Categoría"))
+    print("├──────────────┼───────┼─────────────────┼──────────┼───────────┼──────────────────┤")
+    for sucursal, producto in resultados:
+        sucursal_display = (sucursal[:10] + '..') if len(sucursal) > 12 else sucursal
+        nombre_display = (producto['nombre'][:14] + '..') if len(producto['nombre']) > 16 else producto['nombre']
+        categoria_display = (producto['categoria'][:15] + '..') if len(producto['categoria']) > 17 else producto['categoria']
+        print(f"│ {sucursal_display:<12} │ {producto['id']:<5} │ {nombre_display:<15} │ {producto['cantidad']:<8} │ ${database.formatear_precio(producto['precio']):<8} │ {categoria_display:<16} │")
+    print("└──────────────┴───────┴─────────────────┴──────────┴───────────┴──────────────────┘")
+
+
+def medir_fan_out(filas_por_sucursal=50000, maximo_sucursales=8, repeticiones=5):
+    """
+    Mide cómo crece la latencia de las consultas consolidadas con la cantidad de
+    sucursales, comparando la ejecución secuencial con la paralela y con ATTACH.
+    """
+    import rendimiento
+    print(Fore.CYAN + f"\n--- Consultas consolidadas ({filas_por_sucursal} productos por sucursal) ---" + Style.RESET_ALL)
+    with tempfile.TemporaryDirectory() as directorio, rendimiento.base_temporal(filas_por_sucursal) as base:
+        todas = {}
+        for i in range(maximo_sucursales):
+            todas[f"Sucursal {i + 1}"] = shutil.copy(base, os.path.join(directorio, f"sucursal{i + 1}.db"))
+
+        cantidades = [1]
+        while cantidades[-1] * 2 <= maximo_sucursales:
+            cantidades.append(cantidades[-1] * 2)
+
+        def latencia(funcion):
+            tiempos = []
+            for _ in range(repeticiones):
+                t0 = time.perf_counter()
+                funcion()
+                tiempos.append(time.perf_counter() - t0)
+            return statistics.median(tiempos) * 1000
+
+        base_ms = {}
+        print(f"{'Sucursales':>10} {'Secuencial':>12} {'Hilos':>12} {'ATTACH':>12}   (mediana, stock bajo + búsqueda)")
+        for n in cantidades:
+            sucursales = dict(list(todas.items())[:n])
+            medidas = {
+                'secuencial': latencia(lambda: (_en_paralelo(sucursales, database.productos_bajo_limite_en, 5, hilos=1),
+                                                _en_paralelo(sucursales, database.buscar_productos_en, "producto 12", hilos=1))),
+                'hilos': latencia(lambda: (stock_bajo_en_sucursales(5, 'hilos', sucursales),
+                                           buscar_en_sucursales("producto 12", 'hilos', sucursales))),
+            }
+            if n <= 10:  # Límite de bases adjuntas de SQLite
+                medidas['attach'] = latencia(lambda: (stock_bajo_en_sucursales(5, 'attach', sucursales),
+                                                      buscar_en_sucursales("producto 12", 'attach', sucursales)))
+            base_ms = base_ms or medidas
+            celdas = [f"{medidas[m]:7.1f} ms" + (f" x{medidas[m] / base_ms[m]:.1f}" if n > 1 else "     ")
+                      if m in medidas else f"{'-':>12}" for m in ('secuencial', 'hilos', 'attach')]
+            print(f"{n:>10} " + " ".join(f"{c:>12}" for c in celdas))
+        print(f"  Núcleos disponibles: {os.cpu_count()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Consultas consolidadas entre sucursales.")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+    p = subparsers.add_parser('registrar', help="Registra una sucursal")
+    p.add_argument('nombre')
+    p.add_argument('ruta_db')
+    p = subparsers.add_parser('quitar', help="Quita una sucursal del registro")
+    p.add_argument('nombre')
+    subparsers.add_parser('listar', help="Lista las sucursales registradas")
+    p = subparsers.add_parser('buscar', help="Busca por ID, nombre o categoría en todas las sucursales")
+    p.add_argument('termino')
+    p.add_argument('--modo', choices=MODOS, default='auto')
+    p = subparsers.add_parser('stock-bajo', help="Reporte de stock bajo consolidado")
+    p.add_argument('limite', type=int)
+    p.add_argument('--modo', choices=MODOS, default='auto')
+    p = subparsers.add_parser('medir', help="Mide la latencia según la cantidad de sucursales")
+    p.add_argument('--filas', type=int, default=50000)
+    p.add_argument('--sucursales', type=int, default=8)
+    args = parser.parse_args()
+
+    if args.comando == 'registrar':
+        registrar_sucursal(args.nombre, args.ruta_db)
+    elif args.comando == 'quitar':
+        quitar_sucursal(args.nombre)
+    elif args.comando == 'listar':
+        for nombre, ruta in cargar_sucursales().items():
+            print(f"  {nombre}: {ruta}")
+    elif args.comando == 'buscar':
+        mostrar_resultados_consolidados(buscar_en_sucursales(args.termino, args.modo))
+    elif args.comando == 'stock-bajo':
+        mostrar_resultados_consolidados(stock_bajo_en_sucursales(args.limite, args.modo))
+    elif args.comando == 'medir':
+        medir_fan_out(args.filas, args.sucursales)
@@ -0,0 +1,403 @@
+"""
+Este módulo implementa la importación masiva de catálogos de proveedores.
+El archivo de entrada (CSV de una línea por producto con las columnas
+nombre, descripcion, cantidad, precio, categoria y, opcionalmente, sku) se divide
+en rangos de bytes que se parsean y validan en paralelo con un ProcessPoolExecutor.
+Los lotes validados se envían por una cola a un único proceso escritor, que es el
+dueño de la conexión SQLite y los aplica en transacciones por lote. Las filas con
+SKU se insertan o actualizan (upsert), así reimportar la misma lista de precios
+no duplica productos y solo escribe las filas que cambiaron.
+Al finalizar se informa el rendimiento y dónde está el cuello de botella.
+"""
+import argparse
+import csv
+import multiprocessing
+import os
+import queue
+import random
+import sqlite3
+import time
+from concurrent.futures import FIRST_EXCEPTION, ProcessPoolExecutor, wait
+
+from colorama import Fore, Style, init
+
+import database
+
+# Inicializar colorama para mensajes de consola
+init(autoreset=True)
+
+# Cantidad de filas validadas que se envían juntas al escritor
+TAMANO_LOTE = 5000
+# Lotes que pueden esperar en la cola antes de que los parseadores se bloqueen
+LOTES_EN_COLA = 8
+# Segundos entre comprobaciones de que el escritor sigue vivo mientras se espera una cola
+INTERVALO_ESCRITOR = 0.5
+# Encabezado esperado (opcional) en la primera línea del archivo; la columna sku es opcional
+COLUMNAS = ('nombre', 'descripcion', 'cantidad', 'precio', 'categoria')
+COLUMNAS_CON_SKU = COLUMNAS + ('sku',)
+# Alta o actualización por SKU. El WHERE evita reescribir las filas que no cambiaron (no
+# generan escritura ni entrada en el registro de cambios); las filas sin SKU siempre se insertan.
+SQL_UPSERT = f"""
+    INSERT INTO productos ({', '.join(COLUMNAS_CON_SKU)}) VALUES ({', '.join('?' * len(COLUMNAS_CON_SKU))})
+    ON CONFLICT(sku) DO UPDATE SET {', '.join(f'{c} = excluded.{c}' for c in COLUMNAS)}
+    WHERE {' OR '.join(f'{c} IS NOT excluded.{c}' for c in COLUMNAS)}
+"""
+
+# Cola hacia el escritor y aviso de que el escritor terminó sin terminar de leerla,
+# heredados por cada proceso del pool en _inicializar_parseador
+_cola_escritor = None
+_escritor_caido = None
+
+
+def validar_fila(campos):
+    """
+    Valida una fila ya separada en campos, con las mismas reglas que
+    productos.agregar_producto: nombre obligatorio, descripción por defecto
+    "Sin descripción", cantidad entera no negativa, precio no negativo y
+    categoría obligatoria. El SKU es opcional (vacío equivale a sin SKU).
+    Retorna la tupla (con el SKU al final) lista para insertar o lanza ValueError con el motivo.
+    """
+    if len(campos) not in (len(COLUMNAS), len(COLUMNAS_CON_SKU)):
+        raise ValueError(f"se esperaban {len(COLUMNAS)} o {len(COLUMNAS_CON_SKU)} columnas y hay {len(campos)}")
+    nombre, descripcion, cantidad_str, precio_str, categoria, sku = (c.strip() for c in (list(campos) + [''])[:len(COLUMNAS_CON_SKU)])
+    if not nombre:
+        raise ValueError("el nombre no puede estar vacío")
+    if not descripcion:
+        descripcion = "Sin descripción"
+    try:
+        cantidad = int(cantidad_str)
+    except ValueError:
+        raise ValueError(f"cantidad inválida '{cantidad_str}'") from None
+    if cantidad < 0:
+        raise ValueError("la cantidad no puede ser negativa")
+    try:
+        precio = database.a_centavos(precio_str)
+    except ValueError:
+        raise ValueError(f"precio inválido '{precio_str}'") from None
+    if precio < 0:
+        raise ValueError("el precio no puede ser negativo")
+    if not categoria:
+        raise ValueError("la categoría no puede estar vacía")
+    return (nombre, descripcion, cantidad, precio, categoria, sku or None)
+
+
+def dividir_en_rangos(ruta_archivo, partes):
+    """
+    Divide el archivo en 'partes' rangos de bytes [inicio, fin) de tamaño similar.
+    Los cortes no necesitan caer en un salto de línea: cada rango procesa las
+    líneas que comienzan dentro de él (ver _procesar_rango).
+    """
+    tamano = os.path.getsize(ruta_archivo)
+    partes = max(1, min(partes, tamano or 1))
+    paso = tamano // partes or 1
+    limites = [i * paso for i in range(partes)] + [tamano]
+    return [(limites[i], limites[i + 1]) for i in range(partes) if limites[i] < limites[i + 1]]
+
+
+def _inicializar_parseador(cola, escritor_caido):
+    """Guarda en cada proceso del pool la cola hacia el escritor y el aviso de escritor caído."""
+    global _cola_escritor, _escritor_caido
+    _cola_escritor = cola
+    _escritor_caido = escritor_caido
+
+
+def _procesar_rango(ruta_archivo, inicio, fin, tamano_lote):
+    """
+    Parsea y valida las líneas que comienzan dentro de [inicio, fin) y envía
+    los lotes válidos al escritor.
+    Retorna un diccionario con contadores y tiempos del parseador.
+    """
+    validas = invalidas = 0
+    errores = []  # Muestra de errores (offset, motivo) para el reporte
+    lote = []
+    t_bloqueo = 0.0  # Tiempo esperando lugar en la cola (escritor saturado)
+    t_inicio = time.perf_counter()
+
+    def enviar(filas):
+        nonlocal t_bloqueo
+        t0 = time.perf_counter()
+        while True:
+            try:
+                _cola_escritor.put(filas, timeout=INTERVALO_ESCRITOR)
+                break
+            except queue.Full:
+                if _escritor_caido.is_set():
+                    # Nadie va a leer lo que quedó en la cola: no esperarlo al terminar el proceso
+                    _cola_escritor.cancel_join_thread()
+                    raise RuntimeError("el proceso escritor terminó inesperadamente") from None
+        t_bloqueo += time.perf_counter() - t0
+
+    with open(ruta_archivo, 'rb') as archivo:
+        if inicio > 0:
+            # La línea que contiene el byte inicio-1 pertenece al rango anterior
+            archivo.seek(inicio - 1)
+            archivo.readline()
+        posicion = archivo.tell()
+        while posicion < fin:
+            linea = archivo.readline()
+            if not linea:
+                break
+            offset = posicion
+            posicion += len(linea)
+            texto = linea.decode('utf-8-sig' if offset == 0 else 'utf-8', errors='replace').rstrip('\r\n')
+            if not texto.strip():
+                continue
+            campos = next(csv.reader([texto]))
+            if offset == 0 and tuple(c.strip().lower() for c in campos) in (COLUMNAS, COLUMNAS_CON_SKU):
+                continue  # Encabezado
+            try:
+                lote.append(validar_fila(campos))
+                validas += 1
+            except ValueError as e:
+                invalidas += 1
+                if len(errores) < 5:
+                    errores.append((offset, str(e)))
+            if len(lote) >= tamano_lote:
+                enviar(lote)
+                lote = []
+    if lote:
+        enviar(lote)
+
+    return {
+        'validas': validas,
+        'invalidas': invalidas,
+        'errores': errores,
+        't_total': time.perf_counter() - t_inicio,
+        't_bloqueo': t_bloqueo,
+    }
+
+
+def _escritor(ruta_db, cola, cola_resultado):
+    """
+    Proceso escritor: único dueño de la conexión SQLite.
+    Aplica cada lote recibido en su propia transacción hasta recibir None, contando
+    las filas insertadas, actualizadas y sin cambios.
+    """
+    insertadas = actualizadas = sin_cambios = lotes = 0
+    t_escritura = t_espera = 0.0
+    error = None
+    conn = database.conectar_db(ruta_db)
+    if conn is None:
+        error = "no se pudo conectar a la base de datos"
+    while True:
+        t0 = time.perf_counter()
+        filas = cola.get()
+        t_espera += time.perf_counter() - t0
+        if filas is None:
+            break
+        if conn is None or error:
+            continue  # Se vacía la cola para no bloquear a los parseadores
+        t0 = time.perf_counter()
+        try:
+            database.iniciar_escritura(conn)
+            conn.executemany("INSERT OR IGNORE INTO categorias (nombre) VALUES (?)",
+                             {(fila[4],) for fila in filas})
+            # Los IDs nuevos (AUTOINCREMENT) son siempre mayores al máximo previo
+            id_maximo = conn.execute("SELECT COALESCE(MAX(id), 0) FROM productos").fetchone()[0]
+            escritas = conn.executemany(SQL_UPSERT, filas).rowcount  # Insertadas + actualizadas
+            nuevas = conn.execute("SELECT COUNT(*) FROM productos WHERE id > ?", (id_maximo,)).fetchone()[0]
+            conn.commit()
+            insertadas += nuevas
+            actualizadas += escritas - nuevas
+            sin_cambios += len(filas) - escritas
+            lotes += 1
+        except sqlite3.Error as e:
+            conn.rollback()
+            error = f"{e} (lote revertido, se descartan los lotes restantes)"
+        t_escritura += time.perf_counter() - t0
+    if conn:
+        conn.close()
+    cola_resultado.put({
+        'insertadas': insertadas,
+        'actualizadas': actualizadas,
+        'sin_cambios': sin_cambios,
+        'lotes': lotes,
+        't_escritura': t_escritura,
+        't_espera': t_espera,
+        'error': error,
+    })
+
+
+def _resultado_del_escritor(escritor, cola_resultado):
+    """
+    Espera el resultado del escritor sin bloquearse para siempre si el proceso
+    terminó sin enviarlo (en ese caso retorna contadores en cero con el error).
+    """
+    while True:
+        try:
+            return cola_resultado.get(timeout=INTERVALO_ESCRITOR)
+        except queue.Empty:
+            if not escritor.is_alive():
+                break
+    try:
+        return cola_resultado.get(timeout=INTERVALO_ESCRITOR)  # Enviado justo antes de terminar
+    except queue.Empty:
+        return {
+            'insertadas': 0,
+            'actualizadas': 0,
+            'sin_cambios': 0,
+            'lotes': 0,
+            't_escritura': 0.0,
+            't_espera': 0.0,
+            'error': f"el proceso escritor terminó inesperadamente (código de salida {escritor.exitcode}); "
+                     "los lotes confirmados antes de la falla quedaron en la base",
+        }
+
+
+def importar_catalogo(ruta_archivo, procesos=None, tamano_lote=TAMANO_LOTE, ruta_db=None, mostrar=True):
+    """
+    Importa un catálogo grande en paralelo.
+    'procesos' es la cantidad de parseadores (por defecto, los núcleos disponibles).
+    Retorna un diccionario con las estadísticas de la importación.
+    """
+    procesos = procesos or os.cpu_count() or 1
+    ruta_db = ruta_db or database.ARCHIVO_DB
+    rangos = dividir_en_rangos(ruta_archivo, procesos * 4)  # Más rangos que procesos para balancear la carga
+
+    ctx = multiprocessing.get_context()
+    cola = ctx.Queue(maxsize=LOTES_EN_COLA)
+    cola_resultado = ctx.Queue()
+    escritor_caido = ctx.Event()
+    escritor = ctx.Process(target=_escritor, args=(ruta_db, cola, cola_resultado))
+
+    t_inicio = time.perf_counter()
+    escritor.start()
+    parciales = []
+    try:
+        with ProcessPoolExecutor(max_workers=procesos, mp_context=ctx,
+                                 initializer=_inicializar_parseador, initargs=(cola, escritor_caido)) as pool:
+            futuros = [pool.submit(_procesar_rango, ruta_archivo, inicio, fin, tamano_lote) for inicio, fin in rangos]
+            pendientes = futuros
+            while pendientes:
+                hechos, pendientes = wait(pendientes, timeout=INTERVALO_ESCRITOR, return_when=FIRST_EXCEPTION)
+                if any(f.exception() for f in hechos):
+                    break
+                if pendientes and not escritor.is_alive():
+                    # Sin escritor los parseadores quedarían bloqueados en la cola llena: se detiene el pool
+                    escritor_caido.set()
+                    pool.shutdown(cancel_futures=True)
+                    break
+            if escritor_caido.is_set():
+                parciales = [f.result() for f in futuros if f.done() and not f.cancelled() and not f.exception()]
+            else:
+                parciales = [f.result() for f in futuros]
+    finally:
+        while escritor.is_alive():
+            try:
+                cola.put(None, timeout=INTERVALO_ESCRITOR)  # Avisar al escritor que no hay más lotes
+                break
+            except queue.Full:
+                pass
+        resultado_escritor = _resultado_del_escritor(escritor, cola_resultado)
+        escritor.join()
+    t_total = time.perf_counter() - t_inicio
+
+    estadisticas = {
+        'procesos': procesos,
+        'validas': sum(p['validas'] for p in parciales),
+        'invalidas': sum(p['invalidas'] for p in parciales),
+        'errores': [e for p in parciales for e in p['errores']][:5],
+        't_total': t_total,
+        't_parseo': sum(p['t_total'] - p['t_bloqueo'] for p in parciales),
+        't_bloqueo': sum(p['t_bloqueo'] for p in parciales),
+        **resultado_escritor,
+    }
+    procesadas = estadisticas['insertadas'] + estadisticas['actualizadas'] + estadisticas['sin_cambios']
+    estadisticas['filas_por_segundo'] = procesadas / t_total if t_total else 0.0
+    estadisticas['ocupacion_escritor'] = resultado_escritor['t_escritura'] / t_total if t_total else 0.0
+    estadisticas['cuello_de_botella'] = _diagnosticar(estadisticas)
+    if mostrar:
+        mostrar_reporte(estadisticas)
+    return estadisticas
+
+
+def _diagnosticar(est):
+    """
+    Determina el cuello de botella: si el escritor está casi siempre ocupado o
+    los parseadores pasan una parte importante de su tiempo bloqueados esperando
+    lugar en la cola, agregar procesos no ayuda.
+    """
+    t_parseadores = est['t_parseo'] + est['t_bloqueo']
+    bloqueo = est['t_bloqueo'] / t_parseadores if t_parseadores else 0.0
+    if est['ocupacion_escritor'] >= 0.85 or bloqueo >= 0.25:
+        return 'escritor'
+    return 'parseo'
+
+
+def mostrar_reporte(est):
+    """Imprime el resumen de una importación."""
+    print(Fore.CYAN + "\n--- Reporte de Importación ---" + Style.RESET_ALL)
+    print(f"  Procesos parseadores: {est['procesos']}")
+    print(f"  Filas válidas: {est['validas']}  |  inválidas: {est['invalidas']}  |  en {est['lotes']} lotes")
+    print(f"  Insertadas: {est['insertadas']}  |  actualizadas: {est['actualizadas']}  |  sin cambios: {est['sin_cambios']}")
+    print(f"  Tiempo total: {est['t_total']:.2f} s  ({est['filas_por_segundo']:.0f} filas/s)")
+    print(f"  Parseo (suma de procesos): {est['t_parseo']:.2f} s  |  bloqueo en cola: {est['t_bloqueo']:.2f} s")
+    print(f"  Escritor ocupado: {est['ocupacion_escritor']:.0%} del tiempo ({est['t_escritura']:.2f} s)")
+    for offset, motivo in est['errores']:
+        print(Fore.YELLOW + f"  ⚠ Fila inválida en el byte {offset}: {motivo}" + Style.RESET_ALL)
+    if est['error']:
+        print(Fore.RED + f"❌ Error del escritor: {est['error']}" + Style.RESET_ALL)
+    if est['cuello_de_botella'] == 'escritor':
+        print(Fore.YELLOW + "📌 Cuello de botella: el escritor SQLite está saturado; más procesos no aumentarán el rendimiento." + Style.RESET_ALL)
+    else:
+        print(Fore.GREEN + "📌 Cuello de botella: el parseo; agregar procesos debería aumentar el rendimiento." + Style.RESET_ALL)
+
+
+def generar_archivo_prueba(ruta_archivo, filas, cambios=0.0, semilla=0):
+    """
+    Genera un catálogo sintético (con SKU) para pruebas de rendimiento. Con 'cambios'
+    (fracción entre 0 y 1) se altera el precio de esa parte de las filas, para simular
+    la lista de precios siguiente del mismo proveedor.
+    """
+    categorias = ['Fruta', 'Verdura', 'Lácteo', 'Bebida', 'Limpieza', 'Otros']
+    aleatorio = random.Random(semilla)
+    with open(ruta_archivo, 'w', encoding='utf-8', newline='') as archivo:
+        escritor_csv = csv.writer(archivo)
+        escritor_csv.writerow(COLUMNAS_CON_SKU)
+        for i in range(filas):
+            centavos = i % 10000 + (1 if aleatorio.random() < cambios else 0)
+            escritor_csv.writerow((f"Producto {i}", f"Descripción del producto {i}", i % 500,
+                                   database.formatear_precio(centavos), categorias[i % len(categorias)], f"{i:013d}"))
+
+
+def medir_escalado(ruta_archivo, lista_procesos):
+    """
+    Importa el mismo archivo con distinta cantidad de procesos, cada vez sobre
+    una base de datos temporal nueva, y muestra cómo escala el rendimiento.
+    """
+    import rendimiento
+    print(Fore.CYAN + "\n--- Escalado por cantidad de procesos ---" + Style.RESET_ALL)
+    base = None
+    for procesos in lista_procesos:
+        with rendimiento.base_temporal(0) as ruta_db:
+            est = importar_catalogo(ruta_archivo, procesos, ruta_db=ruta_db, mostrar=False)
+        base = base or est['filas_por_segundo']
+        aceleracion = est['filas_por_segundo'] / base if base else 0.0
+        print(f"  {procesos:>3} procesos: {est['filas_por_segundo']:>10.0f} filas/s  "
+              f"(x{aceleracion:.2f})  escritor {est['ocupacion_escritor']:.0%}  → {est['cuello_de_botella']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importación masiva y paralela de catálogos de productos.")
+    parser.add_argument('archivo', help="Archivo CSV con columnas nombre,descripcion,cantidad,precio,categoria[,sku]")
+    parser.add_argument('--procesos', type=int, default=None, help="Cantidad de procesos parseadores")
+    parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help="Filas por lote enviado al escritor")
+    parser.add_argument('--generar', type=int, metavar='FILAS', help="Genera un archivo sintético con FILAS filas antes de importar")
+    parser.add_argument('--escalado', action='store_true', help="Mide el rendimiento con 1, 2, 4... procesos en bases temporales")
+    args = parser.parse_args()
+
+    if args.generar:
+        generar_archivo_prueba(args.archivo, args.generar)
+        print(Fore.GREEN + f"✅ Archivo '{args.archivo}' generado con {args.generar} filas." + Style.RESET_ALL)
+
+    if args.escalado:
+        maximo = args.procesos or os.cpu_count() or 1
+        lista = [1]
+        while lista[-1] * 2 <= maximo:
+            lista.append(lista[-1] * 2)
+        if lista[-1] != maximo:
+            lista.append(maximo)
+        medir_escalado(args.archivo, lista)
+    else:
+        database.crear_tablas()
+        importar_catalogo(args.archivo, args.procesos, args.lote)
@@ -0,0 +1,289 @@
+"""
+Este módulo registra instantáneas diarias del stock para poder consultar la cantidad
+de cada producto en fechas pasadas (auditorías). Cada instantánea guarda solo los
+productos cuya cantidad cambió desde la instantánea anterior (codificación delta), y
+periódicamente una instantánea completa (checkpoint) con todos los productos: cuando
+las filas delta acumuladas desde el checkpoint anterior alcanzan FRACCION_COMPLETA del
+catálogo. Así el espacio crece con la cantidad de cambios y no con el tamaño del
+catálogo, y una consulta nunca recorre más de (1 + FRACCION_COMPLETA) veces el
+catálogo. Las bajas se anotan con cantidad NULL.
+El stock a una fecha se reconstruye desde el checkpoint más cercano anterior más los
+deltas hasta esa fecha; el de un solo producto es una búsqueda en el índice.
+Tomar la instantánea varias veces en el mismo día la actualiza: queda el stock de la
+última toma del día. Uso: python instantaneas.py tomar | consultar --fecha AAAA-MM-DD
+"""
+import argparse
+import datetime
+import sqlite3
+import threading
+import time
+
+from colorama import Fore, Style, init
+
+import database
+
+# Inicializar colorama para mensajes de consola
+init(autoreset=True)
+
+# Filas delta acumuladas (como fracción del catálogo) a partir de las cuales se toma un checkpoint
+FRACCION_COMPLETA = 1.0
+# Intervalo (en segundos) con el que el trabajo programado actualiza la instantánea del día
+INTERVALO_INSTANTANEA = 3600
+
+# Estado del trabajo programado
+_hilo_programado = None
+_detener_programado = threading.Event()
+
+
+def _crear_tablas(cursor):
+    """Crea las tablas de instantáneas si no existen."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS instantaneas_stock (
+            fecha TEXT PRIMARY KEY,
+            completa INTEGER NOT NULL,
+            filas INTEGER NOT NULL,
+            tomada TEXT NOT NULL
+        )
+    ''')
+    # Clave (producto_id, fecha): el stock de un producto a una fecha es una sola búsqueda
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stock_instantaneas (
+            producto_id INTEGER NOT NULL,
+            fecha TEXT NOT NULL,
+            cantidad INTEGER,
+            PRIMARY KEY (producto_id, fecha)
+        ) WITHOUT ROWID
+    ''')
+    # Por fecha: la reconstrucción del catálogo recorre solo el rango desde el checkpoint
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_stock_instantaneas_fecha ON stock_instantaneas (fecha)")
+    # Stock registrado por la última instantánea, contra el que se calcula el delta siguiente
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stock_ultima_instantanea (
+            producto_id INTEGER PRIMARY KEY,
+            cantidad INTEGER NOT NULL
+        )
+    ''')
+
+
+def _texto_fecha(fecha):
+    """Convierte una fecha (date, datetime o texto 'AAAA-MM-DD') al formato de las instantáneas."""
+    if isinstance(fecha, datetime.datetime):
+        fecha = fecha.date()
+    if isinstance(fecha, datetime.date):
+        return fecha.isoformat()
+    return datetime.date.fromisoformat(str(fecha).strip()[:10]).isoformat()
+
+
+def tomar_instantanea(fecha=None, completa=None, ruta_db=None, mostrar=True):
+    """
+    Registra la instantánea de stock de 'fecha' (hoy por defecto) dentro de una transacción.
+    Con completa=None es completa si no hay checkpoint o si los deltas desde el último ya
+    suman FRACCION_COMPLETA del catálogo; si no, guarda solo los productos que cambiaron
+    desde la instantánea anterior.
+    Retorna un diccionario con el reporte, o None si hubo un error.
+    """
+    try:
+        fecha = _texto_fecha(fecha or datetime.date.today())
+    except ValueError:
+        print(Fore.RED + f"❌ Error: fecha inválida '{fecha}', use el formato AAAA-MM-DD." + Style.RESET_ALL)
+        return None
+    conn = database.conectar_db(ruta_db)
+    if conn is None:
+        return None
+    t0 = time.perf_counter()
+    try:
+        cursor = conn.cursor()
+        _crear_tablas(cursor)
+        database.iniciar_escritura(conn)
+        ultima = cursor.execute("SELECT MAX(fecha) FROM instantaneas_stock").fetchone()[0]
+        if ultima and ultima > fecha:
+            conn.rollback()
+            print(Fore.RED + f"❌ Error: ya hay una instantánea posterior ({ultima}); no se puede registrar la del {fecha} (transacción revertida)." + Style.RESET_ALL)
+            return None
+        if completa is None:
+            checkpoint = cursor.execute("SELECT MAX(fecha) FROM instantaneas_stock WHERE completa = 1").fetchone()[0]
+            deltas = cursor.execute("SELECT COALESCE(SUM(filas), 0) FROM instantaneas_stock WHERE fecha > ? AND fecha < ?",
+                                    (checkpoint or '', fecha)).fetchone()[0]
+            catalogo = cursor.execute("SELECT COUNT(*) FROM stock_ultima_instantanea").fetchone()[0]
+            completa = checkpoint is None or deltas >= catalogo * FRACCION_COMPLETA
+
+        # Productos nuevos o con otra cantidad (todos, si es completa) y bajas desde la última instantánea
+        condicion = "" if completa else "WHERE u.cantidad IS NOT p.cantidad"
+        filas = cursor.execute(f'''
+            SELECT p.id, p.cantidad FROM productos p
+            LEFT JOIN stock_ultima_instantanea u ON u.producto_id = p.id {condicion}
+        ''').fetchall()
+        filas += cursor.execute('''
+            SELECT u.producto_id, NULL FROM stock_ultima_instantanea u
+            WHERE NOT EXISTS (SELECT 1 FROM productos p WHERE p.id = u.producto_id)
+        ''').fetchall()
+
+        cursor.executemany("INSERT OR REPLACE INTO stock_instantaneas (producto_id, fecha, cantidad) VALUES (?, ?, ?)",
+                           ((id_producto, fecha, cantidad) for id_producto, cantidad in filas))
+        cursor.executemany("DELETE FROM stock_ultima_instantanea WHERE producto_id = ?",
+                           ((id_producto,) for id_producto, cantidad in filas if cantidad is None))
+        cursor.executemany("INSERT OR REPLACE INTO stock_ultima_instantanea (producto_id, cantidad) VALUES (?, ?)",
+                           (tuple(fila) for fila in filas if fila[1] is not None))
+        # Si ya había una instantánea del día, se actualiza (sigue siendo completa si lo era)
+        cursor.execute('''
+            INSERT INTO instantaneas_stock (fecha, completa, filas, tomada)
+            VALUES (?, ?, (SELECT COUNT(*) FROM stock_instantaneas WHERE fecha = ?), strftime('%Y-%m-%d %H:%M:%S', 'now'))
+            ON CONFLICT(fecha) DO UPDATE SET completa = MAX(completa, excluded.completa),
+                                             filas = excluded.filas, tomada = excluded.tomada
+        ''', (fecha, int(completa), fecha))
+        conn.commit()
+    except sqlite3.Error as e:
+        conn.rollback()
+        print(Fore.RED + f"❌ Error al tomar la instantánea de stock: {e} (transacción revertida)." + Style.RESET_ALL)
+        return None
+    finally:
+        conn.close()
+
+    reporte = {'fecha': fecha, 'completa': completa, 'filas': len(filas), 'segundos': time.perf_counter() - t0}
+    if mostrar:
+        tipo = "completa" if completa else "delta"
+        print(Fore.GREEN + f"✅ Instantánea de stock del {fecha} ({tipo}, {len(filas)} fila(s)) registrada en "
+              f"{reporte['segundos']:.3f} s (transacción confirmada)." + Style.RESET_ALL)
+    return reporte
+
+
+def _checkpoint_hasta(cursor, fecha):
+    """Fecha del último checkpoint (instantánea completa) en o antes de 'fecha', o None."""
+    try:
+        return cursor.execute("SELECT MAX(fecha) FROM instantaneas_stock WHERE completa = 1 AND fecha <= ?",
+                              (fecha,)).fetchone()[0]
+    except sqlite3.OperationalError:  # Todavía no se tomó ninguna instantánea (no existen las tablas)
+        return None
+
+
+def stock_en_fecha(fecha, ruta_db=None):
+    """
+    Reconstruye el stock al cierre de 'fecha': las filas del checkpoint anterior más
+    cercano y de los deltas posteriores hasta 'fecha', recorridas por el índice de fecha.
+    Retorna un diccionario {id de producto: cantidad} (vacío si no hay instantáneas
+    anteriores a esa fecha), o None si hubo un error.
+    """
+    conn = database.tomar_conexion_lectura(ruta_db)
+    if conn is None:
+        return None
+    try:
+        fecha = _texto_fecha(fecha)
+        cursor = conn.cursor()
+        checkpoint = _checkpoint_hasta(cursor, fecha)
+        if checkpoint is None:
+            return {}
+        stock = {}
+        cursor.execute('''
+            SELECT producto_id, cantidad FROM stock_instantaneas INDEXED BY idx_stock_instantaneas_fecha
+            WHERE fecha BETWEEN ? AND ? ORDER BY fecha
+        ''', (checkpoint, fecha))
+        for id_producto, cantidad in cursor:
+            stock[id_producto] = cantidad
+        return {id_producto: cantidad for id_producto, cantidad in stock.items() if cantidad is not None}
+    except (sqlite3.Error, ValueError) as e:
+        print(Fore.RED + f"❌ Error al reconstruir el stock al {fecha}: {e}" + Style.RESET_ALL)
+        return None
+    finally:
+        database.devolver_conexion_lectura(conn)
+
+
+def stock_producto_en_fecha(id_producto, fecha, ruta_db=None):
+    """
+    Cantidad de un producto al cierre de 'fecha': la fila más reciente del producto
+    hasta esa fecha, con una sola búsqueda en la clave (producto_id, fecha).
+    Retorna None si el producto no existía (o no hay instantáneas) o hubo un error.
+    """
+    conn = database.tomar_conexion_lectura(ruta_db)
+    if conn is None:
+        return None
+    try:
+        fila = conn.execute('''
+            SELECT cantidad FROM stock_instantaneas
+            WHERE producto_id = ? AND fecha <= ? ORDER BY fecha DESC LIMIT 1
+        ''', (id_producto, _texto_fecha(fecha))).fetchone()
+        return fila[0] if fila else None
+    except sqlite3.OperationalError:  # Todavía no se tomó ninguna instantánea
+        return None
+    except (sqlite3.Error, ValueError) as e:
+        print(Fore.RED + f"❌ Error al consultar el stock del producto {id_producto}: {e}" + Style.RESET_ALL)
+        return None
+    finally:
+        database.devolver_conexion_lectura(conn)
+
+
+def resumen_instantaneas(ruta_db=None):
+    """Retorna la lista de (fecha, completa, filas) de las instantáneas registradas."""
+    conn = database.tomar_conexion_lectura(ruta_db)
+    if conn is None:
+        return []
+    try:
+        return [tuple(fila) for fila in conn.execute("SELECT fecha, completa, filas FROM instantaneas_stock ORDER BY fecha")]
+    except sqlite3.Error:
+        return []
+    finally:
+        database.devolver_conexion_lectura(conn)
+
+
+def _ciclo_programado(intervalo):
+    """Cuerpo del hilo: toma (o actualiza) la instantánea del día al iniciar y cada 'intervalo' segundos."""
+    while True:
+        try:
+            tomar_instantanea(mostrar=False)
+        except Exception as e:  # El hilo no debe morir por un ciclo fallido
+            print(Fore.RED + f"❌ Error en la instantánea de stock programada: {e}" + Style.RESET_ALL)
+        if _detener_programado.wait(intervalo):
+            return
+
+
+def iniciar_instantanea_programada(intervalo=INTERVALO_INSTANTANEA):
+    """
+    Inicia un hilo en segundo plano que mantiene al día la instantánea de stock de la
+    fecha actual. Si ya estaba en marcha no hace nada.
+    """
+    global _hilo_programado
+    if _hilo_programado and _hilo_programado.is_alive():
+        return
+    _detener_programado.clear()
+    _hilo_programado = threading.Thread(target=_ciclo_programado, args=(intervalo,),
+                                        name='instantanea-programada', daemon=True)
+    _hilo_programado.start()
+
+
+def detener_instantanea_programada():
+    """Detiene el hilo de instantáneas y toma la última del día, con el stock al cierre de la sesión."""
+    global _hilo_programado
+    _detener_programado.set()
+    if _hilo_programado:
+        _hilo_programado.join()
+        _hilo_programado = None
+        tomar_instantanea(mostrar=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Instantáneas diarias del stock (codificación delta).")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+    p = subparsers.add_parser('tomar', help="Toma (o actualiza) la instantánea de hoy")
+    p.add_argument('--completa', action='store_true', help="Fuerza una instantánea completa (checkpoint)")
+    p = subparsers.add_parser('consultar', help="Reconstruye el stock a una fecha e informa el tiempo de la consulta")
+    p.add_argument('--fecha', required=True, help="Fecha a consultar (AAAA-MM-DD)")
+    p.add_argument('--producto', type=int, help="ID de un producto (si no se indica, todo el catálogo)")
+    subparsers.add_parser('listar', help="Lista las instantáneas registradas")
+    args = parser.parse_args()
+
+    if args.comando == 'tomar':
+        tomar_instantanea(completa=True if args.completa else None)
+    elif args.comando == 'listar':
+        for fecha, completa, filas in resumen_instantaneas():
+            print(f"  {fecha}  {'completa' if completa else 'delta   '}  {filas:>8} fila(s)")
+    else:
+        t0 = time.perf_counter()
+        if args.producto:
+            resultado = stock_producto_en_fecha(args.producto, args.fecha)
+            duracion = time.perf_counter() - t0
+            print(f"  Producto {args.producto} al {args.fecha}: {resultado if resultado is not None else 'sin datos'}")
+        else:
+            resultado = stock_en_fecha(args.fecha)
+            duracion = time.perf_counter() - t0
+            if resultado is not None:
+                print(f"  Stock al {args.fecha}: {len(resultado)} producto(s), {sum(resultado.values())} unidad(es)")
+        print(f"  Tiempo de la consulta: {duracion * 1000:.2f} ms")
@@ -9,9 +9,15 @@ import datetime # Primero los módulos de la librería estándar
 
 from colorama import Fore, Style, Back, init # Luego los módulos de terceros
 
+import analitica
 import database # Finalmente tus módulos locales, en orden alfabético
+import instantaneas
 import login
+import mantenimiento
 import productos
+import recepcion
+import respaldo
+import sugerencias
 import ayuda # Importa el módulo de ayuda
 
 # Es una buena práctica inicializar colorama en el punto de entrada principal
@@ -35,6 +41,21 @@ def generar_log(usuario, accion):
     except Exception as e: # Captura cualquier otro error inesperado
         print(Fore.RED + f"❌ Ocurrió un error inesperado al generar el log: {e}" + Style.RESET_ALL)
 
+def generar_log_en_lote(usuario, acciones):
+    """
+    Registra varias acciones en el log con una sola escritura (por ejemplo, una
+    línea por producto de una actualización masiva), todas con la misma fecha y hora.
+    """
+    if not acciones:
+        return
+    try:
+        fecha_hora = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with open('log.txt', 'a', encoding='utf-8') as log_file:
+            log_file.write("".join(f"Usuario: {usuario}, Fecha: {fecha_hora}, Acción: {accion}\n" for accion in acciones))
+        print(Fore.CYAN + f"✅ {len(acciones)} acción(es) registrada(s) en el log." + Style.RESET_ALL)
+    except IOError as e:
+        print(Fore.RED + f"❌ Error al escribir el log: {e}" + Style.RESET_ALL)
+
 def main():
     """
     Función principal que maneja el menú de la aplicación CRUD.
@@ -48,10 +69,13 @@ def main():
         database.agregar_usuario("user_test", "user123")
 
     if not database.obtener_todos_los_productos():
-        database.agregar_producto("Manzana", "Manzanas rojas frescas", 100, 2.50, "Fruta")
-        database.agregar_producto("Leche Entera", "Leche de vaca, 1 litro", 50, 1.80, "Lácteo")
-        database.agregar_producto("Pan Integral", "Pan de molde integral 500g", 20, 3.20, "Panaderia")
+        database.agregar_producto("Manzana", "Manzanas rojas frescas", 100, 250, "Fruta") # Precios en centavos
+        database.agregar_producto("Leche Entera", "Leche de vaca, 1 litro", 50, 180, "Lácteo")
+        database.agregar_producto("Pan Integral", "Pan de molde integral 500g", 20, 320, "Panaderia")
         
+    # Índice en memoria para sugerir productos mientras se escribe en la búsqueda
+    sugerencias.iniciar_indice()
+
     # 2. Manejar el inicio de sesión
     usuario = login.main()  # Captura el nombre del usuario o None si el login falla/se cancela
 
@@ -59,6 +83,16 @@ def main():
         print(Fore.YELLOW + "🚪 Saliendo de la aplicación porque el inicio de sesión no fue exitoso o se canceló." + Style.RESET_ALL)
         return # Sale de la función main y termina el programa
 
+    # Las tareas periódicas trabajan sobre el archivo de la base; con los motores en
+    # memoria (INVENTARIO_BACKEND=memoria o python) no hay nada que respaldar ni auditar
+    if database.BACKEND == 'archivo':
+        # Respaldo en caliente periódico mientras la aplicación está abierta
+        respaldo.iniciar_respaldo_programado()
+        # Estadísticas y espacio libre de la base, solo mientras está inactiva
+        mantenimiento.iniciar_mantenimiento_programado()
+        # Instantánea diaria del stock (solo los productos que cambiaron), para auditorías
+        instantaneas.iniciar_instantanea_programada()
+
     # Si el usuario es válido, continuar con el menú principal
     continuar = True  # Variable para controlar el bucle
 
@@ -76,12 +110,18 @@ def main():
         print(Fore.GREEN + "4. Eliminar producto            🚫" + Style.RESET_ALL)
         print(Fore.GREEN + "5. Modificar producto           ✏️" + Style.RESET_ALL)
         print(Fore.GREEN + "6. Reporte de stock bajo        📈" + Style.RESET_ALL)
-        print(Fore.RED +   "7. Salir de la aplicación       🚪" + Style.RESET_ALL)
+        print(Fore.GREEN + "7. Reportes avanzados           📊" + Style.RESET_ALL)
+        print(Fore.GREEN + "8. Actualización masiva         🧮" + Style.RESET_ALL)
+        print(Fore.GREEN + "9. Recepción por escaneo        📦" + Style.RESET_ALL)
+        print(Fore.GREEN + "10. Historial de precios        🕒" + Style.RESET_ALL)
+        print(Fore.GREEN + "11. Stock por ubicación         🏬" + Style.RESET_ALL)
+        print(Fore.GREEN + "12. Lotes y vencimientos        📅" + Style.RESET_ALL)
+        print(Fore.RED +   "13. Salir de la aplicación      🚪" + Style.RESET_ALL)
         print(Fore.BLUE + "─" * 60 + Style.RESET_ALL) 
-        print(Fore.BLUE + "8. Ayuda                        ❓" + Style.RESET_ALL) 
+        print(Fore.BLUE + "14. Ayuda                       ❓" + Style.RESET_ALL) 
         print(Fore.BLUE + "─" * 60 + Style.RESET_ALL) 
 
-        opcion_str = input(Fore.MAGENTA + "👉 Selecciona una opción (1-8): " + Style.RESET_ALL).strip() 
+        opcion_str = input(Fore.MAGENTA + "👉 Selecciona una opción (1-14): " + Style.RESET_ALL).strip() 
         opcion = None
 
         try:
@@ -111,16 +151,39 @@ def main():
                 productos.reporte_productos_bajo_limite()
                 generar_log(usuario, "Reporte de stock bajo generado")
             case 7:
+                analitica.menu_reportes_avanzados()
+                generar_log(usuario, "Reportes avanzados generados")
+            case 8:
+                acciones = productos.actualizacion_masiva()
+                generar_log_en_lote(usuario, acciones)
+            case 9:
+                resumen = recepcion.modo_recepcion()
+                generar_log(usuario, f"Recepción por escaneo: {resumen['lecturas']} lecturas, {resumen['aplicadas']} unidades")
+            case 10:
+                productos.historial_de_precios()
+                generar_log(usuario, "Historial de precios consultado")
+            case 11:
+                accion = productos.stock_por_ubicacion()
+                if accion:
+                    generar_log(usuario, accion)
+            case 12:
+                accion = productos.lotes_y_vencimientos()
+                if accion:
+                    generar_log(usuario, accion)
+            case 13:
                 generar_log(usuario, "Salida del sistema")
                 print(Style.BRIGHT + Fore.MAGENTA + "\n✨" + "═" * 58 + "✨" + Style.RESET_ALL)
                 print(Style.BRIGHT + Back.WHITE + Fore.BLACK + f"         ¡Adiós, {usuario}!¡Vuelve pronto! 🙋‍♂️                   " + Style.RESET_ALL)
                 print(Style.BRIGHT + Fore.MAGENTA + "✨" + "═" * 58 + "✨\n" + Style.RESET_ALL)
+                respaldo.detener_respaldo_programado()
+                mantenimiento.detener_mantenimiento_programado()
+                instantaneas.detener_instantanea_programada()
                 continuar = False
-            case 8: 
+            case 14: 
                 ayuda.menu_ayuda()
                 generar_log(usuario, "Acceso a la ayuda")
             case _:
-                print(Fore.RED + "❌ Opción Inválida. Por favor, selecciona un número del 1 al 8." + Style.RESET_ALL) 
+                print(Fore.RED + "❌ Opción Inválida. Por favor, selecciona un número del 1 al 14." + Style.RESET_ALL) 
 
         if continuar:
             input(Fore.YELLOW + "\nPresiona Enter para continuar...\n" + Style.RESET_ALL)
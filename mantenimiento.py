@@ -0,0 +1,267 @@
+"""
+Este módulo realiza el mantenimiento automático de la base de datos:
+  - Estadísticas del planificador de consultas: se recalculan con ANALYZE (acotado
+    con analysis_limit) cuando la cantidad de cambios desde el último análisis,
+    según el registro de cambios, supera un umbral; además se ejecuta PRAGMA optimize.
+  - Espacio libre: las bajas dejan páginas libres y el archivo nunca se achica. Con
+    auto_vacuum=INCREMENTAL esas páginas se devuelven al sistema en pasos acotados
+    de PRAGMA incremental_vacuum, cada uno en una transacción corta.
+El trabajo programado solo actúa cuando la base está inactiva (no hubo cambios
+desde la revisión anterior), y cada paso usa una espera de bloqueo mínima y se
+interrumpe si aparece actividad, para no demorar las operaciones en primer plano.
+"""
+import argparse
+import os
+import sqlite3
+import threading
+import time
+
+from colorama import Fore, Style, init
+
+import database
+
+# Inicializar colorama para mensajes de consola
+init(autoreset=True)
+
+# Cambios (altas, modificaciones y bajas) que vuelven obsoletas las estadísticas:
+# el mayor entre UMBRAL_CAMBIOS y la fracción FRACCION_CAMBIOS de los productos
+UMBRAL_CAMBIOS = 1000
+FRACCION_CAMBIOS = 0.10
+# Filas examinadas por índice en ANALYZE (acota su duración en tablas grandes)
+LIMITE_ANALISIS = 1000
+# Páginas liberadas por paso de incremental_vacuum, pausa entre pasos y tiempo máximo por ciclo
+PAGINAS_POR_PASO = 256
+PAUSA_ENTRE_PASOS = 0.01
+TIEMPO_MAXIMO = 2.0
+# Espera máxima por el bloqueo de escritura: si la base está ocupada, el paso se posterga
+ESPERA_BLOQUEO = 0.05
+# Tamaño máximo de archivo para activar auto_vacuum (requiere un VACUUM completo) en un mantenimiento forzado
+LIMITE_VACUUM_COMPLETO = 16 * 2**20
+# Intervalo de revisión del trabajo programado (en segundos)
+INTERVALO_MANTENIMIENTO = 60
+
+# Estado del trabajo programado
+_hilo_programado = None
+_detener_programado = threading.Event()
+
+
+def _conectar(ruta_db):
+    conn = sqlite3.connect(ruta_db, timeout=ESPERA_BLOQUEO, isolation_level=None)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS mantenimiento (
+            clave TEXT PRIMARY KEY,
+            valor INTEGER NOT NULL
+        )
+    ''')
+    return conn
+
+
+def _ultima_secuencia(conn):
+    fila = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'cambios'").fetchone()
+    return fila[0] if fila else 0
+
+
+def _leer_valor(conn, clave, defecto=0):
+    fila = conn.execute("SELECT valor FROM mantenimiento WHERE clave = ?", (clave,)).fetchone()
+    return fila[0] if fila else defecto
+
+
+def _guardar_valor(conn, clave, valor):
+    conn.execute("INSERT OR REPLACE INTO mantenimiento (clave, valor) VALUES (?, ?)", (clave, valor))
+
+
+def estadisticas_obsoletas(conn):
+    """Retorna (obsoletas, cambios desde el último ANALYZE)."""
+    cambios = _ultima_secuencia(conn) - _leer_valor(conn, 'secuencia_analyze')
+    sin_estadisticas = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone() is None
+    productos = conn.execute("SELECT COUNT(*) FROM productos").fetchone()[0]
+    umbral = max(UMBRAL_CAMBIOS, int(productos * FRACCION_CAMBIOS))
+    return sin_estadisticas or cambios >= umbral, cambios
+
+
+def _analizar(conn):
+    """Recalcula las estadísticas del planificador. Retorna la duración en segundos."""
+    t0 = time.perf_counter()
+    conn.execute(f"PRAGMA analysis_limit = {LIMITE_ANALISIS}")
+    conn.execute("ANALYZE")
+    _guardar_valor(conn, 'secuencia_analyze', _ultima_secuencia(conn))
+    return time.perf_counter() - t0
+
+
+def activar_vacuum_incremental(ruta_db=None):
+    """
+    Activa auto_vacuum=INCREMENTAL en una base creada sin él. Requiere un VACUUM
+    completo que bloquea la base mientras dura. Retorna True si quedó activado.
+    """
+    ruta_db = ruta_db or database.ARCHIVO_DB
+    conn = sqlite3.connect(ruta_db, isolation_level=None)
+    try:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            return True
+        t0 = time.perf_counter()
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+        print(Fore.GREEN + f"✅ Vacuum incremental activado en {time.perf_counter() - t0:.2f} s." + Style.RESET_ALL)
+        return conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+    except sqlite3.Error as e:
+        print(Fore.RED + f"❌ Error al activar el vacuum incremental: {e}" + Style.RESET_ALL)
+        return False
+    finally:
+        conn.close()
+
+
+def _vacuum_incremental(conn, secuencia_inicial, paginas_por_paso, tiempo_maximo):
+    """
+    Libera páginas en pasos acotados. Se detiene al vaciar la lista de páginas libres,
+    al agotar el tiempo, si la base está ocupada o si aparecen cambios nuevos.
+    Retorna (páginas recuperadas, pasos, motivo de detención).
+    """
+    recuperadas, pasos = 0, 0
+    limite = time.perf_counter() + tiempo_maximo
+    while True:
+        libres = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if libres == 0:
+            return recuperadas, pasos, "sin páginas libres"
+        if time.perf_counter() >= limite:
+            return recuperadas, pasos, "tiempo agotado"
+        if _ultima_secuencia(conn) != secuencia_inicial:
+            return recuperadas, pasos, "actividad en primer plano"
+        try:
+            # executescript ejecuta el pragma hasta el final (execute liberaría una sola página)
+            conn.executescript(f"BEGIN IMMEDIATE; PRAGMA incremental_vacuum({paginas_por_paso}); COMMIT;")
+        except sqlite3.OperationalError:  # Base ocupada: se cede el paso a la operación en curso
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            return recuperadas, pasos, "base ocupada"
+        recuperadas += libres - conn.execute("PRAGMA freelist_count").fetchone()[0]
+        pasos += 1
+        time.sleep(PAUSA_ENTRE_PASOS)
+
+
+def ejecutar_mantenimiento(ruta_db=None, forzar=False, paginas_por_paso=PAGINAS_POR_PASO,
+                           tiempo_maximo=TIEMPO_MAXIMO, mostrar=True):
+    """
+    Ejecuta un ciclo de mantenimiento: ANALYZE si las estadísticas están obsoletas,
+    PRAGMA optimize y vacuum incremental acotado. Con forzar=True siempre analiza y,
+    si la base es chica (LIMITE_VACUUM_COMPLETO), activa antes el vacuum incremental.
+    Retorna un diccionario con el reporte, o None si hubo un error.
+    """
+    ruta_db = ruta_db or database.ARCHIVO_DB
+    reporte = {'analizado': False, 'segundos_analisis': 0.0, 'cambios_desde_analisis': 0,
+               'paginas_recuperadas': 0, 'pasos_vacuum': 0, 'detencion': None,
+               'bytes_antes': os.path.getsize(ruta_db) if os.path.exists(ruta_db) else 0}
+    t_inicio = time.perf_counter()
+    try:
+        if forzar and os.path.exists(ruta_db) and reporte['bytes_antes'] <= LIMITE_VACUUM_COMPLETO:
+            activar_vacuum_incremental(ruta_db)
+        conn = _conectar(ruta_db)
+    except sqlite3.OperationalError as e:
+        print(Fore.YELLOW + f"⚠ Mantenimiento postergado: {e}" + Style.RESET_ALL)
+        return None
+    except sqlite3.Error as e:
+        print(Fore.RED + f"❌ Error al iniciar el mantenimiento: {e}" + Style.RESET_ALL)
+        return None
+    try:
+        secuencia_inicial = _ultima_secuencia(conn)
+        obsoletas, reporte['cambios_desde_analisis'] = estadisticas_obsoletas(conn)
+        reporte['estadisticas_obsoletas'] = obsoletas or forzar
+        if reporte['estadisticas_obsoletas']:
+            try:
+                reporte['segundos_analisis'] = _analizar(conn)
+                reporte['analizado'] = True
+            except sqlite3.OperationalError:  # Base ocupada: el análisis queda para el próximo ciclo
+                pass
+        conn.execute("PRAGMA optimize")
+
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            reporte['paginas_recuperadas'], reporte['pasos_vacuum'], reporte['detencion'] = \
+                _vacuum_incremental(conn, secuencia_inicial, paginas_por_paso, tiempo_maximo)
+            # En modo WAL el archivo se achica al transferir el WAL; PASSIVE no espera a nadie
+            conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchall()
+        else:
+            reporte['detencion'] = "auto_vacuum no activado (use 'python mantenimiento.py activar')"
+        reporte['paginas_libres'] = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        reporte['tamano_pagina'] = conn.execute("PRAGMA page_size").fetchone()[0]
+    except sqlite3.Error as e:
+        print(Fore.RED + f"❌ Error durante el mantenimiento: {e}" + Style.RESET_ALL)
+        return None
+    finally:
+        conn.close()
+
+    reporte['bytes_despues'] = os.path.getsize(ruta_db)
+    reporte['segundos'] = time.perf_counter() - t_inicio
+    if mostrar:
+        mostrar_reporte(reporte)
+    return reporte
+
+
+def mostrar_reporte(reporte):
+    """Muestra por consola el resultado de un ciclo de mantenimiento."""
+    print(Fore.GREEN + f"✅ Mantenimiento completado en {reporte['segundos']:.3f} s." + Style.RESET_ALL)
+    if reporte['analizado']:
+        print(f"  ANALYZE: {reporte['segundos_analisis'] * 1000:.1f} ms ({reporte['cambios_desde_analisis']} cambio(s) desde el análisis anterior)")
+    elif reporte['estadisticas_obsoletas']:
+        print(f"  ANALYZE: postergado, base ocupada ({reporte['cambios_desde_analisis']} cambio(s) desde el análisis anterior)")
+    else:
+        print(f"  ANALYZE: no necesario ({reporte['cambios_desde_analisis']} cambio(s) desde el análisis anterior)")
+    recuperado = reporte['paginas_recuperadas'] * reporte['tamano_pagina']
+    print(f"  Vacuum incremental: {reporte['paginas_recuperadas']} página(s) recuperada(s) ({recuperado / 1024:.1f} KB) "
+          f"en {reporte['pasos_vacuum']} paso(s); detenido por: {reporte['detencion']}")
+    print(f"  Páginas libres restantes: {reporte['paginas_libres']}")
+    print(f"  Tamaño del archivo: {reporte['bytes_antes'] / 1024:.1f} KB -> {reporte['bytes_despues'] / 1024:.1f} KB")
+
+
+def _ciclo_programado(intervalo):
+    """Cuerpo del hilo de mantenimiento: solo actúa si no hubo cambios desde la revisión anterior."""
+    secuencia_anterior = None
+    while not _detener_programado.wait(intervalo):
+        try:
+            conn = sqlite3.connect(database.ARCHIVO_DB, timeout=ESPERA_BLOQUEO)
+            try:
+                secuencia = _ultima_secuencia(conn)
+            finally:
+                conn.close()
+            if secuencia == secuencia_anterior:  # Base inactiva durante el último intervalo
+                ejecutar_mantenimiento(mostrar=False)
+            secuencia_anterior = secuencia
+        except Exception as e:  # El hilo no debe morir por un ciclo fallido
+            print(Fore.RED + f"❌ Error en el mantenimiento programado: {e}" + Style.RESET_ALL)
+
+
+def iniciar_mantenimiento_programado(intervalo=INTERVALO_MANTENIMIENTO):
+    """
+    Inicia un hilo en segundo plano que revisa la base cada 'intervalo' segundos y
+    ejecuta el mantenimiento cuando está inactiva. Si ya estaba en marcha no hace nada.
+    """
+    global _hilo_programado
+    if _hilo_programado and _hilo_programado.is_alive():
+        return
+    _detener_programado.clear()
+    _hilo_programado = threading.Thread(target=_ciclo_programado, args=(intervalo,),
+                                        name='mantenimiento-programado', daemon=True)
+    _hilo_programado.start()
+
+
+def detener_mantenimiento_programado():
+    """Detiene el hilo de mantenimiento (espera a que termine el paso en curso)."""
+    global _hilo_programado
+    _detener_programado.set()
+    if _hilo_programado:
+        _hilo_programado.join()
+        _hilo_programado = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mantenimiento de la base de datos del inventario.")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+    p = subparsers.add_parser('ejecutar', help="Ejecuta un ciclo de mantenimiento y muestra el reporte")
+    p.add_argument('--forzar', action='store_true', help="Analiza aunque las estadísticas estén al día")
+    p.add_argument('--paginas', type=int, default=PAGINAS_POR_PASO, help="Páginas por paso de vacuum")
+    p.add_argument('--tiempo', type=float, default=TIEMPO_MAXIMO, help="Tiempo máximo de vacuum (s)")
+    subparsers.add_parser('activar', help="Activa auto_vacuum=INCREMENTAL (VACUUM completo, una sola vez)")
+    args = parser.parse_args()
+
+    if args.comando == 'activar':
+        activar_vacuum_incremental()
+    else:
+        ejecutar_mantenimiento(forzar=args.forzar, paginas_por_paso=args.paginas, tiempo_maximo=args.tiempo)
@@ -4,8 +4,11 @@ Este módulo contiene las funciones para la gestión de productos
 de stock bajo en el sistema de inventario.
 """
 
+import datetime
+
 from colorama import Fore, Style # Importar Style para poder usar Style.RESET_ALL
 import database # Importar el módulo de base de datos
+import sugerencias # Índice en memoria para sugerir productos por prefijo
 
 # Las funciones cargar_productos y guardar_productos de JSON ya no son necesarias aquí.
 # Tampoco necesitamos 'random' para generar códigos de producto, ya que la base de datos
@@ -14,7 +17,7 @@ import database # Importar el módulo de base de datos
 def mostrar_productos_en_tabla(productos): # El parámetro ya no es necesario, pero se mantiene por compatibilidad con main.py
     """
     Función auxiliar para imprimir productos en formato de tabla.
-    Acepta una lista de objetos sqlite3.Row.
+    Acepta una lista de objetos sqlite3.Row o database.Producto.
     """
     if not productos:
         print(Fore.RED + "❌ No hay productos para mostrar." + Style.RESET_ALL)
@@ -30,7 +33,7 @@ def mostrar_productos_en_tabla(productos): # El parámetro ya no es necesario, p
         descripcion_display = (producto['descripcion'][:17] + '..') if len(str(producto['descripcion'])) > 19 else str(producto['descripcion'])
         categoria_display = (producto['categoria'][:15] + '..') if len(producto['categoria']) > 17 else producto['categoria']
 
-        print(f"│ {producto['id']:<5} │ {nombre_display:<15} │ {descripcion_display:<19} │ {producto['cantidad']:<8} │ ${producto['precio']:<8.2f} │ {categoria_display:<16} │")
+        print(f"│ {producto['id']:<5} │ {nombre_display:<15} │ {descripcion_display:<19} │ {producto['cantidad']:<8} │ ${database.formatear_precio(producto['precio']):<8} │ {categoria_display:<16} │")
     print("└───────┴─────────────────┴─────────────────────┴──────────┴───────────┴──────────────────┘")
 
 
@@ -74,13 +77,13 @@ def agregar_producto():
             while precio is None:
                 precio_str = input(" 💰 Ingrese el precio del producto (ej. 12.99): ").strip()
                 try:
-                    # Usamos float para permitir decimales en el precio
-                    precio = float(precio_str)
+                    # El precio se convierte directamente a centavos enteros (sin pasar por float)
+                    precio = database.a_centavos(precio_str)
                     if precio < 0:
                         print(Fore.RED + "❌ Error: El precio no puede ser negativo." + Style.RESET_ALL)
                         precio = None
                 except ValueError:
-                    print(Fore.RED + "❌ Error: El precio debe ser un número válido (ej. 10, 15.50)." + Style.RESET_ALL)
+                    print(Fore.RED + "❌ Error: El precio debe ser un número válido con hasta dos decimales (ej. 10, 15.50)." + Style.RESET_ALL)
 
             # Mostrar categorías ordenadas y opción de nueva categoría
             print("\nSelecciona la categoría del producto:")
@@ -89,15 +92,16 @@ def agregar_producto():
             print(f"{len(categorias_disponibles)+1}. Nueva categoría")
 
             categoria = None
+            categoria_nueva = False # La categoría nueva se guarda junto con el producto
             cat_ok = False
             while not cat_ok: # Bucle para validar la categoría
                 opcion_categoria_str = input("Número de categoría (o escriba 'nueva'): ").strip().lower()
                 if opcion_categoria_str == "nueva" or opcion_categoria_str == str(len(categorias_disponibles)+1):
                     nueva_categoria = input("Ingrese el nombre de la nueva categoría: ").strip()
                     if nueva_categoria:
-                        database.agregar_categoria(nueva_categoria)  # <-- Guardar en la base de datos
                         categoria = nueva_categoria
-                        print(f"Categoría agregada: {categoria}")
+                        categoria_nueva = True
+                        print(f"Categoría nueva: {categoria}")
                         cat_ok = True
                     else:
                         print(Fore.RED + "❌ El nombre de la nueva categoría no puede estar vacío." + Style.RESET_ALL)
@@ -113,10 +117,27 @@ def agregar_producto():
                     except ValueError:
                         print(Fore.RED + "❌ Error: Debe ingresar un número para la categoría o 'nueva'." + Style.RESET_ALL)
 
-            id_nuevo_producto = database.agregar_producto(nombre, descripcion, cantidad, precio, categoria) # Llamar a la función de agregar producto en la base de datos
-            # Si la función devuelve un ID, significa que se agregó correctamente
-            if id_nuevo_producto:
+            # SKU / código de barras opcional (se puede escanear directamente)
+            sku = input(" 🏷️ SKU o código de barras (opcional, Enter para omitir): ").strip()
+            # Los perecederos guardan el vencimiento del stock inicial como un lote
+            vencimiento = None
+            if categoria in database.CATEGORIAS_PERECEDERAS and cantidad > 0:
+                vencimiento = _pedir_fecha(" 📅 Fecha de vencimiento del stock inicial (AAAA-MM-DD, Enter para omitir): ")
+
+            # Categoría nueva, producto, SKU y lote se guardan juntos: si algo falla no queda nada a medias
+            with database.transaccion() as tx:
+                if categoria_nueva:
+                    database.agregar_categoria(categoria)
+                id_nuevo_producto = database.agregar_producto(nombre, descripcion, cantidad, precio, categoria) # Llamar a la función de agregar producto en la base de datos
+                if id_nuevo_producto and sku:
+                    database.asignar_sku(id_nuevo_producto, sku)
+                if id_nuevo_producto and vencimiento:
+                    database.registrar_lote(id_nuevo_producto, cantidad, vencimiento, sumar_al_stock=False)
+            # Si la transacción se confirmó, el producto quedó agregado
+            if tx.confirmada and id_nuevo_producto:
                 print(f"🔖 Producto agregado con ID: {id_nuevo_producto}")
+                if categoria_nueva:
+                    categorias_disponibles = database.obtener_categorias()
             else:
                 pass
                 print(Fore.RED + "❌ No se pudo agregar el producto. Verifique los datos e intente nuevamente." + Style.RESET_ALL)
@@ -137,7 +158,7 @@ def ver_productos():
     """Función para ver los productos registrados, obteniéndolos de la base de datos."""
     print(Fore.CYAN + "\n--- Visualizar Productos ---" + Style.RESET_ALL)
     try:
-        productos = database.obtener_todos_los_productos() # Obtener productos directamente de la DB
+        productos = database.obtener_todos_los_productos(formato='producto') # Obtener productos directamente de la DB
         mostrar_productos_en_tabla(productos) # Usar la función auxiliar para mostrar
     except Exception as e:
         print(Fore.RED + f"❌ Se produjo un error al intentar mostrar los productos: {e}" + Style.RESET_ALL)
@@ -147,7 +168,7 @@ def buscar_producto():
     print(Fore.CYAN + "\n--- Búsqueda de Productos ---" + Style.RESET_ALL)
     nom_bus_ok = True
     while nom_bus_ok:
-        busqueda = input("🔍 Ingrese el ID, nombre o categoría del producto a buscar o escriba 'salir' para cancelar: ").strip()
+        busqueda = input("🔍 Ingrese el ID, nombre o categoría del producto a buscar (termine con '*' para ver sugerencias) o escriba 'salir' para cancelar: ").strip()
 
         if busqueda.lower() == "salir": # Permitir cancelar la búsqueda
             print(Fore.YELLOW + "🔙 Cancelando búsqueda..." + Style.RESET_ALL)
@@ -158,9 +179,14 @@ def buscar_producto():
             print(Fore.RED + "❌ Error: La búsqueda no puede estar vacía, reintente." + Style.RESET_ALL)
             continue
 
+        if busqueda.endswith("*"): # Sugerencias por prefijo desde el índice en memoria, sin consultar la base
+            busqueda = elegir_sugerencia(busqueda.rstrip("*"))
+            if busqueda is None:
+                continue
+
         try:
             # Usar la función obtener_producto_por_id_nombre_o_categoria del módulo database
-            resultados = database.obtener_producto_por_id_nombre_o_categoria(busqueda) # Esta función busca por ID, nombre o categoría
+            resultados = database.obtener_producto_por_id_nombre_o_categoria(busqueda, formato='producto') # Esta función busca por ID, nombre o categoría
             # Si la búsqueda devuelve una lista vacía, significa que no se encontró nada
 
             if resultados:
@@ -174,12 +200,33 @@ def buscar_producto():
         except Exception as e:
             print(Fore.RED + f"❌ Se produjo un error durante la búsqueda: {e}" + Style.RESET_ALL)
 
+def elegir_sugerencia(prefijo):
+    """
+    Muestra los productos y categorías que empiezan con 'prefijo' y permite elegir uno.
+    Retorna el término a buscar (ID del producto o nombre de la categoría), o None si no se eligió ninguno.
+    """
+    productos_sugeridos = sugerencias.sugerir(prefijo)
+    categorias_sugeridas = sugerencias.sugerir_categorias(prefijo)
+    opciones = [(str(id_producto), f"{nombre} (ID: {id_producto})") for id_producto, nombre in productos_sugeridos]
+    opciones += [(nombre, f"Categoría {nombre} ({cantidad} producto(s))") for nombre, cantidad in categorias_sugeridas]
+    if not opciones:
+        print(Fore.YELLOW + f"⚠ No hay sugerencias para '{prefijo}'." + Style.RESET_ALL)
+        return None
+
+    print(Fore.CYAN + "\n💡 Sugerencias:" + Style.RESET_ALL)
+    for numero, (_, texto) in enumerate(opciones, start=1):
+        print(f"  {numero}. {texto}")
+    eleccion = input("Elija un número o presione Enter para volver: ").strip()
+    if eleccion.isdigit() and 1 <= int(eleccion) <= len(opciones):
+        return opciones[int(eleccion) - 1][0]
+    return None
+
 def modificar_producto():
     """
     Actualiza los datos de un producto existente en la base de datos mediante su ID.
     """
     print(Fore.CYAN + "\n--- Modificar Producto ---" + Style.RESET_ALL)
-    productos_actuales = database.obtener_todos_los_productos()
+    productos_actuales = database.obtener_todos_los_productos(formato='producto')
     if not productos_actuales:
         print(Fore.RED + "❌ No hay productos registrados para modificar." + Style.RESET_ALL)
         return
@@ -195,18 +242,18 @@ def modificar_producto():
         try:
             id_producto = int(id_str)
             # Buscar el producto por ID para mostrar sus datos actuales
-            producto_existente_lista = database.obtener_producto_por_id_nombre_o_categoria(str(id_producto))
-            if not producto_existente_lista:
+            encontrados = database.obtener_producto_por_id_nombre_o_categoria(str(id_producto), formato='producto')
+            # El SKU exacto va antes que el ID: quedarse con el producto de ese ID
+            producto_actual = next((p for p in encontrados if p.id == id_producto), None)
+            if producto_actual is None:
                 print(Fore.RED + f"❌ No se encontró ningún producto con ID {id_producto}. Intente de nuevo." + Style.RESET_ALL)
                 continue # Pide el ID de nuevo
 
-            producto_actual = producto_existente_lista[0] # Siempre será el primero si se busca por ID exacto
-
             print(Fore.GREEN + f"\nProducto encontrado (ID: {producto_actual['id']}):" + Style.RESET_ALL) # Mostrar datos del producto encontrado
             print(f"  Nombre actual: {producto_actual['nombre']}")
             print(f"  Descripción actual: {producto_actual['descripcion']}")
             print(f"  Cantidad actual: {producto_actual['cantidad']}")
-            print(f"  Precio actual: {producto_actual['precio']:.2f}")
+            print(f"  Precio actual: {database.formatear_precio(producto_actual['precio'])}")
             print(f"  Categoría actual: {producto_actual['categoria']}")
             print(Fore.YELLOW + "Deje en blanco si no desea modificar un campo." + Style.RESET_ALL)
 
@@ -235,17 +282,17 @@ def modificar_producto():
 
             nuevo_precio = None
             while nuevo_precio is None:
-                precio_str = input(f" Nuevo precio ({producto_actual['precio']:.2f}): ").strip()
+                precio_str = input(f" Nuevo precio ({database.formatear_precio(producto_actual['precio'])}): ").strip()
                 if not precio_str: # Si se deja en blanco, usar el precio actual
                     nuevo_precio = producto_actual['precio']
                     break
                 try:
-                    nuevo_precio = float(precio_str)
+                    nuevo_precio = database.a_centavos(precio_str)
                     if nuevo_precio < 0:
                         print(Fore.RED + "❌ Error: El precio no puede ser negativo." + Style.RESET_ALL)
                         nuevo_precio = None
                 except ValueError:
-                    print(Fore.RED + "❌ Error: El precio debe ser un número válido (ej. 10, 15.50)." + Style.RESET_ALL)
+                    print(Fore.RED + "❌ Error: El precio debe ser un número válido con hasta dos decimales (ej. 10, 15.50)." + Style.RESET_ALL)
 
             # Categoría: similar a agregar, pero preseleccionar la actual
             categorias_disponibles = ['Fruta', 'Verdura', 'Lácteo', 'Grano', 'Bebida', 'Alcohol',
@@ -268,8 +315,13 @@ def modificar_producto():
                 except ValueError:
                     print(Fore.RED + "❌ Error: Debe ingresar un número para la categoría. Se mantendrá la categoría actual." + Style.RESET_ALL)
 
-            # Llamar a la función actualizar_producto del módulo database
-            if database.actualizar_producto(id_producto, nuevo_nombre, nueva_descripcion, nueva_cantidad, nuevo_precio, nueva_categoria):
+            nuevo_sku = input(" Nuevo SKU o código de barras (Enter para no cambiar, '-' para quitarlo): ").strip()
+
+            # Los datos y el SKU se modifican en una sola transacción (un SKU repetido revierte todo)
+            with database.transaccion() as tx:
+                if database.actualizar_producto(id_producto, nuevo_nombre, nueva_descripcion, nueva_cantidad, nuevo_precio, nueva_categoria) and nuevo_sku:
+                    database.asignar_sku(id_producto, None if nuevo_sku == '-' else nuevo_sku)
+            if tx.confirmada:
                 print(Fore.GREEN + "✅ Producto modificado exitosamente!" + Style.RESET_ALL)
             else:
                 print(Fore.RED + "❌ No se pudo modificar el producto." + Style.RESET_ALL)
@@ -284,10 +336,102 @@ def modificar_producto():
             print(Fore.RED + f"❌ Se produjo un error inesperado durante la modificación: {e}" + Style.RESET_ALL)
 
 
+def _pedir_numero(mensaje, tipo=float, permitir_vacio=True):
+    """Pide un número por consola. Retorna None si se deja en blanco (cuando está permitido)."""
+    while True:
+        texto = input(mensaje).strip()
+        if not texto and permitir_vacio:
+            return None
+        try:
+            return tipo(texto)
+        except ValueError:
+            print(Fore.RED + "❌ Error: Debe ingresar un número válido." + Style.RESET_ALL)
+
+def actualizacion_masiva():
+    """
+    Aplica un cambio a todos los productos que cumplen unos filtros (categoría, rango de
+    precio y rango de stock) en una sola operación: ajuste de precio en porcentaje o monto,
+    reasignación de categoría o fijar el stock. Muestra una vista previa antes de confirmar.
+    Retorna la lista de acciones para el registro de auditoría (vacía si no se aplicó nada).
+    """
+    print(Fore.CYAN + "\n--- Actualización Masiva de Productos ---" + Style.RESET_ALL)
+    operaciones = [
+        ('porcentaje', "Cambiar precio en porcentaje (ej. 8 o -10)"),
+        ('monto', "Cambiar precio en un monto fijo (ej. 1.50 o -0.25)"),
+        ('categoria', "Reasignar categoría"),
+        ('stock', "Fijar el stock"),
+    ]
+    for numero, (_, texto) in enumerate(operaciones, start=1):
+        print(f"{numero}. {texto}")
+    opcion = _pedir_numero("Operación (o Enter para cancelar): ", int)
+    if opcion is None or not 1 <= opcion <= len(operaciones):
+        print(Fore.YELLOW + "🔙 Actualización masiva cancelada." + Style.RESET_ALL)
+        return []
+    operacion = operaciones[opcion - 1][0]
+
+    categorias = database.obtener_categorias()
+
+    def elegir_categoria(mensaje):
+        for numero, nombre in enumerate(categorias, start=1):
+            print(f"{numero}. {nombre}")
+        while True:
+            eleccion = _pedir_numero(mensaje, int)
+            if eleccion is None or 1 <= eleccion <= len(categorias):
+                return categorias[eleccion - 1] if eleccion else None
+            print(Fore.RED + "❌ Opción de categoría inválida." + Style.RESET_ALL)
+
+    if operacion == 'categoria':
+        print("\nNueva categoría:")
+        valor = elegir_categoria("Número de categoría: ")
+        if valor is None:
+            print(Fore.YELLOW + "🔙 Actualización masiva cancelada." + Style.RESET_ALL)
+            return []
+    elif operacion == 'stock':
+        valor = _pedir_numero("Nueva cantidad: ", int, permitir_vacio=False)
+        if valor < 0:
+            print(Fore.RED + "❌ Error: La cantidad no puede ser negativa." + Style.RESET_ALL)
+            return []
+    elif operacion == 'monto':
+        valor = _pedir_numero("Monto del ajuste: ", database.a_centavos, permitir_vacio=False) # En centavos
+    else:
+        valor = _pedir_numero("Porcentaje del ajuste: ", float, permitir_vacio=False)
+
+    def mostrar(columna_precio, dato):
+        return database.formatear_precio(dato) if columna_precio and dato is not None else dato
+
+    print(Fore.YELLOW + "\nFiltros (deje en blanco para no filtrar):" + Style.RESET_ALL)
+    filtros = {'categoria': elegir_categoria("Filtrar por categoría (número): "),
+               'precio_min': _pedir_numero("Precio mínimo: ", database.a_centavos),
+               'precio_max': _pedir_numero("Precio máximo: ", database.a_centavos),
+               'cantidad_min': _pedir_numero("Stock mínimo: ", int),
+               'cantidad_max': _pedir_numero("Stock máximo: ", int)}
+
+    es_precio = operacion in ('porcentaje', 'monto')
+    vista_previa = database.actualizar_productos_en_lote(operacion, valor, simular=True, **filtros)
+    if not vista_previa:
+        print(Fore.YELLOW + "⚠ Ningún producto cambiaría con esos filtros." + Style.RESET_ALL)
+        return []
+    print(Fore.CYAN + f"\nVista previa: {len(vista_previa)} producto(s) cambiarían. Primeros resultados:" + Style.RESET_ALL)
+    for id_producto, nombre, anterior, nuevo in vista_previa[:10]:
+        print(f"  ID {id_producto:<6} {nombre:<30} {mostrar(es_precio, anterior)} -> {mostrar(es_precio, nuevo)}")
+    if input(Fore.MAGENTA + "¿Aplicar los cambios? (s/n): " + Style.RESET_ALL).strip().lower() != 's':
+        print(Fore.YELLOW + "🔙 Actualización masiva cancelada." + Style.RESET_ALL)
+        return []
+
+    cambios = database.actualizar_productos_en_lote(operacion, valor, **filtros)
+    if not cambios:
+        return []
+    filtros_texto = ', '.join(f"{k}={mostrar(k.startswith('precio'), v)}" for k, v in filtros.items() if v is not None)
+    descripcion = f"{operacion} {mostrar(operacion == 'monto', valor)} (filtros: {filtros_texto or 'ninguno'})"
+    acciones = [f"Actualización masiva {descripcion}: {len(cambios)} producto(s)"]
+    acciones += [f"Actualización masiva {operacion}: producto {id_producto} '{nombre}' {mostrar(es_precio, anterior)} -> {mostrar(es_precio, nuevo)}"
+                 for id_producto, nombre, anterior, nuevo in cambios]
+    return acciones
+
 def eliminar_producto(): 
     """Función para eliminar un producto de la base de datos por su ID."""
     print(Fore.CYAN + "\n--- Eliminar Producto ---" + Style.RESET_ALL)
-    productos_actuales = database.obtener_todos_los_productos() # Obtener la lista actual de la DB
+    productos_actuales = database.obtener_todos_los_productos(formato='producto') # Obtener la lista actual de la DB
     if not productos_actuales:
         print(Fore.RED + "❌ No hay productos registrados para eliminar." + Style.RESET_ALL)
         return
@@ -338,7 +482,7 @@ def reporte_productos_bajo_limite():
         except ValueError:
             print(Fore.RED + "❌ Error: El límite de cantidad debe ser un número entero válido." + Style.RESET_ALL)
 
-    productos_bajo_limite = database.obtener_productos_por_cantidad_limite(limite_cantidad) # Llamar a la función de la base de datos para obtener productos con cantidad <= limite_cantidad
+    productos_bajo_limite = database.obtener_productos_por_cantidad_limite(limite_cantidad, formato='producto') # Llamar a la función de la base de datos para obtener productos con cantidad <= limite_cantidad
     # Si la función devuelve una lista vacía, significa que no se encontró nada
 
     if productos_bajo_limite:
@@ -348,5 +492,220 @@ def reporte_productos_bajo_limite():
         print(Fore.YELLOW + f"⚠ No se encontraron productos con cantidad igual o inferior a {limite_cantidad}." + Style.RESET_ALL)
 
 
+def historial_de_precios():
+    """
+    Muestra el historial de precios de un producto y el precio que tenía a una fecha o,
+    si no se indica un producto, el catálogo con los precios vigentes a esa fecha.
+    """
+    print(Fore.CYAN + "\n--- Historial de Precios ---" + Style.RESET_ALL)
+    id_str = input("ID del producto (Enter para ver el catálogo completo a una fecha): ").strip()
+    if id_str and not id_str.isdigit():
+        print(Fore.RED + "❌ Error: El ID debe ser un número entero válido." + Style.RESET_ALL)
+        return
+    fecha_str = input("Fecha a consultar (AAAA-MM-DD, Enter para hoy): ").strip()
+    try:
+        fecha = datetime.date.fromisoformat(fecha_str) if fecha_str else datetime.date.today()
+    except ValueError:
+        print(Fore.RED + "❌ Error: La fecha debe tener el formato AAAA-MM-DD (ej. 2024-03-03)." + Style.RESET_ALL)
+        return
+
+    if id_str:
+        historial = database.obtener_historial_precios(int(id_str))
+        if not historial:
+            print(Fore.YELLOW + f"⚠ No hay historial de precios para el producto con ID {id_str}." + Style.RESET_ALL)
+            return
+        print(Fore.GREEN + f"\nHistorial del producto con ID {id_str} (más reciente primero):" + Style.RESET_ALL)
+        for vigente_desde, precio in historial:
+            print(f"  Desde {vigente_desde[:19]}   ${database.formatear_precio(precio)}")
+        precio = database.obtener_precio_vigente(int(id_str), fecha)
+        if precio is None:
+            print(Fore.YELLOW + f"⚠ El producto no existía el {fecha}." + Style.RESET_ALL)
+        else:
+            print(Fore.CYAN + f"💰 Precio vigente el {fecha}: ${database.formatear_precio(precio)}" + Style.RESET_ALL)
+    else:
+        catalogo = database.obtener_precios_vigentes(fecha)
+        if not catalogo:
+            print(Fore.YELLOW + f"⚠ No hay productos con precio registrado al {fecha}." + Style.RESET_ALL)
+            return
+        print(Fore.GREEN + f"\nPrecios vigentes el {fecha}:" + Style.RESET_ALL)
+        for fila in catalogo:
+            print(f"  ID {fila['id']:<6} {fila['nombre'][:30]:<30} {fila['categoria'][:16]:<16} ${database.formatear_precio(fila['precio'])}")
+
+
+def _elegir_ubicacion(ubicaciones, mensaje):
+    """Muestra las ubicaciones numeradas y devuelve el nombre elegido, o None si la opción no es válida."""
+    for i, nombre in enumerate(ubicaciones, start=1):
+        print(f"  {i}. {nombre}")
+    opcion = _pedir_numero(mensaje, tipo=int)
+    if opcion is None or not 1 <= opcion <= len(ubicaciones):
+        print(Fore.RED + "❌ Error: Ubicación inválida." + Style.RESET_ALL)
+        return None
+    return ubicaciones[opcion - 1]
+
+def stock_por_ubicacion():
+    """
+    Submenú de stock por ubicación: listar una ubicación, ver el desglose de un producto,
+    transferir stock entre ubicaciones (varios productos en una sola operación) y ajustar
+    el stock de un producto en una ubicación.
+    Retorna la descripción de la acción realizada para el log, o None si no se hizo ninguna.
+    """
+    print(Fore.CYAN + "\n--- Stock por Ubicación ---" + Style.RESET_ALL)
+    print("1. Ver stock de una ubicación")
+    print("2. Ver stock de un producto por ubicación")
+    print("3. Transferir stock entre ubicaciones")
+    print("4. Ajustar stock de un producto en una ubicación")
+    print("5. Volver")
+    opcion = input("👉 Selecciona una opción (1-5): ").strip()
+    ubicaciones = database.obtener_ubicaciones()
+
+    if opcion == '1':
+        ubicacion = _elegir_ubicacion(ubicaciones, "Ubicación: ")
+        if ubicacion is None:
+            return None
+        filas = database.obtener_stock_por_ubicacion(ubicacion)
+        if not filas:
+            print(Fore.YELLOW + f"⚠ No hay stock en '{ubicacion}'." + Style.RESET_ALL)
+            return None
+        print(Fore.GREEN + f"\nStock en '{ubicacion}':" + Style.RESET_ALL)
+        for fila in filas:
+            print(f"  ID {fila['id']:<6} {fila['nombre'][:30]:<30} {fila['cantidad']:>8}")
+        print(Fore.CYAN + f"📦 Total: {sum(fila['cantidad'] for fila in filas)} unidad(es) de {len(filas)} producto(s)." + Style.RESET_ALL)
+        return f"Stock de la ubicación '{ubicacion}' consultado"
+    elif opcion == '2':
+        id_producto = _pedir_numero("ID del producto: ", tipo=int, permitir_vacio=False)
+        encontrados = database.obtener_producto_por_id_nombre_o_categoria(str(id_producto), formato='producto')
+        producto = next((p for p in encontrados if p.id == id_producto), None)
+        if producto is None:
+            print(Fore.YELLOW + f"⚠ No se encontró ningún producto con ID {id_producto}." + Style.RESET_ALL)
+            return None
+        print(Fore.GREEN + f"\nStock de '{producto.nombre}' (total: {producto.cantidad}):" + Style.RESET_ALL)
+        for ubicacion, cantidad in database.obtener_stock_de_producto(id_producto):
+            print(f"  {ubicacion:<20} {cantidad:>8}")
+        return f"Stock por ubicación del producto {id_producto} consultado"
+    elif opcion == '3':
+        origen = _elegir_ubicacion(ubicaciones, "Ubicación de origen: ")
+        destino = origen and _elegir_ubicacion(ubicaciones, "Ubicación de destino: ")
+        if not destino:
+            return None
+        if origen == destino:
+            print(Fore.RED + "❌ Error: El origen y el destino deben ser distintos." + Style.RESET_ALL)
+            return None
+        print(Fore.YELLOW + "Ingrese ID y cantidad de cada producto (ej. 12 5). Línea vacía para terminar." + Style.RESET_ALL)
+        cantidades = {}
+        while True:
+            linea = input("  ID cantidad: ").strip()
+            if not linea:
+                break
+            partes = linea.split()
+            if len(partes) != 2 or not all(parte.isdigit() for parte in partes) or int(partes[1]) == 0:
+                print(Fore.RED + "❌ Error: Ingrese un ID y una cantidad enteros positivos." + Style.RESET_ALL)
+                continue
+            cantidades[int(partes[0])] = cantidades.get(int(partes[0]), 0) + int(partes[1])
+        if not cantidades:
+            print(Fore.YELLOW + "🔙 Transferencia cancelada." + Style.RESET_ALL)
+            return None
+        if database.transferir_stock(origen, destino, cantidades):
+            return f"Transferencia de stock de '{origen}' a '{destino}': {len(cantidades)} producto(s), {sum(cantidades.values())} unidad(es)"
+        return None
+    elif opcion == '4':
+        id_producto = _pedir_numero("ID del producto: ", tipo=int, permitir_vacio=False)
+        ubicacion = _elegir_ubicacion(ubicaciones, "Ubicación: ")
+        if ubicacion is None:
+            return None
+        diferencia = _pedir_numero("Unidades a sumar (negativo para restar): ", tipo=int, permitir_vacio=False)
+        if diferencia == 0:
+            print(Fore.YELLOW + "⚠ No hay cambios que aplicar." + Style.RESET_ALL)
+            return None
+        if database.ajustar_stock_en_ubicacion(id_producto, ubicacion, diferencia):
+            return f"Stock del producto {id_producto} en '{ubicacion}' ajustado en {diferencia:+d}"
+        return None
+    elif opcion != '5':
+        print(Fore.RED + "❌ Opción inválida." + Style.RESET_ALL)
+    return None
+
+def _pedir_fecha(mensaje):
+    """Pide una fecha AAAA-MM-DD por consola. Retorna None si se deja en blanco o no es válida."""
+    texto = input(mensaje).strip()
+    if not texto:
+        return None
+    try:
+        return datetime.date.fromisoformat(texto)
+    except ValueError:
+        print(Fore.RED + "❌ Error: La fecha debe tener el formato AAAA-MM-DD (ej. 2024-03-03)." + Style.RESET_ALL)
+        return None
+
+def lotes_y_vencimientos():
+    """
+    Submenú de lotes: registrar un lote recibido, ver los lotes de un producto, reporte de
+    lotes por vencer y salida de stock (consume primero los lotes que vencen antes).
+    Retorna la descripción de la acción realizada para el log, o None si no se hizo ninguna.
+    """
+    print(Fore.CYAN + "\n--- Lotes y Vencimientos ---" + Style.RESET_ALL)
+    print("1. Registrar lote recibido")
+    print("2. Ver lotes de un producto")
+    print("3. Reporte de lotes por vencer")
+    print("4. Registrar salida de stock")
+    print("5. Volver")
+    opcion = input("👉 Selecciona una opción (1-5): ").strip()
+
+    if opcion == '1':
+        id_producto = _pedir_numero("ID del producto: ", tipo=int, permitir_vacio=False)
+        cantidad = _pedir_numero("Cantidad recibida: ", tipo=int, permitir_vacio=False)
+        vencimiento = _pedir_fecha("Fecha de vencimiento (AAAA-MM-DD): ")
+        if vencimiento is None:
+            print(Fore.YELLOW + "🔙 Registro de lote cancelado." + Style.RESET_ALL)
+            return None
+        if database.registrar_lote(id_producto, cantidad, vencimiento):
+            return f"Lote registrado: producto {id_producto}, {cantidad} unidad(es), vence {vencimiento}"
+        return None
+    elif opcion == '2':
+        id_producto = _pedir_numero("ID del producto: ", tipo=int, permitir_vacio=False)
+        lotes = database.obtener_lotes_de_producto(id_producto)
+        if not lotes:
+            print(Fore.YELLOW + f"⚠ El producto con ID {id_producto} no tiene lotes con stock." + Style.RESET_ALL)
+            return None
+        hoy = datetime.date.today().isoformat()
+        print(Fore.GREEN + f"\nLotes del producto {id_producto} (en orden de salida):" + Style.RESET_ALL)
+        for lote, vencimiento, cantidad in lotes:
+            color = Fore.RED if vencimiento < hoy else ""
+            print(color + f"  Lote {lote:<8} vence {vencimiento}   {cantidad:>8} unidad(es)" + Style.RESET_ALL)
+        return f"Lotes del producto {id_producto} consultados"
+    elif opcion == '3':
+        dias = _pedir_numero("Mostrar lotes que vencen dentro de cuántos días: ", tipo=int, permitir_vacio=False)
+        lotes = database.obtener_lotes_por_vencer(dias)
+        if not lotes:
+            print(Fore.GREEN + f"✅ No hay lotes con stock que venzan en los próximos {dias} día(s)." + Style.RESET_ALL)
+            return f"Reporte de lotes por vencer ({dias} días)"
+        hoy = datetime.date.today().isoformat()
+        print(Fore.GREEN + f"\nLotes que vencen en los próximos {dias} día(s) (en rojo, ya vencidos):" + Style.RESET_ALL)
+        for fila in lotes:
+            color = Fore.RED if fila['vencimiento'] < hoy else ""
+            print(color + f"  {fila['vencimiento']}   ID {fila['producto_id']:<6} {fila['nombre'][:30]:<30} "
+                  f"{fila['categoria'][:14]:<14} {fila['cantidad']:>8}" + Style.RESET_ALL)
+        print(Fore.CYAN + f"📦 {sum(fila['cantidad'] for fila in lotes)} unidad(es) en {len(lotes)} lote(s)." + Style.RESET_ALL)
+        return f"Reporte de lotes por vencer ({dias} días)"
+    elif opcion == '4':
+        print(Fore.YELLOW + "Ingrese ID y cantidad de cada producto (ej. 12 5). Línea vacía para terminar." + Style.RESET_ALL)
+        salidas = {}
+        while True:
+            linea = input("  ID cantidad: ").strip()
+            if not linea:
+                break
+            partes = linea.split()
+            if len(partes) != 2 or not all(parte.isdigit() for parte in partes) or int(partes[1]) == 0:
+                print(Fore.RED + "❌ Error: Ingrese un ID y una cantidad enteros positivos." + Style.RESET_ALL)
+                continue
+            salidas[int(partes[0])] = salidas.get(int(partes[0]), 0) + int(partes[1])
+        if not salidas:
+            print(Fore.YELLOW + "🔙 Salida cancelada." + Style.RESET_ALL)
+            return None
+        if database.registrar_salidas(salidas):
+            return f"Salida de stock: {len(salidas)} producto(s), {sum(salidas.values())} unidad(es)"
+        return None
+    elif opcion != '5':
+        print(Fore.RED + "❌ Opción inválida." + Style.RESET_ALL)
+    return None
+
+
 
 
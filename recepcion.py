@@ -0,0 +1,118 @@
+"""
+Este módulo implementa la recepción de mercadería por escaneo: lee códigos de barras
+(SKU), uno por línea, desde la consola (un lector que actúa como teclado), la entrada
+estándar o un archivo. Las lecturas se cuentan en memoria y se aplican como incrementos
+de stock en lote (database.incrementar_stock_por_sku), en una transacción cada N lecturas.
+Uso: python recepcion.py [archivo] --lote 500   (sin archivo, lee la entrada estándar)
+"""
+import argparse
+import collections
+import sys
+import time
+
+from colorama import Fore, Style, init
+
+import database
+
+# Inicializar colorama para mensajes de consola
+init(autoreset=True)
+
+# Lecturas que se acumulan en memoria antes de aplicarlas en una transacción
+TAMANO_LOTE_ESCANEO = 500
+# Textos que terminan la recepción en modo interactivo (un lector nunca envía una línea vacía)
+FIN_ESCANEO = ('', 'fin')
+
+
+def recibir(lecturas, tamano_lote=TAMANO_LOTE_ESCANEO):
+    """
+    Procesa un iterable de códigos (uno por lectura) y aplica los incrementos de stock
+    cada 'tamano_lote' lecturas y al final. Si un lote no se puede aplicar (por ejemplo,
+    base ocupada), sus conteos se conservan y se reintentan con el lote siguiente.
+    Retorna un diccionario con el resumen: lecturas, unidades aplicadas, lotes,
+    unidades pendientes (no aplicadas), SKU desconocidos (con sus lecturas) y segundos.
+    """
+    resumen = {'lecturas': 0, 'aplicadas': 0, 'lotes': 0, 'pendientes': 0,
+               'desconocidos': collections.Counter(), 'segundos': 0.0}
+    conteos = collections.Counter()
+    en_lote = 0
+    t0 = time.perf_counter()
+
+    def aplicar():
+        desconocidos = database.incrementar_stock_por_sku(conteos)
+        if desconocidos is None:
+            return
+        for sku in desconocidos:
+            resumen['desconocidos'][sku] += conteos.pop(sku)
+        resumen['aplicadas'] += sum(conteos.values())
+        resumen['lotes'] += 1
+        if desconocidos:
+            print(Fore.RED + f"❌ SKU desconocido(s): {', '.join(desconocidos)}" + Style.RESET_ALL)
+        conteos.clear()
+
+    for lectura in lecturas:
+        sku = lectura.strip()
+        if not sku:
+            continue
+        conteos[sku] += 1
+        resumen['lecturas'] += 1
+        en_lote += 1
+        if en_lote >= tamano_lote:
+            aplicar()
+            en_lote = 0
+    if conteos:
+        aplicar()
+    resumen['pendientes'] = sum(conteos.values())
+    resumen['segundos'] = time.perf_counter() - t0
+    return resumen
+
+
+def _lecturas_de_consola():
+    """Lee códigos de la consola hasta una línea vacía, 'fin' o fin de archivo."""
+    while True:
+        try:
+            texto = input()
+        except EOFError:
+            return
+        if texto.strip().lower() in FIN_ESCANEO:
+            return
+        yield texto
+
+
+def mostrar_resumen(resumen):
+    """Muestra por consola el resumen de una recepción."""
+    por_segundo = resumen['lecturas'] / resumen['segundos'] if resumen['segundos'] else 0.0
+    print(Fore.CYAN + "\n--- Resumen de la recepción ---" + Style.RESET_ALL)
+    print(f"  Lecturas: {resumen['lecturas']} ({por_segundo:,.0f}/s) en {resumen['lotes']} lote(s)")
+    print(f"  Unidades sumadas al stock: {resumen['aplicadas']}")
+    if resumen['desconocidos']:
+        print(Fore.RED + f"  Lecturas con SKU desconocido: {sum(resumen['desconocidos'].values())} "
+              f"({len(resumen['desconocidos'])} código(s) distinto(s))" + Style.RESET_ALL)
+    if resumen['pendientes']:
+        print(Fore.RED + f"❌ {resumen['pendientes']} unidad(es) no se pudieron aplicar." + Style.RESET_ALL)
+
+
+def modo_recepcion():
+    """
+    Recepción interactiva desde el menú principal: cada línea es un código escaneado.
+    Termina con una línea vacía o 'fin'. Retorna el resumen de la recepción.
+    """
+    print(Fore.CYAN + "\n--- Recepción por Escaneo ---" + Style.RESET_ALL)
+    print(Fore.YELLOW + f"Escanee los códigos (el stock se actualiza cada {TAMANO_LOTE_ESCANEO} lecturas y al terminar)." + Style.RESET_ALL)
+    print(Fore.YELLOW + "Línea vacía o 'fin' para terminar." + Style.RESET_ALL)
+    resumen = recibir(_lecturas_de_consola())
+    mostrar_resumen(resumen)
+    return resumen
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recepción de mercadería por escaneo de códigos (SKU).")
+    parser.add_argument('archivo', nargs='?', help="Archivo con un código por línea (por defecto, la entrada estándar)")
+    parser.add_argument('--lote', type=int, default=TAMANO_LOTE_ESCANEO, help="Lecturas por transacción")
+    args = parser.parse_args()
+
+    database.crear_tablas()
+    if args.archivo:
+        with open(args.archivo, encoding='utf-8') as archivo:
+            mostrar_resumen(recibir(archivo, args.lote))
+    else:
+        mostrar_resumen(recibir(sys.stdin, args.lote))
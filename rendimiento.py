@@ -0,0 +1,841 @@
+"""
+Este módulo reúne las mediciones de rendimiento de las funciones de database.py.
+Cada medición trabaja sobre una base de datos temporal poblada con productos
+sintéticos, por lo que nunca modifica 'inventario.db'.
+Uso: python rendimiento.py <medicion> [--filas N]
+"""
+import argparse
+import contextlib
+import datetime
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from colorama import Fore, Style, init
+
+import database
+
+# Inicializar colorama para mensajes de consola
+init(autoreset=True)
+
+CATEGORIAS_PRUEBA = ['Fruta', 'Verdura', 'Lácteo', 'Bebida', 'Limpieza', 'Otros']
+
+
+@contextlib.contextmanager
+def base_temporal(filas):
+    """
+    Crea una base de datos temporal con 'filas' productos sintéticos y la deja
+    configurada como database.ARCHIVO_DB mientras dura el bloque 'with', con la
+    caché de lecturas desactivada (medir_cache la activa por su cuenta).
+    """
+    archivo_original = database.ARCHIVO_DB
+    with tempfile.TemporaryDirectory() as directorio, database.sin_cache_lecturas():
+        database.ARCHIVO_DB = os.path.join(directorio, 'inventario.db')
+        try:
+            with contextlib.redirect_stdout(open(os.devnull, 'w', encoding='utf-8')):
+                database.crear_tablas()
+            conn = database.conectar_db()
+            conn.executemany(
+                "INSERT INTO productos (nombre, descripcion, cantidad, precio, categoria) VALUES (?, ?, ?, ?, ?)",
+                ((f"Producto {i}", f"Descripción del producto {i}", i % 500, i % 10000,
+                  CATEGORIAS_PRUEBA[i % len(CATEGORIAS_PRUEBA)]) for i in range(filas)))
+            conn.commit()
+            conn.close()
+            yield database.ARCHIVO_DB
+        finally:
+            database.cerrar_pool_lectura()
+            database.ARCHIVO_DB = archivo_original
+
+
+def medir_formatos_de_fila(filas=100000, repeticiones=3):
+    """
+    Compara los formatos de fila de obtener_todos_los_productos ('row', 'producto'
+    y 'tupla'): memoria por fila retenida en la lista y tiempo de construcción.
+    """
+    print(Fore.CYAN + f"\n--- Formatos de fila ({filas} productos) ---" + Style.RESET_ALL)
+    with base_temporal(filas):
+        for formato in database.FORMATOS_FILA:
+            tiempos = []
+            for _ in range(repeticiones):
+                t0 = time.perf_counter()
+                database.obtener_todos_los_productos(formato=formato)
+                tiempos.append(time.perf_counter() - t0)
+
+            tracemalloc.start()
+            resultado = database.obtener_todos_los_productos(formato=formato)
+            memoria, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            del resultado
+
+            mejor = min(tiempos)
+            print(f"  {formato:<9} {mejor * 1000:8.1f} ms  ({mejor / filas * 1e6:5.2f} µs/fila)   "
+                  f"{memoria / filas:6.0f} bytes/fila")
+
+
+def medir_analitica(filas=100000):
+    """
+    Compara los reportes avanzados vectorizados (analitica.calcular_reportes) con
+    el mismo cálculo hecho con bucles de Python sobre obtener_todos_los_productos,
+    informando tiempo, pico de memoria y error de la mediana de precio.
+    """
+    import statistics
+    import analitica
+
+    def con_bucles():
+        productos = database.obtener_todos_los_productos(formato='tupla')
+        por_categoria = {}
+        for _, _, _, cantidad, precio, categoria in productos:
+            datos = por_categoria.setdefault(categoria, [0, 0, 0.0])
+            datos[0] += 1
+            datos[1] += cantidad
+            datos[2] += cantidad * precio
+        valores = sorted((p[3] * p[4] for p in productos), reverse=True)
+        return por_categoria, valores, statistics.median(p[4] for p in productos) / 100
+
+    print(Fore.CYAN + f"\n--- Reportes avanzados ({filas} productos) ---" + Style.RESET_ALL)
+    with base_temporal(filas):
+        for titulo, funcion in (("Bucles Python", con_bucles), ("NumPy por lotes", analitica.calcular_reportes)):
+            t0 = time.perf_counter()
+            resultado = funcion()
+            duracion = time.perf_counter() - t0
+            # La memoria se mide en una segunda corrida porque tracemalloc distorsiona los tiempos
+            tracemalloc.start()
+            funcion()
+            _, pico = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"  {titulo:<16} {duracion * 1000:9.1f} ms   pico de memoria {pico / 2**20:8.1f} MB")
+            if titulo == "Bucles Python":
+                mediana_exacta = resultado[2]
+            else:
+                mediana = resultado['percentiles_precio'][50]
+                print(f"  Mediana de precio: exacta ${mediana_exacta:.2f}, histograma ${mediana:.2f}")
+
+
+def medir_lectores_concurrentes(filas=100000, duracion=3.0, maximo_hilos=8):
+    """
+    Mide cuántas lecturas por segundo (reporte de stock bajo y búsqueda) se logran
+    con 1, 2, 4... hilos lectores mientras un hilo escritor actualiza productos sin pausa.
+    """
+    print(Fore.CYAN + f"\n--- Lectores concurrentes con un escritor activo ({filas} productos, {duracion:.0f} s por medición) ---" + Style.RESET_ALL)
+    with base_temporal(filas), contextlib.redirect_stdout(open(os.devnull, 'w', encoding='utf-8')):
+        resultados = []
+        hilos = 1
+        while hilos <= maximo_hilos:
+            detener = threading.Event()
+            lecturas = [0] * hilos
+            escrituras = [0]
+
+            def escritor():
+                i = 0
+                while not detener.is_set():
+                    database.actualizar_producto(i % filas + 1, f"Producto {i}", "Editado", i % 500, 100, "Otros")
+                    escrituras[0] += 1
+                    i += 1
+
+            def lector(numero):
+                i = 0
+                while not detener.is_set():
+                    if i % 2:
+                        database.obtener_productos_por_cantidad_limite(2)
+                    else:
+                        database.obtener_producto_por_id_nombre_o_categoria(str(i % filas + 1))
+                    lecturas[numero] += 1
+                    i += 1
+
+            trabajadores = [threading.Thread(target=escritor)] + [threading.Thread(target=lector, args=(n,)) for n in range(hilos)]
+            for hilo in trabajadores:
+                hilo.start()
+            time.sleep(duracion)
+            detener.set()
+            for hilo in trabajadores:
+                hilo.join()
+            resultados.append((hilos, sum(lecturas) / duracion, escrituras[0] / duracion))
+            hilos *= 2
+    base = resultados[0][1] or 1
+    for hilos, lecturas_s, escrituras_s in resultados:
+        print(f"  {hilos:>2} lectores: {lecturas_s:8.1f} lecturas/s (x{lecturas_s / base:.2f})   escritor: {escrituras_s:8.1f} escrituras/s")
+    print(f"  Núcleos disponibles: {os.cpu_count()}")
+
+
+def medir_sugerencias(filas=1000000, consultas=10000):
+    """
+    Mide el índice de prefijos de sugerencias.py: tiempo de construcción, memoria
+    retenida, latencia de las sugerencias (p50/p99/máxima) y de las actualizaciones
+    incrementales, comparada con la búsqueda LIKE de la base.
+    """
+    import sugerencias
+
+    print(Fore.CYAN + f"\n--- Índice de sugerencias ({filas} productos) ---" + Style.RESET_ALL)
+    with base_temporal(filas), contextlib.redirect_stdout(open(os.devnull, 'w', encoding='utf-8')):
+        t0 = time.perf_counter()
+        indice = sugerencias.iniciar_indice()
+        construccion = time.perf_counter() - t0
+        # La memoria se mide en una segunda construcción porque tracemalloc distorsiona los tiempos
+        tracemalloc.start()
+        copia = sugerencias.IndicePrefijos()
+        conn = database.conectar_db()
+        conn.row_factory = None
+        copia.construir(conn.execute("SELECT id, nombre, categoria FROM productos"))
+        conn.close()
+        memoria, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del copia
+
+        aleatorio = random.Random(0)
+        prefijos = [f"Producto {aleatorio.randrange(filas)}"[:aleatorio.randint(3, 14)] for _ in range(consultas)]
+        latencias = []
+        for prefijo in prefijos:
+            t0 = time.perf_counter()
+            indice.sugerir(prefijo)
+            latencias.append(time.perf_counter() - t0)
+        latencias.sort()
+
+        actualizaciones = []
+        for i in range(200):
+            id_producto = aleatorio.randrange(filas) + 1
+            t0 = time.perf_counter()
+            indice.actualizar(id_producto, (f"Producto {id_producto - 1}", "Otros"), (f"Renombrado {i}", "Otros"))
+            actualizaciones.append(time.perf_counter() - t0)
+        actualizaciones.sort()
+
+        t0 = time.perf_counter()
+        for prefijo in prefijos[:20]:
+            database.obtener_producto_por_id_nombre_o_categoria(prefijo)
+        like = (time.perf_counter() - t0) / 20
+        database.quitar_observador_productos(indice.actualizar)
+        sugerencias.indice = None
+
+    def ms(segundos):
+        return f"{segundos * 1000:8.3f} ms"
+    print(f"  {'Construcción:':<26}{ms(construccion)}")
+    print(f"  {'Memoria del índice:':<26}{memoria / 2**20:8.1f} MB ({memoria / filas:.0f} bytes/producto)")
+    print(f"  {'Sugerencia p50:':<26}{ms(latencias[len(latencias) // 2])}")
+    print(f"  {'Sugerencia p99:':<26}{ms(latencias[int(len(latencias) * 0.99)])}")
+    print(f"  {'Sugerencia máxima:':<26}{ms(latencias[-1])}")
+    print(f"  {'Actualización p50:':<26}{ms(actualizaciones[len(actualizaciones) // 2])}")
+    print(f"  {'Actualización máxima:':<26}{ms(actualizaciones[-1])}")
+    print(f"  {'Búsqueda LIKE (promedio):':<26}{ms(like)}")
+
+
+def _escritor_contencion(ruta_db, numero, escrituras, filas, espera_ocupada, reintentos):
+    """Proceso de medir_contencion: mezcla altas y modificaciones y cuenta las que fallan."""
+    database.ARCHIVO_DB = ruta_db
+    database.ESPERA_OCUPADA = espera_ocupada
+    database.REINTENTOS_ESCRITURA = reintentos
+    fallidas = 0
+    latencias = []
+    with contextlib.redirect_stdout(open(os.devnull, 'w', encoding='utf-8')):
+        for i in range(escrituras):
+            t0 = time.perf_counter()
+            if i % 2:
+                exito = database.actualizar_producto((numero * escrituras + i) % filas + 1, f"Producto {i}", "Editado",
+                                                     i % 500, 100, "Otros")
+            else:
+                exito = database.agregar_producto(f"Nuevo {numero}-{i}", "Alta concurrente", 1, 100, "Otros") is not None
+            latencias.append(time.perf_counter() - t0)
+            fallidas += not exito
+    return fallidas, latencias, database.obtener_contadores_contencion()
+
+
+def medir_contencion(filas=10000, procesos=8, escrituras=300):
+    """
+    Prueba de estrés con varios procesos escribiendo a la vez en la misma base.
+    Compara la configuración anterior (sin espera por el bloqueo ni reintentos) con
+    BEGIN IMMEDIATE + espera + reintentos con espera exponencial, e informa las
+    escrituras fallidas, los reintentos y la latencia por escritura.
+    """
+    print(Fore.CYAN + f"\n--- Contención de escritura ({procesos} procesos x {escrituras} escrituras) ---" + Style.RESET_ALL)
+    configuraciones = (("Sin espera ni reintentos", 0.0, 0),
+                       ("Solo reintentos", 0.0, database.REINTENTOS_ESCRITURA),
+                       ("Espera + reintentos", database.ESPERA_OCUPADA, database.REINTENTOS_ESCRITURA))
+    with base_temporal(filas) as ruta_db:
+        for titulo, espera_ocupada, reintentos in configuraciones:
+            t0 = time.perf_counter()
+            with multiprocessing.Pool(procesos) as pool:
+                resultados = pool.starmap(_escritor_contencion, [(ruta_db, n, escrituras, filas, espera_ocupada, reintentos)
+                                                                 for n in range(procesos)])
+            duracion = time.perf_counter() - t0
+            fallidas = sum(r[0] for r in resultados)
+            latencias = sorted(l for r in resultados for l in r[1])
+            reintentos_totales = sum(r[2]['reintentos'] for r in resultados)
+            total = procesos * escrituras
+            color = Fore.GREEN if fallidas == 0 else Fore.RED
+            print(f"  {titulo:<26}" + color + f"fallidas: {fallidas:>5}/{total}" + Style.RESET_ALL +
+                  f"   reintentos: {reintentos_totales:>5}   {total / duracion:7.0f} escrituras/s   "
+                  f"p50 {latencias[len(latencias) // 2] * 1000:6.1f} ms   p99 {latencias[int(len(latencias) * 0.99)] * 1000:7.1f} ms")
+    print(f"  Núcleos disponibles: {os.cpu_count()}")
+
+
+def medir_precios(filas=1000000):
+    """
+    Compara el valor total del stock (SUM(cantidad * precio)) con precios guardados
+    como REAL en pesos y como INTEGER en centavos: tiempo de la suma en SQL y en
+    Python, y diferencia con el total exacto calculado con Decimal.
+    """
+    from decimal import Decimal
+
+    print(Fore.CYAN + f"\n--- Precios REAL vs INTEGER en centavos ({filas} productos) ---" + Style.RESET_ALL)
+    aleatorio = random.Random(0)
+    datos = [(aleatorio.randint(0, 500), aleatorio.randint(1, 99999)) for _ in range(filas)]
+    exacto = sum(Decimal(cantidad) * Decimal(centavos) for cantidad, centavos in datos) / 100
+    conn = sqlite3.connect(':memory:')
+    conn.execute("CREATE TABLE real_pesos (cantidad INTEGER, precio REAL)")
+    conn.execute("CREATE TABLE entero_centavos (cantidad INTEGER, precio INTEGER)")
+    conn.executemany("INSERT INTO real_pesos VALUES (?, ?)", ((c, p / 100) for c, p in datos))
+    conn.executemany("INSERT INTO entero_centavos VALUES (?, ?)", datos)
+    for titulo, tabla, a_pesos in (("REAL (pesos)", 'real_pesos', Decimal),
+                                   ("INTEGER (centavos)", 'entero_centavos', database.a_pesos)):
+        t0 = time.perf_counter()
+        suma_sql = conn.execute(f"SELECT SUM(cantidad * precio) FROM {tabla}").fetchone()[0]
+        duracion_sql = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        suma_python = sum(cantidad * precio for cantidad, precio in conn.execute(f"SELECT cantidad, precio FROM {tabla}"))
+        duracion_python = time.perf_counter() - t0
+        error = abs(a_pesos(suma_sql) - exacto)
+        color = Fore.GREEN if error == 0 and a_pesos(suma_python) == exacto else Fore.RED
+        print(f"  {titulo:<20} SQL {duracion_sql * 1000:7.1f} ms   Python {duracion_python * 1000:7.1f} ms   " + color +
+              f"total ${a_pesos(suma_sql):,.2f}   error {error:.10f}" + Style.RESET_ALL)
+    conn.close()
+    print(f"  Total exacto (Decimal): ${exacto:,.2f}")
+
+
+def medir_escaneo(filas=100000, lecturas=50000, lotes=(1, 50, 500, 5000)):
+    """
+    Mide la recepción por escaneo (recepcion.recibir) con distintos tamaños de lote:
+    lecturas por segundo cuando cada transacción aplica 1, 50, 500... lecturas.
+    """
+    import recepcion
+
+    print(Fore.CYAN + f"\n--- Recepción por escaneo ({filas} productos con SKU, {lecturas} lecturas) ---" + Style.RESET_ALL)
+    aleatorio = random.Random(0)
+    codigos = [f"{aleatorio.randrange(1, filas + 1):013d}" for _ in range(lecturas)]
+    with base_temporal(filas):
+        conn = database.conectar_db()
+        conn.execute("UPDATE productos SET sku = printf('%013d', id)")
+        conn.commit()
+        conn.close()
+        for lote in lotes:
+            # Con lotes chicos cada lectura es una transacción: se mide sobre menos lecturas
+            muestra = codigos if lote >= 50 else codigos[:2000]
+            with contextlib.redirect_stdout(open(os.devnull, 'w', encoding='utf-8')):
+                resumen = recepcion.recibir(muestra, lote)
+            print(f"  lote {lote:>5}: {resumen['lecturas'] / resumen['segundos']:10,.0f} lecturas/s   "
+                  f"({resumen['lotes']} transacciones, {resumen['aplicadas']} unidades aplicadas)")
+
+
+def medir_reimportacion(filas=200000, cambios=0.01):
+    """
+    Importa un catálogo con SKU y lo vuelve a importar sin cambios y con una fracción
+    'cambios' de precios modificados: el tiempo debería depender de las filas que
+    cambian y el tamaño de la base mantenerse estable.
+    """
+    import importador
+
+    print(Fore.CYAN + f"\n--- Reimportación idempotente por SKU ({filas} filas) ---" + Style.RESET_ALL)
+    pasos = (("Importación inicial", 0.0), ("Reimportación sin cambios", 0.0),
+             (f"Reimportación con {cambios:.0%} de cambios", cambios), ("Reimportación sin cambios", cambios))
+    with base_temporal(0) as ruta_db, tempfile.TemporaryDirectory() as directorio:
+        ruta_archivo = os.path.join(directorio, 'catalogo.csv')
+        for titulo, fraccion in pasos:
+            importador.generar_archivo_prueba(ruta_archivo, filas, cambios=fraccion)
+            est = importador.importar_catalogo(ruta_archivo, ruta_db=ruta_db, mostrar=False)
+            conn = database.conectar_db()
+            paginas = conn.execute("PRAGMA page_count").fetchone()[0] - conn.execute("PRAGMA freelist_count").fetchone()[0]
+            tamano = paginas * conn.execute("PRAGMA page_size").fetchone()[0]
+            conn.close()
+            print(f"  {titulo:<32} {est['t_total']:6.2f} s (escritor {est['t_escritura']:5.2f} s)   insertadas {est['insertadas']:>7}   "
+                  f"actualizadas {est['actualizadas']:>7}   sin cambios {est['sin_cambios']:>7}   base {tamano / 2**20:6.1f} MB")
+
+
+def medir_historial(filas=20000, cambios=50, consultas=10000):
+    """
+    Genera un historial de 'cambios' precios por producto repartidos en tres años y mide
+    el precio vigente de un producto a una fecha (una búsqueda en el índice) y el catálogo
+    de precios a una fecha, comparado con agrupar todo el historial (GROUP BY).
+    """
+    print(Fore.CYAN + f"\n--- Historial de precios ({filas} productos x {cambios} cambios) ---" + Style.RESET_ALL)
+    aleatorio = random.Random(0)
+    inicio = datetime.datetime(2022, 1, 1)
+    segundos = 3 * 365 * 86400
+
+    def fecha(desplazamiento):
+        return (inicio + datetime.timedelta(seconds=desplazamiento)).strftime('%Y-%m-%d %H:%M:%S.%f')[:23]
+
+    with base_temporal(filas):
+        conn = database.conectar_db()
+        conn.execute("DELETE FROM historial_precios")
+        conn.executemany("INSERT OR REPLACE INTO historial_precios (producto_id, vigente_desde, precio) VALUES (?, ?, ?)",
+                         ((id_producto, fecha(desplazamiento), aleatorio.randint(1, 99999))
+                          for id_producto in range(1, filas + 1)
+                          for desplazamiento in sorted(aleatorio.sample(range(segundos), cambios))))
+        conn.commit()
+        conn.close()
+
+        latencias = []
+        for _ in range(consultas):
+            id_producto, momento = aleatorio.randint(1, filas), fecha(aleatorio.randrange(segundos))
+            t0 = time.perf_counter()
+            database.obtener_precio_vigente(id_producto, momento)
+            latencias.append(time.perf_counter() - t0)
+        latencias.sort()
+        print(f"  Precio de un producto a una fecha: p50 {latencias[len(latencias) // 2] * 1e6:6.1f} µs   "
+              f"p99 {latencias[int(len(latencias) * 0.99)] * 1e6:6.1f} µs")
+
+        conn = database.conectar_db()
+        for momento in (fecha(segundos // 10), fecha(segundos // 2), fecha(segundos - 1)):
+            t0 = time.perf_counter()
+            catalogo = database.obtener_precios_vigentes(momento, formato='tupla')
+            duracion_indice = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            agrupado = conn.execute('''
+                SELECT producto_id, precio, MAX(vigente_desde) FROM historial_precios
+                WHERE vigente_desde <= ? GROUP BY producto_id
+            ''', (momento,)).fetchall()
+            duracion_agrupado = time.perf_counter() - t0
+            iguales = {fila[0]: fila[3] for fila in catalogo} == {fila[0]: fila[1] for fila in agrupado}
+            print(f"  Catálogo al {momento[:10]}: por índice {duracion_indice * 1000:7.1f} ms   "
+                  f"GROUP BY {duracion_agrupado * 1000:7.1f} ms   ({len(catalogo)} productos, "
+                  + (Fore.GREEN + "coinciden" if iguales else Fore.RED + "NO coinciden") + Style.RESET_ALL + ")")
+        conn.close()
+
+
+def medir_instantaneas(filas=100000, dias=365, rotacion=0.01, consultas=2000):
+    """
+    Simula 'dias' días en los que cambia el stock de una fracción 'rotacion' de los
+    productos y se toma una instantánea por día. Informa el espacio usado frente a
+    guardar el catálogo completo cada día y el tiempo de las consultas a una fecha.
+    """
+    import instantaneas
+
+    print(Fore.CYAN + f"\n--- Instantáneas de stock ({filas} productos, {dias} días, {rotacion:.0%} de cambios por día) ---" + Style.RESET_ALL)
+    aleatorio = random.Random(0)
+    inicio = datetime.date(2024, 1, 1)
+    fechas = [(inicio + datetime.timedelta(days=d)).isoformat() for d in range(dias)]
+    with base_temporal(filas):
+        tiempos = []
+        for fecha in fechas:
+            conn = database.conectar_db()
+            conn.executemany("UPDATE productos SET cantidad = ? WHERE id = ?",
+                             ((aleatorio.randrange(500), aleatorio.randint(1, filas)) for _ in range(int(filas * rotacion))))
+            conn.commit()
+            conn.close()
+            tiempos.append(instantaneas.tomar_instantanea(fecha, mostrar=False)['segundos'])
+        conn = database.conectar_db()
+        guardadas = conn.execute("SELECT COUNT(*) FROM stock_instantaneas").fetchone()[0]
+        bytes_usados = conn.execute("SELECT SUM(pgsize) FROM dbstat WHERE name IN ('stock_instantaneas', 'idx_stock_instantaneas_fecha')").fetchone()[0]
+        conn.close()
+        print(f"  Filas guardadas: {guardadas} ({bytes_usados / 2**20:.1f} MB) frente a {filas * dias} con el catálogo completo diario "
+              f"({guardadas / (filas * dias):.1%})")
+        print(f"  Toma de instantánea: p50 {sorted(tiempos)[len(tiempos) // 2] * 1000:.1f} ms   máx {max(tiempos) * 1000:.1f} ms")
+
+        completas = [fecha for fecha, completa, _ in instantaneas.resumen_instantaneas() if completa]
+        print(f"  Instantáneas completas (checkpoints): {len(completas)}")
+        # Justo en un checkpoint, a mitad de camino y justo antes del siguiente (el peor caso)
+        siguiente = fechas.index(completas[1]) if len(completas) > 1 else len(fechas)
+        for fecha in (fechas[0], fechas[siguiente // 2], fechas[siguiente - 1], fechas[-1]):
+            t0 = time.perf_counter()
+            stock = instantaneas.stock_en_fecha(fecha)
+            print(f"  Stock completo al {fecha}: {(time.perf_counter() - t0) * 1000:7.1f} ms ({len(stock)} productos)")
+        latencias = []
+        for _ in range(consultas):
+            id_producto, fecha = aleatorio.randint(1, filas), aleatorio.choice(fechas)
+            t0 = time.perf_counter()
+            instantaneas.stock_producto_en_fecha(id_producto, fecha)
+            latencias.append(time.perf_counter() - t0)
+        latencias.sort()
+        print(f"  Stock de un producto a una fecha: p50 {latencias[len(latencias) // 2] * 1e6:.1f} µs   "
+              f"p99 {latencias[int(len(latencias) * 0.99)] * 1e6:.1f} µs")
+
+
+def medir_ubicaciones(filas=100000, transferencias=2000, por_transferencia=20, consultas=2000):
+    """
+    Reparte el stock de los productos entre las ubicaciones con transferencias de varios
+    productos y mide: cada transferencia (una transacción), el reporte de stock bajo antes
+    y después de repartir (debe seguir leyendo el total de productos), el listado de una
+    ubicación y el desglose de un producto. Verifica además que los listados usen índices
+    que los cubren y que la suma por ubicación coincida con el total de cada producto.
+    """
+    print(Fore.CYAN + f"\n--- Stock por ubicación ({filas} productos) ---" + Style.RESET_ALL)
+    aleatorio = random.Random(0)
+
+    def stock_bajo():
+        t0 = time.perf_counter()
+        for limite in (5, 50, 200):
+            database.obtener_productos_por_cantidad_limite(limite, formato='tupla')
+        return (time.perf_counter() - t0) / 3
+
+    with base_temporal(filas):
+        antes = stock_bajo()
+        ubicaciones = database.obtener_ubicaciones()
+        conn = database.conectar_db()
+        con_stock = [fila[0] for fila in conn.execute("SELECT id FROM productos WHERE cantidad >= 2")]
+        conn.close()
+
+        latencias, fallidas = [], 0
+        with contextlib.redirect_stdout(open(os.devnull, 'w', encoding='utf-8')):
+            for _ in range(transferencias):
+                cantidades = {id_producto: 1 for id_producto in aleatorio.sample(con_stock, por_transferencia)}
+                t0 = time.perf_counter()
+                fallidas += not database.transferir_stock(ubicaciones[0], aleatorio.choice(ubicaciones[1:]), cantidades)
+                latencias.append(time.perf_counter() - t0)
+        latencias.sort()
+        print(f"  Transferencia de {por_transferencia} productos: p50 {latencias[len(latencias) // 2] * 1000:6.2f} ms   "
+              f"p99 {latencias[int(len(latencias) * 0.99)] * 1000:6.2f} ms   ({fallidas} rechazada(s))")
+
+        despues = stock_bajo()
+        print(f"  Reporte de stock bajo: {antes * 1000:7.1f} ms antes de repartir   {despues * 1000:7.1f} ms después")
+
+        for ubicacion in ubicaciones:
+            t0 = time.perf_counter()
+            listado = database.obtener_stock_por_ubicacion(ubicacion, formato='tupla')
+            print(f"  Listado de '{ubicacion}': {(time.perf_counter() - t0) * 1000:7.1f} ms ({len(listado)} productos)")
+
+        latencias = []
+        for _ in range(consultas):
+            id_producto = aleatorio.randint(1, filas)
+            t0 = time.perf_counter()
+            database.obtener_stock_de_producto(id_producto)
+            latencias.append(time.perf_counter() - t0)
+        latencias.sort()
+        print(f"  Desglose de un producto: p50 {latencias[len(latencias) // 2] * 1e6:6.1f} µs   "
+              f"p99 {latencias[int(len(latencias) * 0.99)] * 1e6:6.1f} µs")
+
+        conn = database.conectar_db()
+        plan = " ".join(fila[3] for fila in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT producto_id, cantidad FROM stock_ubicacion WHERE ubicacion_id = 2"))
+        cubierto = "COVERING INDEX idx_stock_ubicacion_ubicacion" in plan
+        print("  Plan del listado por ubicación: " + (Fore.GREEN if cubierto else Fore.RED) + plan + Style.RESET_ALL)
+        descuadres = conn.execute('''
+            SELECT COUNT(*) FROM productos p
+            WHERE p.cantidad != (SELECT COALESCE(SUM(s.cantidad), 0) FROM stock_ubicacion s WHERE s.producto_id = p.id)
+        ''').fetchone()[0]
+        conn.close()
+        print(f"  Totales por producto = suma por ubicación: " +
+              (Fore.GREEN + "sí" if descuadres == 0 else Fore.RED + f"NO ({descuadres} productos)") + Style.RESET_ALL)
+
+
+def medir_lotes(filas=100000, lotes_por_producto=5, salidas=2000, por_salida=20):
+    """
+    Carga 'lotes_por_producto' lotes por producto con vencimientos en los próximos 180 días
+    y mide: las salidas de varios productos (una transacción, lotes consumidos por el
+    trigger FEFO), el reporte de lotes por vencer comparado con recorrer toda la tabla, y
+    verifica el plan del reporte, el orden de consumo y que los lotes no superen el total.
+    """
+    print(Fore.CYAN + f"\n--- Lotes y vencimientos ({filas} productos x {lotes_por_producto} lotes) ---" + Style.RESET_ALL)
+    aleatorio = random.Random(0)
+    hoy = datetime.date.today()
+
+    with base_temporal(filas):
+        conn = database.conectar_db()
+        conn.executemany("INSERT INTO lotes (producto_id, vencimiento, cantidad) VALUES (?, ?, ?)",
+                         ((id_producto, (hoy + datetime.timedelta(days=aleatorio.randint(-5, 180))).isoformat(), aleatorio.randint(1, 40))
+                          for id_producto in range(1, filas + 1) for _ in range(lotes_por_producto)))
+        # El stock de los lotes se suma al total (el stock sintético previo queda sin lote)
+        conn.execute("UPDATE productos SET cantidad = cantidad + (SELECT SUM(cantidad) FROM lotes WHERE producto_id = productos.id)")
+        conn.commit()
+        muestra = aleatorio.randint(1, filas)
+        lotes_antes = conn.execute("SELECT vencimiento, id, cantidad FROM lotes WHERE producto_id = ? ORDER BY vencimiento, id",
+                                   (muestra,)).fetchall()
+        conn.close()
+
+        latencias, consumidas = [], 0
+        with contextlib.redirect_stdout(open(os.devnull, 'w', encoding='utf-8')):
+            for _ in range(salidas):
+                pedido = {id_producto: aleatorio.randint(1, 30) for id_producto in aleatorio.sample(range(1, filas + 1), por_salida)}
+                pedido[muestra] = 7
+                t0 = time.perf_counter()
+                database.registrar_salidas(pedido)
+                latencias.append(time.perf_counter() - t0)
+                consumidas += 7
+        latencias.sort()
+        print(f"  Salida de {por_salida + 1} productos: p50 {latencias[len(latencias) // 2] * 1000:6.2f} ms   "
+              f"p99 {latencias[int(len(latencias) * 0.99)] * 1000:6.2f} ms")
+
+        # El producto de muestra debe haber consumido sus lotes en orden de vencimiento
+        esperado, restante = [], min(consumidas, sum(fila[2] for fila in lotes_antes))
+        for vencimiento, lote, cantidad in lotes_antes:
+            tomado = min(cantidad, restante)
+            restante -= tomado
+            if cantidad - tomado:
+                esperado.append((lote, vencimiento, cantidad - tomado))
+        fefo = database.obtener_lotes_de_producto(muestra) == esperado
+        print(f"  Consumo en orden de vencimiento (producto {muestra}): " +
+              (Fore.GREEN + "correcto" if fefo else Fore.RED + "INCORRECTO") + Style.RESET_ALL)
+
+        conn = database.conectar_db()
+        for dias in (0, 7, 30):
+            t0 = time.perf_counter()
+            reporte = database.obtener_lotes_por_vencer(dias, formato='tupla')
+            duracion_indice = time.perf_counter() - t0
+            limite = (hoy + datetime.timedelta(days=dias)).isoformat()
+            t0 = time.perf_counter()
+            completo = conn.execute('''
+                SELECT l.id, l.producto_id, p.nombre, p.categoria, l.vencimiento, l.cantidad
+                FROM lotes l NOT INDEXED JOIN productos p ON p.id = l.producto_id
+                WHERE l.vencimiento <= ? AND l.cantidad > 0 ORDER BY l.vencimiento, l.producto_id, l.id
+            ''', (limite,)).fetchall()
+            duracion_completo = time.perf_counter() - t0
+            print(f"  Por vencer en {dias:>2} días: por índice {duracion_indice * 1000:7.1f} ms   "
+                  f"tabla completa {duracion_completo * 1000:7.1f} ms   ({len(reporte)} lotes, "
+                  + (Fore.GREEN + "coinciden" if [tuple(fila) for fila in reporte] == [tuple(fila) for fila in completo] else Fore.RED + "NO coinciden")
+                  + Style.RESET_ALL + ")")
+        plan = " ".join(fila[3] for fila in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT id, producto_id, vencimiento, cantidad FROM lotes WHERE vencimiento <= '2000-01-01' AND cantidad > 0"))
+        rango = "COVERING INDEX idx_lotes_vencimiento (vencimiento<?)" in plan
+        print("  Plan del reporte: " + (Fore.GREEN if rango else Fore.RED) + plan + Style.RESET_ALL)
+        excedidos = conn.execute('''
+            SELECT COUNT(*) FROM productos p
+            WHERE p.cantidad < (SELECT COALESCE(SUM(l.cantidad), 0) FROM lotes l WHERE l.producto_id = p.id)
+        ''').fetchone()[0]
+        conn.close()
+        print(f"  Stock en lotes <= total de cada producto: " +
+              (Fore.GREEN + "sí" if excedidos == 0 else Fore.RED + f"NO ({excedidos} productos)") + Style.RESET_ALL)
+
+
+def medir_backends(filas=100000, operaciones=1000):
+    """
+    Compara los motores de almacenamiento ('archivo', 'memoria' y 'python') con un catálogo
+    de 'filas' productos: altas y modificaciones (una transacción cada una), lectura por SKU,
+    reporte de stock bajo, listado completo y búsqueda por texto.
+    """
+    print(Fore.CYAN + f"\n--- Motores de almacenamiento ({filas} productos) ---" + Style.RESET_ALL)
+    print(f"  {'Motor':<9}{'Alta (µs)':>11}{'Modif. (µs)':>13}{'SKU (µs)':>10}{'Stock bajo (ms)':>17}{'Listado (ms)':>14}{'Búsqueda (ms)':>15}")
+    catalogo = [(f"Producto {i}", f"Descripción del producto {i}", i % 500, i % 10000,
+                 CATEGORIAS_PRUEBA[i % len(CATEGORIAS_PRUEBA)], f"SKU{i:08d}") for i in range(filas)]
+    archivo_original, backend_original = database.ARCHIVO_DB, database.BACKEND
+    for backend in database.BACKENDS:
+        aleatorio = random.Random(0)
+        with tempfile.TemporaryDirectory() as directorio:
+            database.ARCHIVO_DB = os.path.join(directorio, 'inventario.db')
+            try:
+                with contextlib.redirect_stdout(open(os.devnull, 'w', encoding='utf-8')):
+                    database.configurar_backend(backend)
+                    database.crear_tablas()
+                    if backend == 'python':
+                        database._almacen_activo().cargar_productos(catalogo)
+                    else:
+                        conn = database.conectar_db()
+                        conn.executemany("INSERT INTO productos (nombre, descripcion, cantidad, precio, categoria, sku) VALUES (?, ?, ?, ?, ?, ?)", catalogo)
+                        conn.commit()
+                        conn.close()
+
+                    def por_operacion(funcion):
+                        t0 = time.perf_counter()
+                        for _ in range(operaciones):
+                            funcion()
+                        return (time.perf_counter() - t0) / operaciones
+
+                    alta = por_operacion(lambda: database.agregar_producto("Nuevo", "Alta medida", aleatorio.randint(0, 500), 100, "Otros"))
+                    modificacion = por_operacion(lambda: database.actualizar_producto(
+                        aleatorio.randint(1, filas), "Modificado", "Modificación medida", aleatorio.randint(0, 500), 100, "Otros"))
+                    sku = por_operacion(lambda: database.obtener_producto_por_sku(f"SKU{aleatorio.randrange(filas):08d}"))
+                    t0 = time.perf_counter()
+                    database.obtener_productos_por_cantidad_limite(5)
+                    stock_bajo = time.perf_counter() - t0
+                    t0 = time.perf_counter()
+                    database.obtener_todos_los_productos()
+                    listado = time.perf_counter() - t0
+                    t0 = time.perf_counter()
+                    database.obtener_producto_por_id_nombre_o_categoria("to 4242")
+                    busqueda = time.perf_counter() - t0
+                print(f"  {backend:<9}{alta * 1e6:>11.1f}{modificacion * 1e6:>13.1f}{sku * 1e6:>10.1f}"
+                      f"{stock_bajo * 1000:>17.1f}{listado * 1000:>14.1f}{busqueda * 1000:>15.1f}")
+            finally:
+                database.configurar_backend(backend_original)
+                database.ARCHIVO_DB = archivo_original
+
+
+def medir_cache(filas=100000, repeticiones=20):
+    """
+    Mide lecturas repetidas sin cambios en la base, con la caché de lecturas desactivada
+    y activada (primera lectura y siguientes), y verifica que una escritura de este proceso
+    y una de otra conexión (como la de otro proceso) invaliden los resultados guardados.
+    """
+    print(Fore.CYAN + f"\n--- Caché de lecturas ({filas} productos, {repeticiones} repeticiones) ---" + Style.RESET_ALL)
+    lecturas = {
+        'Listado completo': lambda: database.obtener_todos_los_productos(formato='producto'),
+        'Stock bajo (<= 10)': lambda: database.obtener_productos_por_cantidad_limite(10, formato='producto'),
+        'Búsqueda': lambda: database.obtener_producto_por_id_nombre_o_categoria("Producto 4242"),
+        'Categorías': database.obtener_categorias,
+    }
+
+    def mediana(lectura):
+        latencias = []
+        for _ in range(repeticiones):
+            t0 = time.perf_counter()
+            lectura()
+            latencias.append(time.perf_counter() - t0)
+        return sorted(latencias)[len(latencias) // 2]
+
+    with base_temporal(filas) as ruta_db:
+        print(f"  {'Lectura':<20}{'Sin caché':>14}{'1.ª con caché':>16}{'Repetida':>14}")
+        for nombre, lectura in lecturas.items():
+            database.CACHE_LECTURAS = False
+            sin_cache = mediana(lectura)
+            database.CACHE_LECTURAS = True
+            database.invalidar_cache()
+            t0 = time.perf_counter()
+            lectura()
+            primera = time.perf_counter() - t0
+            repetida = mediana(lectura)
+            print(f"  {nombre:<20}{sin_cache * 1000:>11.3f} ms{primera * 1000:>13.3f} ms{repetida * 1000:>11.3f} ms")
+
+        with contextlib.redirect_stdout(open(os.devnull, 'w', encoding='utf-8')):
+            bajo_antes = {fila[0] for fila in database.obtener_productos_por_cantidad_limite(10, formato='tupla')}
+            database.actualizar_producto(499, "Producto 499", "Modificado", 0, 100, "Otros")
+            propio = 499 in {fila[0] for fila in database.obtener_productos_por_cantidad_limite(10, formato='tupla')}
+            # Escritura con una conexión aparte, que no avisa a la caché (como otro proceso)
+            with contextlib.closing(sqlite3.connect(ruta_db)) as otra:
+                otra.execute("UPDATE productos SET cantidad = 0 WHERE id = 498")
+                otra.commit()
+            externo = 498 in {fila[0] for fila in database.obtener_productos_por_cantidad_limite(10, formato='tupla')}
+        for descripcion, visto in (("escritura de este proceso", propio and 499 not in bajo_antes),
+                                   ("escritura de otra conexión (data_version)", externo and 498 not in bajo_antes)):
+            print(f"  Invalidación por {descripcion}: " +
+                  (Fore.GREEN + "correcta" if visto else Fore.RED + "NO se vio el cambio") + Style.RESET_ALL)
+        estadisticas = database.obtener_estadisticas_cache()
+        print(f"  Estadísticas: {estadisticas['aciertos']} aciertos, {estadisticas['fallos']} fallos, "
+              f"{estadisticas['invalidaciones']} invalidaciones, {estadisticas['entradas']} entradas")
+
+
+def medir_transacciones(filas=100000, operaciones=2000, grupo=100):
+    """
+    Compara el rendimiento de altas de producto con una transacción por alta, agrupadas
+    en transacciones de 'grupo' altas y todas en una sola transacción; y el de un alta
+    de tres pasos (categoría, producto y SKU) con un COMMIT por paso o uno por alta.
+    Verifica además que una transacción agrupada con una operación fallida no deje nada.
+    """
+    print(Fore.CYAN + f"\n--- Transacciones agrupadas ({operaciones} operaciones sobre {filas} productos) ---" + Style.RESET_ALL)
+    with base_temporal(filas):
+        resultados = {}
+        with contextlib.redirect_stdout(open(os.devnull, 'w', encoding='utf-8')):
+            def altas(cantidad, prefijo):
+                for i in range(cantidad):
+                    database.agregar_producto(f"{prefijo} {i}", "Alta medida", i % 50, 100, "Otros")
+
+            t0 = time.perf_counter()
+            altas(operaciones, "Individual")
+            resultados['Una transacción por alta'] = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            for inicio in range(0, operaciones, grupo):
+                with database.transaccion():
+                    altas(min(grupo, operaciones - inicio), f"Grupo {inicio}")
+            resultados[f'Grupos de {grupo} altas'] = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            with database.transaccion():
+                altas(operaciones, "Única")
+            resultados['Una sola transacción'] = time.perf_counter() - t0
+
+            def alta_de_tres_pasos(i, prefijo):
+                database.agregar_categoria(f"Categoría {prefijo} {i % 20}")
+                id_producto = database.agregar_producto(f"{prefijo} {i}", "Alta medida", 1, 100, f"Categoría {prefijo} {i % 20}")
+                database.asignar_sku(id_producto, f"{prefijo}-{i}")
+
+            pasos = operaciones // 3
+            t0 = time.perf_counter()
+            for i in range(pasos):
+                alta_de_tres_pasos(i, "Separada")
+            resultados['Alta de 3 pasos, COMMIT por paso'] = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            for i in range(pasos):
+                with database.transaccion():
+                    alta_de_tres_pasos(i, "Atómica")
+            resultados['Alta de 3 pasos, COMMIT por alta'] = time.perf_counter() - t0
+
+            with database.transaccion() as tx:
+                database.agregar_producto("No debe quedar", "Alta revertida", 1, 100, "Otros")
+                database.asignar_sku(filas + 1, "Individual-repetido")
+                database.asignar_sku(filas + 2, "Individual-repetido") # SKU duplicado: falla
+            quedo = database.obtener_producto_por_sku("Individual-repetido") or \
+                database.obtener_producto_por_id_nombre_o_categoria("No debe quedar")
+
+        for descripcion, segundos in resultados.items():
+            cantidad = pasos if descripcion.startswith('Alta de 3') else operaciones
+            print(f"  {descripcion:<36} {cantidad / segundos:>9,.0f} altas/s")
+        print(f"  Transacción con una operación fallida: " +
+              (Fore.GREEN + "revertida por completo" if not tx.confirmada and not quedo else Fore.RED + "quedaron cambios") + Style.RESET_ALL)
+
+
+def medir_contrasenas(filas=100000, costos=(2 ** 12, 2 ** 13, 2 ** 14, 2 ** 15, 2 ** 16), logins=10,
+                      concurrencias=(1, 4, 16), presupuesto_ms=250):
+    """
+    Ayuda a elegir el costo de scrypt (INVENTARIO_SCRYPT_N): para cada costo mide la
+    demora de un inicio de sesión (mediana y peor de 'logins') y cuántos inicios de
+    sesión por segundo se atienden con varios hilos a la vez, y la memoria que usan.
+    Sugiere el mayor costo cuyo peor inicio de sesión entra en 'presupuesto_ms'.
+    """
+    print(Fore.CYAN + f"\n--- Costo de las contraseñas (scrypt r={database.SCRYPT_R}, p={database.SCRYPT_P}; presupuesto {presupuesto_ms} ms por login) ---" + Style.RESET_ALL)
+    costo_original = database.SCRYPT_N
+    resultados = []
+    with base_temporal(filas), contextlib.redirect_stdout(open(os.devnull, 'w', encoding='utf-8')):
+        try:
+            for costo in costos:
+                database.SCRYPT_N = costo
+                usuario = f"usuario_{costo}"
+                database.agregar_usuario(usuario, "clave de prueba")
+                demoras = []
+                for _ in range(logins):
+                    t0 = time.perf_counter()
+                    assert database.obtener_usuario(usuario, "clave de prueba") == usuario
+                    demoras.append((time.perf_counter() - t0) * 1000)
+                demoras.sort()
+                por_segundo = []
+                for hilos in concurrencias:
+                    with ThreadPoolExecutor(hilos) as pool:
+                        t0 = time.perf_counter()
+                        list(pool.map(lambda _: database.obtener_usuario(usuario, "clave de prueba"), range(hilos * 2)))
+                        por_segundo.append(hilos * 2 / (time.perf_counter() - t0))
+                resultados.append((costo, demoras[len(demoras) // 2], demoras[-1], por_segundo))
+        finally:
+            database.SCRYPT_N = costo_original
+    encabezado = "".join(f"{f'{hilos} hilo(s)':>12}" for hilos in concurrencias)
+    print(f"  {'N':>7} {'memoria':>9} {'mediana':>9} {'peor':>9}{encabezado}   (logins/s)")
+    for costo, mediana, peor, por_segundo in resultados:
+        memoria = 128 * database.SCRYPT_R * costo / 1024 / 1024
+        color = Fore.GREEN if peor <= presupuesto_ms else Fore.RED
+        print(color + f"  {costo:>7} {memoria:>6.0f} MiB {mediana:>6.1f} ms {peor:>6.1f} ms" +
+              "".join(f"{valor:>12.1f}" for valor in por_segundo) + Style.RESET_ALL)
+    aptos = [costo for costo, _, peor, _ in resultados if peor <= presupuesto_ms]
+    if aptos:
+        print(f"  Sugerencia: INVENTARIO_SCRYPT_N={max(aptos)} (memoria con {max(concurrencias)} logins simultáneos: "
+              f"{128 * database.SCRYPT_R * max(aptos) * max(concurrencias) / 1024 / 1024:.0f} MiB)")
+    else:
+        print(Fore.YELLOW + f"  ⚠ Ningún costo entra en {presupuesto_ms} ms; pruebe costos menores." + Style.RESET_ALL)
+    print(f"  Costo actual: {costo_original}   Núcleos disponibles: {os.cpu_count()}")
+
+
+MEDICIONES = {
+    'formatos': medir_formatos_de_fila,
+    'analitica': medir_analitica,
+    'lectores': medir_lectores_concurrentes,
+    'sugerencias': medir_sugerencias,
+    'contencion': medir_contencion,
+    'precios': medir_precios,
+    'escaneo': medir_escaneo,
+    'reimportacion': medir_reimportacion,
+    'historial': medir_historial,
+    'instantaneas': medir_instantaneas,
+    'ubicaciones': medir_ubicaciones,
+    'lotes': medir_lotes,
+    'backends': medir_backends,
+    'cache': medir_cache,
+    'transacciones': medir_transacciones,
+    'contrasenas': medir_contrasenas,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mediciones de rendimiento del sistema de inventario.")
+    parser.add_argument('medicion', choices=sorted(MEDICIONES), help="Medición a ejecutar")
+    parser.add_argument('--filas', type=int, default=100000, help="Cantidad de productos sintéticos")
+    args = parser.parse_args()
+    MEDICIONES[args.medicion](filas=args.filas)
@@ -0,0 +1,323 @@
+"""
+Este módulo reproduce el registro de actividad (log.txt) como prueba de rendimiento:
+lee las acciones que hicieron los usuarios reales y cuándo, las traduce a llamadas
+equivalentes de database.py con parámetros verosímiles (tomados de los productos
+existentes) y las ejecuta sobre una copia de la base, a la velocidad original, N
+veces más rápido o lo más rápido posible. Al final informa la latencia por tipo de acción.
+Acepta el formato de texto actual del log y líneas JSON con las claves
+'usuario', 'fecha' y 'accion' (para un futuro registro estructurado).
+Uso: python reproduccion.py log.txt --velocidad 10
+"""
+import argparse
+import collections
+import contextlib
+import datetime
+import json
+import os
+import random
+import re
+import sqlite3
+import tempfile
+import time
+
+from colorama import Fore, Style, init
+
+import database
+from simulador import DetectorErrores
+
+# Inicializar colorama para mensajes de consola
+init(autoreset=True)
+
+FORMATO_FECHA = "%Y-%m-%d %H:%M:%S"
+PATRON_LINEA = re.compile(r"^Usuario: (?P<usuario>.*?), Fecha: (?P<fecha>\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}), Acción: (?P<accion>.*)$")
+# Acciones del log que no acceden a la base (se ignoran al reproducir)
+ACCIONES_SIN_BASE = ('Salida del sistema', 'Acceso a la ayuda')
+
+
+def leer_registro(ruta):
+    """
+    Lee un registro de actividad y retorna la lista de eventos (fecha, usuario, acción)
+    en orden cronológico. Las líneas que no se reconocen se cuentan y se informan.
+    """
+    eventos, ignoradas = [], 0
+    with open(ruta, encoding='utf-8') as archivo:
+        for linea in archivo:
+            linea = linea.strip()
+            if not linea:
+                continue
+            try:
+                if linea.startswith('{'):
+                    datos = json.loads(linea)
+                    usuario, fecha, accion = datos['usuario'], datos['fecha'], datos['accion']
+                else:
+                    coincidencia = PATRON_LINEA.match(linea)
+                    if not coincidencia:
+                        raise ValueError(linea)
+                    usuario, fecha, accion = coincidencia.group('usuario', 'fecha', 'accion')
+                eventos.append((datetime.datetime.strptime(fecha, FORMATO_FECHA), usuario, accion))
+            except (ValueError, KeyError, TypeError):
+                ignoradas += 1
+    if ignoradas:
+        print(Fore.YELLOW + f"⚠ {ignoradas} línea(s) no reconocida(s) en '{ruta}'." + Style.RESET_ALL)
+    eventos.sort(key=lambda evento: evento[0])
+    return eventos
+
+
+def tipo_de_accion(accion):
+    """
+    Retorna el tipo de acción a reproducir, o None si la línea no corresponde a una
+    operación sobre la base (o es el detalle por producto de una actualización masiva).
+    """
+    if accion in ACCIONES_SIN_BASE:
+        return None
+    if accion.startswith("Actualización masiva"):
+        # La línea de resumen lleva los filtros; las de detalle por producto no se reproducen
+        return "Actualización masiva" if "(filtros:" in accion else None
+    if accion.startswith("Recepción por escaneo"):
+        return "Recepción por escaneo"
+    if accion.startswith("Transferencia de stock"):
+        return "Transferencia de stock"
+    if accion.startswith("Stock de la ubicación"):
+        return "Stock de ubicación consultado"
+    if accion.startswith("Stock por ubicación del producto"):
+        return "Stock de producto por ubicación consultado"
+    if accion.startswith("Stock del producto"):
+        return "Ajuste de stock en ubicación"
+    if accion.startswith("Lote registrado"):
+        return "Lote registrado"
+    if accion.startswith("Lotes del producto"):
+        return "Lotes de producto consultados"
+    if accion.startswith("Reporte de lotes por vencer"):
+        return "Reporte de lotes por vencer"
+    if accion.startswith("Salida de stock"):
+        return "Salida de stock"
+    return accion
+
+
+class Reproductor:
+    """Traduce cada tipo de acción del log a una llamada de database.py con parámetros verosímiles."""
+
+    def __init__(self, semilla=0):
+        self.aleatorio = random.Random(semilla)
+        productos = database.obtener_todos_los_productos(formato='tupla')
+        self.ids = [producto[0] for producto in productos] or [1]
+        self.nombres = [producto[1] for producto in productos] or ["Producto"]
+        self.categorias = database.obtener_categorias() or ["Otros"]
+        self.skus = self._skus_existentes() or ["SIN-SKU"]
+        self.ubicaciones = database.obtener_ubicaciones() or [database.UBICACIONES_DEFECTO[0]]
+        self.agregados = []
+        self.llamadas = {
+            'Producto agregado': self._agregar,
+            'Productos vistos': lambda: database.obtener_todos_los_productos(formato='producto'),
+            'Producto buscado': self._buscar,
+            'Producto eliminado': self._eliminar,
+            'Producto modificado': self._modificar,
+            'Reporte de stock bajo generado': lambda: database.obtener_productos_por_cantidad_limite(self.aleatorio.randint(0, 20), formato='producto'),
+            'Reportes avanzados generados': self._reportes_avanzados,
+            'Actualización masiva': lambda: database.actualizar_productos_en_lote(
+                'porcentaje', self.aleatorio.choice((-5, 5, 8, 10)), categoria=self.aleatorio.choice(self.categorias)),
+            'Recepción por escaneo': self._recibir,
+            'Historial de precios consultado': lambda: database.obtener_precio_vigente(
+                self.aleatorio.choice(self.ids), datetime.date.today() - datetime.timedelta(days=self.aleatorio.randint(0, 365))),
+            'Stock de ubicación consultado': lambda: database.obtener_stock_por_ubicacion(self.aleatorio.choice(self.ubicaciones)),
+            'Stock de producto por ubicación consultado': lambda: database.obtener_stock_de_producto(self.aleatorio.choice(self.ids)),
+            'Transferencia de stock': self._transferir,
+            'Lote registrado': lambda: database.registrar_lote(
+                self.aleatorio.choice(self.ids), self.aleatorio.randint(1, 50),
+                datetime.date.today() + datetime.timedelta(days=self.aleatorio.randint(1, 60))),
+            'Lotes de producto consultados': lambda: database.obtener_lotes_de_producto(self.aleatorio.choice(self.ids)),
+            'Reporte de lotes por vencer': lambda: database.obtener_lotes_por_vencer(self.aleatorio.choice((3, 7, 30))),
+            'Salida de stock': lambda: database.registrar_salidas(
+                {id_producto: self.aleatorio.randint(1, 3) for id_producto in self.aleatorio.sample(self.ids, min(len(self.ids), 3))}),
+            'Ajuste de stock en ubicación': lambda: database.ajustar_stock_en_ubicacion(
+                self.aleatorio.choice(self.ids), self.aleatorio.choice(self.ubicaciones), self.aleatorio.randint(1, 20)),
+        }
+
+    @staticmethod
+    def _skus_existentes(limite=10000):
+        conn = database.tomar_conexion_lectura()
+        if conn is None:
+            return []
+        try:
+            return [fila[0] for fila in conn.execute("SELECT sku FROM productos WHERE sku IS NOT NULL LIMIT ?", (limite,))]
+        finally:
+            database.devolver_conexion_lectura(conn)
+
+    def _recibir(self):
+        # Una recepción de pallet: entre 20 y 200 lecturas de SKU existentes, en un solo lote
+        lecturas = self.aleatorio.choices(self.skus, k=self.aleatorio.randint(20, 200))
+        database.incrementar_stock_por_sku(collections.Counter(lecturas))
+
+    def _transferir(self):
+        # Reposición del salón: de 1 a 5 productos, pocas unidades, desde otra ubicación
+        origen = self.aleatorio.choice(self.ubicaciones[1:] or self.ubicaciones)
+        ids = self.aleatorio.sample(self.ids, min(len(self.ids), self.aleatorio.randint(1, 5)))
+        database.transferir_stock(origen, self.ubicaciones[0], {id_producto: self.aleatorio.randint(1, 5) for id_producto in ids})
+
+    def _agregar(self):
+        id_nuevo = database.agregar_producto(f"Reproducido {len(self.agregados)}", "Alta reproducida",
+                                             self.aleatorio.randint(0, 200), self.aleatorio.randint(50, 5000),
+                                             self.aleatorio.choice(self.categorias))
+        if id_nuevo:
+            self.agregados.append(id_nuevo)
+
+    def _buscar(self):
+        # Como un usuario real: a veces por ID, a veces por parte del nombre o por categoría
+        eleccion = self.aleatorio.random()
+        if eleccion < 0.3:
+            termino = str(self.aleatorio.choice(self.ids))
+        elif eleccion < 0.8:
+            nombre = self.aleatorio.choice(self.nombres)
+            termino = nombre[:max(3, len(nombre) // 2)]
+        else:
+            termino = self.aleatorio.choice(self.categorias)
+        database.obtener_producto_por_id_nombre_o_categoria(termino, formato='producto')
+
+    def _eliminar(self):
+        # Se eliminan primero los productos agregados durante la reproducción para no vaciar el catálogo
+        if self.agregados:
+            database.eliminar_producto(self.agregados.pop())
+        else:
+            database.eliminar_producto(self.aleatorio.choice(self.ids))
+
+    def _modificar(self):
+        id_producto = self.aleatorio.choice(self.ids)
+        database.actualizar_producto(id_producto, self.aleatorio.choice(self.nombres), "Modificado en reproducción",
+                                     self.aleatorio.randint(0, 200), self.aleatorio.randint(50, 5000),
+                                     self.aleatorio.choice(self.categorias))
+
+    def _reportes_avanzados(self):
+        import analitica
+        analitica.calcular_reportes()
+
+    def ejecutar(self, tipo):
+        """Ejecuta la llamada de un tipo de acción. Retorna False si el tipo no se conoce."""
+        llamada = self.llamadas.get(tipo)
+        if llamada is None:
+            return False
+        llamada()
+        return True
+
+
+def _copiar_base(origen, destino):
+    """Copia la base con la API de backup (consistente aunque la aplicación esté en uso)."""
+    with contextlib.closing(sqlite3.connect(origen)) as conn_origen, contextlib.closing(sqlite3.connect(destino)) as conn_destino:
+        conn_origen.backup(conn_destino)
+
+
+def _percentil(valores_ordenados, p):
+    return valores_ordenados[min(len(valores_ordenados) - 1, int(len(valores_ordenados) * p / 100))]
+
+
+def reproducir(ruta_registro, ruta_db=None, velocidad=1.0, semilla=0, mostrar=True):
+    """
+    Reproduce un registro de actividad sobre una copia temporal de la base ('ruta_db',
+    por defecto ARCHIVO_DB). velocidad=1 respeta los tiempos originales, velocidad=N
+    los acelera N veces y velocidad=0 ejecuta todo lo más rápido posible.
+    Retorna un diccionario {tipo de acción: métricas}, o None si no se pudo reproducir.
+    """
+    ruta_db = ruta_db or database.ARCHIVO_DB
+    if not os.path.exists(ruta_db):
+        print(Fore.RED + f"❌ No existe la base de datos '{ruta_db}'." + Style.RESET_ALL)
+        return None
+    try:
+        eventos = leer_registro(ruta_registro)
+    except OSError as e:
+        print(Fore.RED + f"❌ No se pudo leer el registro '{ruta_registro}': {e}" + Style.RESET_ALL)
+        return None
+    eventos = [(fecha, usuario, tipo_de_accion(accion)) for fecha, usuario, accion in eventos]
+    eventos = [evento for evento in eventos if evento[2]]
+    if not eventos:
+        print(Fore.YELLOW + "⚠ El registro no tiene acciones que reproducir." + Style.RESET_ALL)
+        return None
+
+    archivo_original = database.ARCHIVO_DB
+    metricas = {}
+    with tempfile.TemporaryDirectory() as directorio:
+        database.ARCHIVO_DB = os.path.join(directorio, 'inventario.db')
+        detector = DetectorErrores()
+        try:
+            _copiar_base(ruta_db, database.ARCHIVO_DB)
+            with contextlib.redirect_stdout(detector):
+                reproductor = Reproductor(semilla)
+                primera = eventos[0][0]
+                inicio = time.perf_counter()
+                retraso_maximo = 0.0
+                for fecha, _, tipo in eventos:
+                    if velocidad > 0:
+                        programado = inicio + (fecha - primera).total_seconds() / velocidad
+                        pausa = programado - time.perf_counter()
+                        if pausa > 0:
+                            time.sleep(pausa)
+                        else:
+                            retraso_maximo = max(retraso_maximo, -pausa)
+                    detector.hubo_error = False
+                    t0 = time.perf_counter()
+                    conocido = reproductor.ejecutar(tipo)
+                    latencia = time.perf_counter() - t0
+                    datos = metricas.setdefault(tipo, {'latencias': [], 'errores': 0, 'desconocida': not conocido})
+                    datos['latencias'].append(latencia)
+                    datos['errores'] += detector.hubo_error
+                duracion = time.perf_counter() - inicio
+        except (sqlite3.Error, OSError) as e:
+            print(Fore.RED + f"❌ Error durante la reproducción: {e}" + Style.RESET_ALL)
+            return None
+        finally:
+            database.cerrar_pool_lectura()
+            database.ARCHIVO_DB = archivo_original
+
+    for datos in metricas.values():
+        latencias = sorted(datos.pop('latencias'))
+        datos.update(cantidad=len(latencias), p50=_percentil(latencias, 50), p99=_percentil(latencias, 99),
+                     maxima=latencias[-1], total=sum(latencias))
+    if mostrar:
+        original = (eventos[-1][0] - eventos[0][0]).total_seconds()
+        print(Fore.CYAN + f"\n--- Reproducción de '{ruta_registro}' ({len(eventos)} acciones) ---" + Style.RESET_ALL)
+        print(f"  Duración original: {original:.0f} s   reproducción: {duracion:.2f} s"
+              + (f"   retraso máximo: {retraso_maximo * 1000:.1f} ms" if velocidad > 0 else ""))
+        mostrar_metricas(metricas)
+    return metricas
+
+
+def mostrar_metricas(metricas):
+    """Muestra la latencia por tipo de acción de una reproducción."""
+    print(f"  {'Acción':<32}{'Cantidad':>9}{'Errores':>9}{'p50 (ms)':>11}{'p99 (ms)':>11}{'Máx. (ms)':>11}")
+    for tipo, datos in sorted(metricas.items(), key=lambda item: -item[1]['total']):
+        if datos['desconocida']:
+            print(Fore.YELLOW + f"  {tipo[:31]:<32}{datos['cantidad']:>9}   (acción sin equivalente, no reproducida)" + Style.RESET_ALL)
+            continue
+        color = Fore.RED if datos['errores'] else ""
+        print(f"  {tipo[:31]:<32}{datos['cantidad']:>9}" + color + f"{datos['errores']:>9}" + Style.RESET_ALL +
+              f"{datos['p50'] * 1000:>11.2f}{datos['p99'] * 1000:>11.2f}{datos['maxima'] * 1000:>11.2f}")
+
+
+def generar_registro_prueba(ruta, acciones=1000, segundos_entre_acciones=3.0, semilla=0):
+    """Escribe un registro de actividad sintético con la mezcla de acciones habitual, para probar la reproducción."""
+    aleatorio = random.Random(semilla)
+    mezcla = {'Producto buscado': 45, 'Productos vistos': 15, 'Producto modificado': 15, 'Producto agregado': 10,
+              'Reporte de stock bajo generado': 8, 'Producto eliminado': 4, 'Acceso a la ayuda': 2,
+              'Reportes avanzados generados': 1}
+    fecha = datetime.datetime(2025, 1, 6, 9, 0, 0)
+    with open(ruta, 'w', encoding='utf-8') as archivo:
+        for _ in range(acciones):
+            fecha += datetime.timedelta(seconds=aleatorio.expovariate(1 / segundos_entre_acciones))
+            accion = aleatorio.choices(list(mezcla), list(mezcla.values()))[0]
+            usuario = aleatorio.choice(('ana', 'bruno', 'carla'))
+            archivo.write(f"Usuario: {usuario}, Fecha: {fecha.strftime(FORMATO_FECHA)}, Acción: {accion}\n")
+    print(Fore.GREEN + f"✅ Registro de prueba '{ruta}' generado con {acciones} acciones." + Style.RESET_ALL)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reproduce el registro de actividad como prueba de rendimiento.")
+    parser.add_argument('registro', nargs='?', default='log.txt', help="Registro de actividad (por defecto log.txt)")
+    parser.add_argument('--base', default=database.ARCHIVO_DB, help="Base a copiar para la reproducción")
+    parser.add_argument('--velocidad', type=float, default=1.0,
+                        help="1 = tiempos originales, N = N veces más rápido, 0 = lo más rápido posible")
+    parser.add_argument('--semilla', type=int, default=0, help="Semilla de los parámetros sintetizados")
+    parser.add_argument('--generar', type=int, metavar='ACCIONES', help="Genera un registro de prueba con esa cantidad de acciones")
+    args = parser.parse_args()
+
+    if args.generar:
+        generar_registro_prueba(args.registro, args.generar)
+    else:
+        reproducir(args.registro, args.base, args.velocidad, args.semilla)
@@ -0,0 +1,257 @@
+"""
+Este módulo realiza respaldos en caliente de la base de datos usando la API
+de backup de sqlite3 (Connection.backup). La copia se hace por pasos de pocas
+páginas con pausas entre ellos, para no bloquear a los usuarios que están
+trabajando. Cada respaldo se verifica con PRAGMA integrity_check, se comprime
+con gzip y se conservan solo los más recientes (rotación).
+También incluye un trabajo programado en segundo plano y una medición del
+impacto del respaldo sobre la latencia de las operaciones en primer plano.
+"""
+import argparse
+import datetime
+import gzip
+import math
+import os
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+from colorama import Fore, Style, init
+
+import database
+
+# Inicializar colorama para mensajes de consola
+init(autoreset=True)
+
+# Carpeta donde se guardan los respaldos comprimidos
+CARPETA_RESPALDOS = 'respaldos'
+# Cantidad de respaldos que se conservan al rotar
+RESPALDOS_A_CONSERVAR = 7
+# Páginas copiadas en cada paso y pausa entre pasos (en segundos)
+PAGINAS_POR_PASO = 64
+PAUSA_ENTRE_PASOS = 0.005
+# Intervalo del respaldo programado (en segundos)
+INTERVALO_RESPALDO = 3600
+
+# Estado del trabajo programado
+_hilo_programado = None
+_detener_programado = threading.Event()
+
+
+def _verificar_integridad(ruta_db):
+    """Ejecuta PRAGMA integrity_check sobre una base y retorna (ok, detalle)."""
+    conn = sqlite3.connect(ruta_db)
+    try:
+        filas = conn.execute("PRAGMA integrity_check").fetchall()
+        detalle = ", ".join(fila[0] for fila in filas)
+        return detalle == 'ok', detalle
+    finally:
+        conn.close()
+
+
+def crear_respaldo(carpeta=None, paginas_por_paso=PAGINAS_POR_PASO, pausa=PAUSA_ENTRE_PASOS,
+                   conservar=RESPALDOS_A_CONSERVAR, mostrar=True):
+    """
+    Crea un respaldo consistente de la base de datos mientras la aplicación sigue en uso.
+    Copia 'paginas_por_paso' páginas por vez y hace una pausa de 'pausa' segundos
+    entre pasos. Verifica la copia, la comprime y rota los respaldos antiguos.
+    Con mostrar=False solo se informan los errores.
+    Retorna la ruta del respaldo comprimido, o None si falló.
+    """
+    carpeta = carpeta or CARPETA_RESPALDOS
+    os.makedirs(carpeta, exist_ok=True)
+    marca = datetime.datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    nombre_base = os.path.splitext(os.path.basename(database.ARCHIVO_DB))[0]
+    ruta_final = os.path.join(carpeta, f"{nombre_base}-{marca}.db.gz")
+    descriptor, ruta_temporal = tempfile.mkstemp(suffix='.db', dir=carpeta)
+    os.close(descriptor)
+
+    def progreso(estado, restantes, total):
+        if mostrar and total:
+            print(f"\r💾 Respaldo en curso: {100 * (total - restantes) // total:>3}%", end='', flush=True)
+        if pausa:
+            time.sleep(pausa)  # Cede la base a las operaciones en primer plano
+
+    origen = database.conectar_db()
+    if origen is None:
+        os.remove(ruta_temporal)
+        return None
+    destino = sqlite3.connect(ruta_temporal)
+    t_inicio = time.perf_counter()
+    try:
+        origen.backup(destino, pages=paginas_por_paso, progress=progreso)
+    except sqlite3.Error as e:
+        print(Fore.RED + f"\n❌ Error durante el respaldo: {e}" + Style.RESET_ALL)
+        destino.close()
+        os.remove(ruta_temporal)
+        return None
+    finally:
+        origen.close()
+    destino.close()
+    t_copia = time.perf_counter() - t_inicio
+    if mostrar:
+        print()
+
+    ok, detalle = _verificar_integridad(ruta_temporal)
+    if not ok:
+        print(Fore.RED + f"❌ El respaldo no pasó la verificación de integridad: {detalle}" + Style.RESET_ALL)
+        os.remove(ruta_temporal)
+        return None
+
+    with open(ruta_temporal, 'rb') as entrada, gzip.open(ruta_final, 'wb') as salida:
+        shutil.copyfileobj(entrada, salida)
+    tamano_original = os.path.getsize(ruta_temporal)
+    os.remove(ruta_temporal)
+
+    eliminados = rotar_respaldos(carpeta, conservar)
+    if not mostrar:
+        return ruta_final
+    print(Fore.GREEN + f"✅ Respaldo '{ruta_final}' creado y verificado en {t_copia:.2f} s "
+          f"({tamano_original // 1024} KB → {os.path.getsize(ruta_final) // 1024} KB)." + Style.RESET_ALL)
+    if eliminados:
+        print(Fore.YELLOW + f"🗑️ {eliminados} respaldo(s) antiguo(s) eliminado(s) por rotación." + Style.RESET_ALL)
+    return ruta_final
+
+
+def listar_respaldos(carpeta=None):
+    """Retorna las rutas de los respaldos existentes, del más antiguo al más reciente."""
+    carpeta = carpeta or CARPETA_RESPALDOS
+    if not os.path.isdir(carpeta):
+        return []
+    return sorted(os.path.join(carpeta, nombre) for nombre in os.listdir(carpeta) if nombre.endswith('.db.gz'))
+
+
+def rotar_respaldos(carpeta=None, conservar=RESPALDOS_A_CONSERVAR):
+    """Elimina los respaldos más antiguos dejando solo 'conservar'. Retorna cuántos eliminó."""
+    respaldos = listar_respaldos(carpeta)
+    sobrantes = respaldos[:-conservar] if conservar > 0 else respaldos
+    for ruta in sobrantes:
+        os.remove(ruta)
+    return len(sobrantes)
+
+
+def verificar_respaldo(ruta_respaldo):
+    """
+    Descomprime un respaldo en un archivo temporal y ejecuta PRAGMA integrity_check.
+    Retorna True si el respaldo está íntegro.
+    """
+    descriptor, ruta_temporal = tempfile.mkstemp(suffix='.db')
+    os.close(descriptor)
+    try:
+        with gzip.open(ruta_respaldo, 'rb') as entrada, open(ruta_temporal, 'wb') as salida:
+            shutil.copyfileobj(entrada, salida)
+        ok, detalle = _verificar_integridad(ruta_temporal)
+    except (OSError, sqlite3.Error) as e:
+        ok, detalle = False, str(e)
+    finally:
+        os.remove(ruta_temporal)
+    if ok:
+        print(Fore.GREEN + f"✅ Respaldo '{ruta_respaldo}' íntegro." + Style.RESET_ALL)
+    else:
+        print(Fore.RED + f"❌ Respaldo '{ruta_respaldo}' dañado: {detalle}" + Style.RESET_ALL)
+    return ok
+
+
+def _ciclo_programado(intervalo):
+    """Cuerpo del hilo del respaldo programado."""
+    while not _detener_programado.wait(intervalo):
+        try:
+            crear_respaldo(mostrar=False)
+        except Exception as e:  # El hilo no debe morir por un respaldo fallido
+            print(Fore.RED + f"❌ Error en el respaldo programado: {e}" + Style.RESET_ALL)
+
+
+def iniciar_respaldo_programado(intervalo=INTERVALO_RESPALDO):
+    """
+    Inicia un hilo en segundo plano que crea un respaldo cada 'intervalo' segundos.
+    Si ya estaba en marcha no hace nada.
+    """
+    global _hilo_programado
+    if _hilo_programado and _hilo_programado.is_alive():
+        return
+    _detener_programado.clear()
+    _hilo_programado = threading.Thread(target=_ciclo_programado, args=(intervalo,),
+                                        name='respaldo-programado', daemon=True)
+    _hilo_programado.start()
+
+
+def detener_respaldo_programado():
+    """Detiene el hilo del respaldo programado (espera a que termine el respaldo en curso)."""
+    global _hilo_programado
+    _detener_programado.set()
+    if _hilo_programado:
+        _hilo_programado.join()
+        _hilo_programado = None
+
+
+def _percentil(valores, p):
+    """Percentil p (0-100) por el método del rango más cercano."""
+    ordenados = sorted(valores)
+    indice = max(0, min(len(ordenados) - 1, math.ceil(p / 100 * len(ordenados)) - 1))
+    return ordenados[indice]
+
+
+def medir_impacto(operaciones=2000, paginas_por_paso=PAGINAS_POR_PASO, pausa=PAUSA_ENTRE_PASOS):
+    """
+    Mide la latencia de búsquedas en primer plano (p50/p99) sin respaldo y con
+    un respaldo corriendo en paralelo, para dimensionar pasos y pausas.
+    """
+    ids = [str(fila['id']) for fila in database.obtener_todos_los_productos()] or ['1']
+
+    def medir():
+        latencias = []
+        with database.sin_cache_lecturas(): # Cada búsqueda debe llegar a la base
+            for i in range(operaciones):
+                t0 = time.perf_counter()
+                database.obtener_producto_por_id_nombre_o_categoria(ids[i % len(ids)])
+                latencias.append((time.perf_counter() - t0) * 1000)
+        return latencias
+
+    base = medir()
+    with tempfile.TemporaryDirectory() as carpeta:
+        terminado = threading.Event()
+
+        def respaldar_en_bucle():
+            while not terminado.is_set():
+                crear_respaldo(carpeta, paginas_por_paso, pausa, conservar=1, mostrar=False)
+
+        hilo = threading.Thread(target=respaldar_en_bucle, daemon=True)
+        hilo.start()
+        con_respaldo = medir()
+        terminado.set()
+        hilo.join()
+
+    print(Fore.CYAN + "\n--- Impacto del respaldo en la latencia de primer plano ---" + Style.RESET_ALL)
+    print(f"  Páginas por paso: {paginas_por_paso}  |  pausa: {pausa * 1000:.1f} ms  |  operaciones: {operaciones}")
+    for titulo, valores in (("Sin respaldo", base), ("Con respaldo", con_respaldo)):
+        print(f"  {titulo:<13} p50: {statistics.median(valores):7.3f} ms   p99: {_percentil(valores, 99):7.3f} ms")
+    return base, con_respaldo
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Respaldos en caliente de la base de datos de inventario.")
+    parser.add_argument('--verificar', action='store_true', help="Verifica la integridad de todos los respaldos existentes")
+    parser.add_argument('--programar', type=int, metavar='SEGUNDOS', help="Crea un respaldo cada SEGUNDOS hasta Ctrl+C")
+    parser.add_argument('--medir', action='store_true', help="Mide el impacto del respaldo sobre la latencia p99")
+    parser.add_argument('--paginas', type=int, default=PAGINAS_POR_PASO, help="Páginas copiadas por paso")
+    parser.add_argument('--pausa', type=float, default=PAUSA_ENTRE_PASOS, help="Pausa entre pasos en segundos")
+    args = parser.parse_args()
+
+    if args.verificar:
+        for ruta in listar_respaldos():
+            verificar_respaldo(ruta)
+    elif args.medir:
+        medir_impacto(paginas_por_paso=args.paginas, pausa=args.pausa)
+    elif args.programar:
+        iniciar_respaldo_programado(args.programar)
+        print(Fore.CYAN + f"⏱️ Respaldo programado cada {args.programar} s. Ctrl+C para detener." + Style.RESET_ALL)
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            detener_respaldo_programado()
+    else:
+        crear_respaldo(paginas_por_paso=args.paginas, pausa=args.pausa)
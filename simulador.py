@@ -0,0 +1,212 @@
+"""
+Este módulo simula la carga de varias terminales trabajando a la vez sobre la misma
+base: cada terminal es un proceso que ejecuta, a una tasa objetivo, una mezcla de
+operaciones de database.py según su perfil (cajero o administrativo). Al terminar
+informa por operación la latencia p50/p99, la tasa de errores (por ejemplo, base
+bloqueada) y el rendimiento a lo largo del tiempo, y compara las configuraciones
+de base de datos simuladas. Trabaja sobre una base temporal, nunca sobre 'inventario.db'.
+Uso: python simulador.py --cajeros 20 --administrativos 3 --duracion 30
+"""
+import argparse
+import contextlib
+import multiprocessing
+import os
+import random
+import sqlite3
+import time
+
+from colorama import Fore, Style, init
+
+import database
+import rendimiento
+
+# Inicializar colorama para mensajes de consola
+init(autoreset=True)
+
+# Mezcla de operaciones (peso relativo) de cada perfil de terminal
+PERFILES = {
+    'cajero': {'buscar': 60, 'actualizar': 25, 'stock_bajo': 10, 'login': 5},
+    'administrativo': {'listar': 15, 'stock_bajo': 20, 'agregar': 30, 'actualizar': 20, 'eliminar': 10, 'login': 5},
+}
+# Configuraciones de base de datos que se pueden comparar
+CONFIGURACIONES = {
+    'wal': {'journal_mode': 'WAL', 'espera_ocupada': database.ESPERA_OCUPADA, 'reintentos': database.REINTENTOS_ESCRITURA},
+    'wal_sin_espera': {'journal_mode': 'WAL', 'espera_ocupada': 0.0, 'reintentos': 0},
+    'rollback': {'journal_mode': 'DELETE', 'espera_ocupada': database.ESPERA_OCUPADA, 'reintentos': database.REINTENTOS_ESCRITURA},
+}
+USUARIO_PRUEBA = ('cajero', 'clave123')
+
+
+class DetectorErrores:
+    """Reemplaza la salida estándar de una terminal simulada (o de una reproducción) y detecta los mensajes de error ('❌')."""
+
+    def __init__(self):
+        self.hubo_error = False
+
+    def write(self, texto):
+        if '❌' in texto:
+            self.hubo_error = True
+        return len(texto)
+
+    def flush(self):
+        pass
+
+
+def _terminal(ruta_db, configuracion, perfil, tasa, inicio, duracion, semilla, filas):
+    """
+    Proceso de una terminal: ejecuta operaciones del perfil con llegadas aleatorias
+    (exponenciales) a 'tasa' operaciones por segundo. Retorna una lista de tuplas
+    (operación, segundo de inicio relativo, latencia, hubo error).
+    """
+    database.ARCHIVO_DB = ruta_db
+    database.ESPERA_OCUPADA = configuracion['espera_ocupada']
+    database.REINTENTOS_ESCRITURA = configuracion['reintentos']
+    aleatorio = random.Random(semilla)
+    operaciones, pesos = zip(*PERFILES[perfil].items())
+    propios = []  # Productos agregados por esta terminal (los únicos que elimina)
+
+    def ejecutar(operacion):
+        if operacion == 'buscar':
+            database.obtener_producto_por_id_nombre_o_categoria(f"Producto {aleatorio.randrange(filas)}")
+        elif operacion == 'listar':
+            database.obtener_todos_los_productos(formato='tupla')
+        elif operacion == 'stock_bajo':
+            database.obtener_productos_por_cantidad_limite(5)
+        elif operacion == 'login':
+            database.obtener_usuario(*USUARIO_PRUEBA)
+        elif operacion == 'agregar':
+            id_nuevo = database.agregar_producto(f"Alta {semilla}-{len(propios)}", "Simulación", 10, 100, "Otros")
+            if id_nuevo:
+                propios.append(id_nuevo)
+        elif operacion == 'actualizar':
+            id_producto = aleatorio.randrange(filas) + 1
+            database.actualizar_producto(id_producto, f"Producto {id_producto - 1}", "Vendido",
+                                         aleatorio.randrange(500), 100, "Otros")
+        elif operacion == 'eliminar':
+            if propios:
+                database.eliminar_producto(propios.pop())
+            else:
+                ejecutar('agregar')
+
+    registros = []
+    detector = DetectorErrores()
+    siguiente = inicio
+    with contextlib.redirect_stdout(detector):
+        while True:
+            siguiente += aleatorio.expovariate(tasa)
+            if siguiente >= inicio + duracion:
+                break
+            pausa = siguiente - time.time()
+            if pausa > 0:
+                time.sleep(pausa)
+            operacion = aleatorio.choices(operaciones, pesos)[0]
+            detector.hubo_error = False
+            t0 = time.perf_counter()
+            try:
+                ejecutar(operacion)
+            except sqlite3.Error:
+                detector.hubo_error = True
+            registros.append((operacion, time.time() - inicio, time.perf_counter() - t0, detector.hubo_error))
+    database.cerrar_pool_lectura()
+    return registros
+
+
+def _percentil(valores_ordenados, p):
+    if not valores_ordenados:
+        return 0.0
+    return valores_ordenados[min(len(valores_ordenados) - 1, int(len(valores_ordenados) * p / 100))]
+
+
+def simular(cajeros=20, administrativos=3, duracion=30.0, tasa_cajero=2.0, tasa_administrativo=1.0,
+            filas=5000, configuracion='wal', intervalo=5.0, mostrar=True):
+    """
+    Ejecuta una simulación con una configuración de CONFIGURACIONES sobre una base
+    temporal de 'filas' productos. Retorna un diccionario con las métricas por
+    operación, el rendimiento por intervalo y el total.
+    """
+    ajustes = CONFIGURACIONES[configuracion]
+    with rendimiento.base_temporal(filas) as ruta_db:
+        conn = database.conectar_db()
+        conn.execute(f"PRAGMA journal_mode = {ajustes['journal_mode']}")
+        conn.execute("INSERT INTO usuarios (nombre_usuario, contrasena) VALUES (?, ?)",
+                     (USUARIO_PRUEBA[0], database.hash_contrasena(USUARIO_PRUEBA[1])))
+        conn.commit()
+        conn.close()
+
+        terminales = [('cajero', tasa_cajero)] * cajeros + [('administrativo', tasa_administrativo)] * administrativos
+        inicio = time.time() + 1.0 + 0.05 * len(terminales)  # Margen para que todos los procesos arranquen
+        argumentos = [(ruta_db, ajustes, perfil, tasa, inicio, duracion, semilla, filas)
+                      for semilla, (perfil, tasa) in enumerate(terminales)]
+        with multiprocessing.Pool(len(terminales)) as pool:
+            registros = [registro for resultado in pool.starmap(_terminal, argumentos) for registro in resultado]
+
+    por_operacion = {}
+    for operacion, _, latencia, error in registros:
+        datos = por_operacion.setdefault(operacion, {'latencias': [], 'errores': 0})
+        datos['latencias'].append(latencia)
+        datos['errores'] += error
+    metricas = {}
+    for operacion, datos in sorted(por_operacion.items()):
+        latencias = sorted(datos['latencias'])
+        metricas[operacion] = {'cantidad': len(latencias), 'errores': datos['errores'],
+                               'p50': _percentil(latencias, 50), 'p99': _percentil(latencias, 99)}
+    tramos = [0] * max(1, int(duracion // intervalo + (duracion % intervalo > 0)))
+    for _, segundo, _, _ in registros:
+        tramos[min(len(tramos) - 1, int(segundo // intervalo))] += 1
+    total = len(registros)
+    errores = sum(r[3] for r in registros)
+    resultado = {'configuracion': configuracion, 'operaciones': metricas, 'total': total, 'errores': errores,
+                 'por_segundo': total / duracion, 'tramos': [cantidad / intervalo for cantidad in tramos],
+                 'p99': _percentil(sorted(r[2] for r in registros), 99)}
+    if mostrar:
+        mostrar_resultado(resultado, intervalo)
+    return resultado
+
+
+def mostrar_resultado(resultado, intervalo):
+    """Muestra por consola las métricas de una simulación."""
+    print(Fore.CYAN + f"\n--- Simulación con configuración '{resultado['configuracion']}' ---" + Style.RESET_ALL)
+    print(f"  {'Operación':<12}{'Cantidad':>10}{'Errores':>10}{'% error':>9}{'p50 (ms)':>11}{'p99 (ms)':>11}")
+    for operacion, datos in resultado['operaciones'].items():
+        porcentaje = datos['errores'] / datos['cantidad'] * 100
+        color = Fore.RED if datos['errores'] else ""
+        print(f"  {operacion:<12}{datos['cantidad']:>10}" + color + f"{datos['errores']:>10}{porcentaje:>8.1f}%" + Style.RESET_ALL +
+              f"{datos['p50'] * 1000:>11.1f}{datos['p99'] * 1000:>11.1f}")
+    tramos = "  ".join(f"{valor:.0f}" for valor in resultado['tramos'])
+    print(f"  Operaciones/s cada {intervalo:.0f} s: {tramos}")
+    print(f"  Total: {resultado['total']} operaciones ({resultado['por_segundo']:.1f}/s), {resultado['errores']} con error")
+
+
+def comparar(configuraciones, **parametros):
+    """Simula cada configuración y muestra un resumen comparativo."""
+    resultados = [simular(configuracion=nombre, **parametros) for nombre in configuraciones]
+    print(Fore.CYAN + "\n--- Resumen comparativo ---" + Style.RESET_ALL)
+    print(f"  {'Configuración':<16}{'Ops/s':>9}{'Errores':>10}{'% error':>9}{'p99 (ms)':>11}")
+    for resultado in resultados:
+        porcentaje = resultado['errores'] / resultado['total'] * 100 if resultado['total'] else 0.0
+        print(f"  {resultado['configuracion']:<16}{resultado['por_segundo']:>9.1f}{resultado['errores']:>10}"
+              f"{porcentaje:>8.1f}%{resultado['p99'] * 1000:>11.1f}")
+    print(f"  Núcleos disponibles: {os.cpu_count()}")
+    return resultados
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulador de carga de varias terminales sobre la base de inventario.")
+    parser.add_argument('--cajeros', type=int, default=20, help="Terminales con perfil de cajero")
+    parser.add_argument('--administrativos', type=int, default=3, help="Terminales con perfil administrativo")
+    parser.add_argument('--duracion', type=float, default=30.0, help="Segundos de simulación por configuración")
+    parser.add_argument('--tasa-cajero', type=float, default=2.0, help="Operaciones por segundo de cada cajero")
+    parser.add_argument('--tasa-administrativo', type=float, default=1.0, help="Operaciones por segundo de cada administrativo")
+    parser.add_argument('--filas', type=int, default=5000, help="Productos sintéticos en la base temporal")
+    parser.add_argument('--intervalo', type=float, default=5.0, help="Segundos por tramo del rendimiento en el tiempo")
+    parser.add_argument('--configuraciones', default=",".join(CONFIGURACIONES),
+                        help=f"Configuraciones a comparar, separadas por comas ({', '.join(CONFIGURACIONES)})")
+    args = parser.parse_args()
+
+    nombres = [nombre.strip() for nombre in args.configuraciones.split(",") if nombre.strip()]
+    desconocidas = [nombre for nombre in nombres if nombre not in CONFIGURACIONES]
+    if desconocidas:
+        parser.error(f"configuraciones desconocidas: {', '.join(desconocidas)}")
+    comparar(nombres, cajeros=args.cajeros, administrativos=args.administrativos, duracion=args.duracion,
+             tasa_cajero=args.tasa_cajero, tasa_administrativo=args.tasa_administrativo,
+             filas=args.filas, intervalo=args.intervalo)
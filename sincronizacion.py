@@ -0,0 +1,605 @@
+"""
+Este módulo sincroniza en ambos sentidos dos copias (réplicas) de la base de
+inventario, por ejemplo la de una sucursal que estuvo sin conexión y la central.
+Solo se intercambian las filas que cambiaron desde la última sincronización
+entre ese par de réplicas (su "marca de agua"), tomadas del registro de cambios
+(ver cambios.py), por lo que el tiempo depende del volumen de cambios y no del
+tamaño del catálogo. Cada réplica figura como consumidor del registro de cambios
+de la otra, así la compactación nunca borra cambios que aún no se enviaron.
+
+Caídas: SQLite no confirma de forma atómica una transacción sobre dos archivos en
+modo WAL, así que una caída durante el COMMIT puede dejar confirmada una réplica y
+la otra no. Por eso cada réplica guarda, junto con las filas que recibió, hasta qué
+cambio de la otra las recibió ('recibido:<réplica>' en 'metadatos') y qué tramo de
+su propio registro son esas filas aplicadas ('ecos_sincronizacion', no se reenvían).
+Si una de las dos no llegó a confirmar, la próxima sincronización vuelve a enviarle
+lo que le falta. El consumidor del registro de cambios avanza una sincronización
+más tarde, cuando la otra réplica ya confirmó lo recibido.
+
+Identidad de las filas: cada réplica tiene un identificador propio (tabla
+'metadatos'). Una fila creada localmente se identifica como '<réplica>:<id>';
+las filas recibidas de otra réplica guardan su identificador original en
+'uids_sincronizacion'. Las categorías se emparejan además por nombre y los
+productos por SKU (si tienen), ver CLAVES_NATURALES.
+
+Conflictos (la misma fila cambiada en ambas réplicas), resueltos por columna y
+de forma determinista según POLITICAS_COLUMNA:
+  - 'ultimo': gana el cambio con la fecha más reciente; ante un empate, la réplica
+    con el identificador mayor.
+  - 'suma': se suman los cambios de ambas réplicas al valor de la última sincronización
+    (base + cambio local + cambio remoto), así no se pierden las ventas hechas en las dos.
+    La base es el valor anterior que guarda el registro de cambios (solo para la cantidad);
+    para dos altas la base es 0. Sin una base común (cambios anotados por versiones
+    anteriores) se usa 'minimo'. El resultado nunca es negativo.
+  - 'minimo' / 'maximo': se queda el menor / mayor de los dos valores.
+Una baja siempre gana sobre una modificación.
+Si dos filas distintas reclaman la misma clave natural (el mismo SKU) y ambas son
+altas, se toman como la misma fila. Si no, la clave queda para el cambio más reciente
+(con el mismo desempate que 'ultimo') y la otra fila la pierde (NULL) en ambas réplicas.
+"""
+import argparse
+import contextlib
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import traceback
+import uuid
+
+from colorama import Fore, Style, init
+
+import database
+
+# Inicializar colorama para mensajes de consola
+init(autoreset=True)
+
+# Cambios leídos por consulta y filas buscadas por consulta IN (...)
+TAMANO_LOTE = 1000
+TAMANO_IN = 500
+# Política de conflicto por columna ('tabla.columna'); las no listadas usan 'ultimo'.
+# El stock suma los movimientos de ambas réplicas ('minimo' perdería las ventas de una).
+POLITICAS_COLUMNA = {
+    'productos.cantidad': 'suma',
+}
+POLITICAS = ('ultimo', 'suma', 'minimo', 'maximo')
+# Columna que identifica naturalmente a una fila (se empareja por valor si el identificador
+# no existe); los valores NULL no identifican a ninguna fila
+CLAVES_NATURALES = {'categorias': 'nombre', 'productos': 'sku'}
+
+
+def _preparar_replica(conn, esquema):
+    """Crea las tablas de sincronización si faltan y retorna el identificador de la réplica."""
+    tablas = {fila[0] for fila in conn.execute(f"SELECT name FROM {esquema}.sqlite_master WHERE type = 'table'")}
+    columnas = {fila[1] for fila in conn.execute(f"PRAGMA {esquema}.table_info(cambios)")}
+    if 'cambios' not in tablas or 'cantidad_anterior' not in columnas:
+        raise sqlite3.OperationalError("la base no tiene registro de cambios; ejecute la aplicación una vez para actualizarla")
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {esquema}.metadatos (clave TEXT PRIMARY KEY, valor TEXT NOT NULL)")
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {esquema}.ecos_sincronizacion (
+            replica_par TEXT NOT NULL,
+            desde INTEGER NOT NULL,
+            hasta INTEGER NOT NULL
+        )
+    ''')
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {esquema}.uids_sincronizacion (
+            tabla TEXT NOT NULL,
+            id INTEGER NOT NULL,
+            uid TEXT NOT NULL,
+            PRIMARY KEY (tabla, id),
+            UNIQUE (tabla, uid)
+        )
+    ''')
+    conn.execute(f"INSERT OR IGNORE INTO {esquema}.metadatos (clave, valor) VALUES ('replica_id', ?)", (uuid.uuid4().hex,))
+    return conn.execute(f"SELECT valor FROM {esquema}.metadatos WHERE clave = 'replica_id'").fetchone()[0]
+
+
+def _ultima_secuencia(conn, esquema):
+    return conn.execute(f"SELECT COALESCE(MAX(secuencia), 0) FROM {esquema}.cambios").fetchone()[0]
+
+
+def _posicion(conn, esquema, replica_par):
+    fila = conn.execute(f"SELECT ultima_secuencia FROM {esquema}.consumidores_cambios WHERE nombre = ?",
+                        (f"sync:{replica_par}",)).fetchone()
+    return fila[0] if fila else 0
+
+
+def _guardar_posicion(conn, esquema, replica_par, secuencia):
+    conn.execute(f'''
+        INSERT INTO {esquema}.consumidores_cambios (nombre, ultima_secuencia) VALUES (?, ?)
+        ON CONFLICT(nombre) DO UPDATE SET ultima_secuencia = excluded.ultima_secuencia
+    ''', (f"sync:{replica_par}", secuencia))
+
+
+def _recibido(conn, esquema, replica_emisora, esquema_emisor, replica_receptora):
+    """
+    Último cambio de la réplica emisora que ya confirmó la receptora ('esquema').
+    Las réplicas sincronizadas por versiones anteriores no lo tienen: se usa la
+    posición que guardó la emisora.
+    """
+    fila = conn.execute(f"SELECT valor FROM {esquema}.metadatos WHERE clave = ?", (f"recibido:{replica_emisora}",)).fetchone()
+    return int(fila[0]) if fila else _posicion(conn, esquema_emisor, replica_receptora)
+
+
+def _guardar_recibido(conn, esquema, replica_emisora, secuencia):
+    conn.execute(f"INSERT OR REPLACE INTO {esquema}.metadatos (clave, valor) VALUES (?, ?)",
+                 (f"recibido:{replica_emisora}", str(secuencia)))
+
+
+def _ecos(conn, esquema, replica_par):
+    """Tramos (desde, hasta] del registro de cambios que son filas recibidas de 'replica_par'."""
+    return conn.execute(f"SELECT desde, hasta FROM {esquema}.ecos_sincronizacion WHERE replica_par = ?",
+                        (replica_par,)).fetchall()
+
+
+def _en_tramos(valores, tamano=TAMANO_IN):
+    valores = list(valores)
+    for i in range(0, len(valores), tamano):
+        yield valores[i:i + tamano]
+
+
+def _leer_delta(conn, esquema, replica_id, desde, ecos=()):
+    """
+    Resume los cambios posteriores a 'desde' (salvo los de los tramos 'ecos', que son
+    filas recibidas de la otra réplica) por fila: columnas modificadas (con la
+    fecha del último cambio de cada una), si la fila fue borrada, si es un alta, sus
+    valores actuales y la cantidad antes del primer cambio ('anteriores', ver 'suma').
+    Retorna {(tabla, uid): {'id', 'borrado', 'alta', 'columnas', 'valores', 'anteriores'}}.
+    """
+    por_id = {}
+    ultima = desde
+    while True:
+        filas = conn.execute(f'''
+            SELECT secuencia, tabla, operacion, registro_id, columnas, fecha, cantidad_anterior FROM {esquema}.cambios
+            WHERE secuencia > ? ORDER BY secuencia LIMIT ?
+        ''', (ultima, TAMANO_LOTE)).fetchall()
+        for secuencia, tabla, operacion, registro_id, columnas, fecha, cantidad_anterior in filas:
+            if tabla not in database.COLUMNAS_CAMBIOS or any(d < secuencia <= h for d, h in ecos):
+                continue
+            entrada = por_id.setdefault((tabla, registro_id), {'id': registro_id, 'borrado': None, 'alta': False,
+                                                               'columnas': {}, 'valores': None, 'anteriores': {}})
+            entrada['alta'] = entrada['alta'] or operacion == 'I'
+            if operacion == 'U' and 'cantidad' in columnas.split(','):
+                entrada['anteriores'].setdefault('cantidad', cantidad_anterior) # El primero: valor de la última sincronización
+            if operacion == 'D':
+                entrada['borrado'] = fecha
+            else:
+                nombres = database.COLUMNAS_CAMBIOS[tabla] if operacion == 'I' else columnas.split(',')
+                for columna in nombres:
+                    entrada['columnas'][columna] = fecha
+        if len(filas) < TAMANO_LOTE:
+            break
+        ultima = filas[-1][0]
+
+    delta = {}
+    for tabla in database.COLUMNAS_CAMBIOS:
+        ids = [registro_id for (t, registro_id) in por_id if t == tabla]
+        uids, valores = {}, {}
+        columnas_sql = ", ".join(('id',) + database.COLUMNAS_CAMBIOS[tabla])
+        for tramo in _en_tramos(ids):
+            marcadores = ", ".join("?" * len(tramo))
+            uids.update(conn.execute(f"SELECT id, uid FROM {esquema}.uids_sincronizacion WHERE tabla = ? AND id IN ({marcadores})",
+                                     [tabla] + tramo).fetchall())
+            for fila in conn.execute(f"SELECT {columnas_sql} FROM {esquema}.{tabla} WHERE id IN ({marcadores})", tramo):
+                valores[fila[0]] = dict(zip(database.COLUMNAS_CAMBIOS[tabla], fila[1:]))
+        for registro_id in ids:
+            entrada = por_id[(tabla, registro_id)]
+            entrada['valores'] = valores.get(registro_id)
+            if entrada['valores'] is None and not entrada['borrado']:
+                entrada['borrado'] = max(entrada['columnas'].values(), default='')  # Alta y baja sin registro intermedio
+            delta[(tabla, uids.get(registro_id, f"{replica_id}:{registro_id}"))] = entrada
+    return delta
+
+
+def _id_local(conn, esquema, replica_id, tabla, uid, valores=None):
+    """Busca el ID local de una fila por su identificador global (o por su clave natural)."""
+    fila = conn.execute(f"SELECT id FROM {esquema}.uids_sincronizacion WHERE tabla = ? AND uid = ?", (tabla, uid)).fetchone()
+    if fila:
+        return fila[0]
+    prefijo = f"{replica_id}:"
+    if uid.startswith(prefijo):
+        fila = conn.execute(f"SELECT id FROM {esquema}.{tabla} WHERE id = ?", (int(uid[len(prefijo):]),)).fetchone()
+        return fila[0] if fila else None
+    clave = CLAVES_NATURALES.get(tabla)
+    if clave and valores and valores[clave] is not None:
+        fila = conn.execute(f"SELECT id FROM {esquema}.{tabla} WHERE {clave} = ?", (valores[clave],)).fetchone()
+        if fila:
+            conn.execute(f"INSERT OR REPLACE INTO {esquema}.uids_sincronizacion (tabla, id, uid) VALUES (?, ?, ?)", (tabla, fila[0], uid))
+            return fila[0]
+    return None
+
+
+def _conciliar_claves_naturales(conn, delta_local, delta_remoto, id_local, id_remota):
+    """
+    Evita que la sincronización asigne la misma clave natural a dos filas distintas
+    (violaría el índice único, por ejemplo el del SKU). Dos altas con la misma clave
+    son la misma fila: la remota pasa a usar el identificador de la local. En otro caso
+    la clave queda para el cambio más reciente y la otra fila la pierde en ambas réplicas.
+    Retorna (modificaciones previas para la réplica local, para la remota, conflictos).
+    """
+    previas_local, previas_remota, conflictos = [], [], 0
+    for tabla, clave in CLAVES_NATURALES.items():
+        locales = {entrada['valores'][clave]: uid for (t, uid), entrada in delta_local.items()
+                   if t == tabla and entrada['valores'] and entrada['valores'][clave] is not None}
+        for (t, uid_remoto), remoto in list(delta_remoto.items()):
+            if t != tabla or not remoto['valores'] or remoto['valores'][clave] is None:
+                continue
+            uid_local = locales.get(remoto['valores'][clave])
+            if uid_local is None or uid_local == uid_remoto:
+                continue
+            local = delta_local[(tabla, uid_local)]
+            if (local['alta'] and remoto['alta'] and (tabla, uid_local) not in delta_remoto
+                    and (tabla, uid_remoto) not in delta_local):
+                # La misma fila creada en ambas réplicas: se concilia columna por columna
+                del delta_remoto[(tabla, uid_remoto)]
+                delta_remoto[(tabla, uid_local)] = remoto
+                conn.execute("INSERT OR REPLACE INTO remota.uids_sincronizacion (tabla, id, uid) VALUES (?, ?, ?)",
+                             (tabla, remoto['id'], uid_local))
+                continue
+            conflictos += 1
+            gana_local = (local['columnas'].get(clave, ''), id_local) > (remoto['columnas'].get(clave, ''), id_remota)
+            uid_perdedor, previas = (uid_remoto, previas_remota) if gana_local else (uid_local, previas_local)
+            for delta in (delta_local, delta_remoto):
+                perdedor = delta.get((tabla, uid_perdedor))
+                if perdedor and perdedor['valores']:
+                    perdedor['valores'][clave] = None
+                    perdedor['columnas'][clave] = max(local['columnas'].get(clave, ''), remoto['columnas'].get(clave, ''))
+            previas.append(('modificacion', tabla, uid_perdedor, {clave: None}))
+    return previas_local, previas_remota, conflictos
+
+
+def _resolver(tabla, columna, local, remoto, replica_local, replica_remota):
+    """Elige el valor ganador de una columna modificada en ambas réplicas."""
+    politica = POLITICAS_COLUMNA.get(f"{tabla}.{columna}", 'ultimo')
+    valor_local, valor_remoto = local['valores'][columna], remoto['valores'][columna]
+    if politica == 'suma':
+        bases = {0} if local['alta'] and remoto['alta'] else {local['anteriores'].get(columna), remoto['anteriores'].get(columna)}
+        if len(bases) == 1 and None not in bases:
+            base = bases.pop()
+            return max(0, base + (valor_local - base) + (valor_remoto - base))
+        politica = 'minimo' # Sin una base común (cambios anotados por versiones anteriores)
+    if politica == 'minimo':
+        return min(valor_local, valor_remoto)
+    if politica == 'maximo':
+        return max(valor_local, valor_remoto)
+    clave_local = (local['columnas'][columna], replica_local)
+    clave_remota = (remoto['columnas'][columna], replica_remota)
+    return valor_local if clave_local > clave_remota else valor_remoto
+
+
+def _aplicar(conn, esquema, replica_id, operaciones, contador):
+    """Aplica en una réplica las altas, modificaciones y bajas decididas."""
+    for operacion, tabla, uid, datos in operaciones:
+        id_local = _id_local(conn, esquema, replica_id, tabla, uid, datos if operacion == 'upsert' else None)
+        if operacion == 'baja':
+            if id_local is not None:
+                conn.execute(f"DELETE FROM {esquema}.{tabla} WHERE id = ?", (id_local,))
+                contador['bajas'] += 1
+        elif id_local is not None:
+            asignaciones = ", ".join(f"{columna} = ?" for columna in datos)
+            conn.execute(f"UPDATE {esquema}.{tabla} SET {asignaciones} WHERE id = ?", list(datos.values()) + [id_local])
+            contador['modificaciones'] += 1
+        elif operacion == 'upsert':
+            columnas = ", ".join(datos)
+            cursor = conn.execute(f"INSERT INTO {esquema}.{tabla} ({columnas}) VALUES ({', '.join('?' * len(datos))})",
+                                  list(datos.values()))
+            conn.execute(f"INSERT OR REPLACE INTO {esquema}.uids_sincronizacion (tabla, id, uid) VALUES (?, ?, ?)",
+                         (tabla, cursor.lastrowid, uid))
+            contador['altas'] += 1
+
+
+def sincronizar(ruta_local, ruta_remota):
+    """
+    Sincroniza en ambos sentidos dos réplicas de la base (rutas locales) dentro de
+    una transacción sobre ambos archivos. Ante una caída durante el COMMIT puede quedar
+    confirmada solo una de las dos; la próxima sincronización completa la otra (ver el
+    comentario del módulo). Retorna un diccionario con las filas enviadas, recibidas
+    y los conflictos resueltos, o None si hubo un error.
+    """
+    t_inicio = time.perf_counter()
+    conn = sqlite3.connect(ruta_local, timeout=database.ESPERA_OCUPADA, isolation_level=None)
+    enviados = {'altas': 0, 'modificaciones': 0, 'bajas': 0}
+    recibidos = {'altas': 0, 'modificaciones': 0, 'bajas': 0}
+    conflictos = 0
+    try:
+        conn.execute("ATTACH DATABASE ? AS remota", (ruta_remota,))
+        database.iniciar_escritura(conn)  # Bloquea ambas réplicas para escritura durante la sincronización
+        id_local = _preparar_replica(conn, 'main')
+        id_remota = _preparar_replica(conn, 'remota')
+        if id_local == id_remota:
+            raise sqlite3.OperationalError("ambas bases tienen el mismo identificador de réplica; use 'crear-replica' para copiar una base")
+
+        # Cada réplica envía lo que la otra todavía no confirmó, sin las filas que recibió de ella
+        desde_local = _recibido(conn, 'remota', id_local, 'main', id_remota)
+        desde_remoto = _recibido(conn, 'main', id_remota, 'remota', id_local)
+        fin_local, fin_remoto = _ultima_secuencia(conn, 'main'), _ultima_secuencia(conn, 'remota')
+        delta_local = _leer_delta(conn, 'main', id_local, desde_local, _ecos(conn, 'main', id_remota))
+        delta_remoto = _leer_delta(conn, 'remota', id_remota, desde_remoto, _ecos(conn, 'remota', id_local))
+
+        # Las filas que pierden su clave natural la liberan antes de aplicar el resto
+        para_local, para_remota, conflictos = _conciliar_claves_naturales(conn, delta_local, delta_remoto, id_local, id_remota)
+        for clave in delta_local.keys() | delta_remoto.keys():
+            tabla, uid = clave
+            local, remoto = delta_local.get(clave), delta_remoto.get(clave)
+            if local and remoto:
+                if local['borrado'] or remoto['borrado']:
+                    conflictos += bool(local['columnas'] or remoto['columnas'])
+                    if not local['borrado']:
+                        para_local.append(('baja', tabla, uid, None))
+                    if not remoto['borrado']:
+                        para_remota.append(('baja', tabla, uid, None))
+                    continue
+                cambios_local, cambios_remota = {}, {}
+                for columna in local['columnas'].keys() | remoto['columnas'].keys():
+                    if columna in local['columnas'] and columna in remoto['columnas']:
+                        # Con 'suma', dos cambios que dejan el mismo valor igual se suman
+                        if (local['valores'][columna] == remoto['valores'][columna]
+                                and POLITICAS_COLUMNA.get(f"{tabla}.{columna}") != 'suma'):
+                            continue
+                        conflictos += 1
+                        valor = _resolver(tabla, columna, local, remoto, id_local, id_remota)
+                    elif columna in local['columnas']:
+                        valor = local['valores'][columna]
+                    else:
+                        valor = remoto['valores'][columna]
+                    if valor != local['valores'][columna]:
+                        cambios_local[columna] = valor
+                    if valor != remoto['valores'][columna]:
+                        cambios_remota[columna] = valor
+                if cambios_local:
+                    para_local.append(('modificacion', tabla, uid, cambios_local))
+                if cambios_remota:
+                    para_remota.append(('modificacion', tabla, uid, cambios_remota))
+            else:
+                origen, destino = (local, para_remota) if local else (remoto, para_local)
+                if origen['borrado']:
+                    destino.append(('baja', tabla, uid, None))
+                else:
+                    # Si el destino no tiene la fila se inserta completa, si la tiene se actualizan las columnas cambiadas
+                    destino.append(('upsert', tabla, uid, origen['valores']))
+
+        _aplicar(conn, 'remota', id_remota, para_remota, enviados)
+        _aplicar(conn, 'main', id_local, para_local, recibidos)
+
+        # Cada dato de sincronización se guarda en el mismo archivo que las filas que describe,
+        # así sigue siendo correcto aunque solo uno de los dos archivos llegue a confirmar:
+        # hasta dónde se recibió de la otra réplica (cambios anteriores a esta sincronización,
+        # ya confirmados en ella) y qué tramo del registro propio son las filas aplicadas.
+        for esquema, replica_par, fin in (('remota', id_local, fin_remoto), ('main', id_remota, fin_local)):
+            ultima = _ultima_secuencia(conn, esquema)
+            if ultima > fin:
+                conn.execute(f"INSERT INTO {esquema}.ecos_sincronizacion (replica_par, desde, hasta) VALUES (?, ?, ?)",
+                             (replica_par, fin, ultima))
+        _guardar_recibido(conn, 'remota', id_local, fin_local)
+        _guardar_recibido(conn, 'main', id_remota, fin_remoto)
+        # La compactación solo puede borrar lo que la otra réplica ya tenía confirmado al empezar
+        for esquema, replica_par, confirmado in (('main', id_remota, desde_local), ('remota', id_local, desde_remoto)):
+            _guardar_posicion(conn, esquema, replica_par, confirmado)
+            conn.execute(f"DELETE FROM {esquema}.ecos_sincronizacion WHERE replica_par = ? AND hasta <= ?",
+                         (replica_par, confirmado))
+        conn.execute("COMMIT")
+    except (sqlite3.Error, ValueError) as e:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        print(Fore.RED + f"❌ Error al sincronizar: {e} (transacción revertida)." + Style.RESET_ALL)
+        return None
+    finally:
+        conn.close()
+
+    reporte = {'enviados': enviados, 'recibidos': recibidos, 'conflictos': conflictos,
+               'segundos': time.perf_counter() - t_inicio}
+    print(Fore.GREEN + f"✅ Sincronización completada en {reporte['segundos']:.2f} s (transacción confirmada)." + Style.RESET_ALL)
+    for titulo, contador in (("Enviados", enviados), ("Recibidos", recibidos)):
+        print(f"  {titulo:<10} altas: {contador['altas']:>7}  modificaciones: {contador['modificaciones']:>7}  bajas: {contador['bajas']:>7}")
+    print(f"  Conflictos resueltos: {conflictos}")
+    return reporte
+
+
+def crear_replica(ruta_origen, ruta_destino):
+    """
+    Crea una nueva réplica copiando la base de origen (con la API de backup) y le asigna
+    un identificador propio. Ambas quedan sincronizadas entre sí desde ese momento.
+    Retorna True si la operación fue exitosa.
+    """
+    origen = sqlite3.connect(ruta_origen, timeout=database.ESPERA_OCUPADA, isolation_level=None)
+    destino = sqlite3.connect(ruta_destino, timeout=database.ESPERA_OCUPADA, isolation_level=None)
+    try:
+        database.iniciar_escritura(origen)
+        id_origen = _preparar_replica(origen, 'main')
+        id_destino = uuid.uuid4().hex
+        # Las marcas de agua se guardan antes de copiar: lo que cambie durante la copia se reenvía (sin efecto si ya estaba)
+        _guardar_posicion(origen, 'main', id_destino, _ultima_secuencia(origen, 'main'))
+        _guardar_recibido(origen, 'main', id_destino, _ultima_secuencia(origen, 'main'))
+        origen.execute("COMMIT")
+        origen.backup(destino)
+
+        database.iniciar_escritura(destino)
+        destino.execute("UPDATE metadatos SET valor = ? WHERE clave = 'replica_id'", (id_destino,))
+        destino.execute("DELETE FROM consumidores_cambios WHERE nombre LIKE 'sync:%'")
+        destino.execute("DELETE FROM metadatos WHERE clave LIKE 'recibido:%'")
+        destino.execute("DELETE FROM ecos_sincronizacion")
+        for tabla in database.COLUMNAS_CAMBIOS:
+            # Las filas creadas en el origen conservan su identificador global '<origen>:<id>'
+            destino.execute(f'''
+                INSERT OR IGNORE INTO uids_sincronizacion (tabla, id, uid)
+                SELECT ?, id, ? || ':' || id FROM {tabla}
+            ''', (tabla, id_origen))
+        _guardar_posicion(destino, 'main', id_origen, _ultima_secuencia(destino, 'main'))
+        _guardar_recibido(destino, 'main', id_origen, _ultima_secuencia(destino, 'main'))
+        destino.execute("COMMIT")
+    except sqlite3.Error as e:
+        for conn in (origen, destino):
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+        print(Fore.RED + f"❌ Error al crear la réplica: {e}" + Style.RESET_ALL)
+        return False
+    finally:
+        origen.close()
+        destino.close()
+    print(Fore.GREEN + f"✅ Réplica '{ruta_destino}' creada a partir de '{ruta_origen}'." + Style.RESET_ALL)
+    return True
+
+
+# Casos de 'python sincronizacion.py verificar', en el orden en que se ejecutan (ver @caso)
+CASOS = []
+
+
+def caso(funcion):
+    """Registra una función (que recibe las rutas de dos réplicas) como caso de la verificación."""
+    CASOS.append(funcion)
+    return funcion
+
+
+@contextlib.contextmanager
+def _par_de_replicas():
+    """Crea dos réplicas temporales sincronizadas con un producto ('Yerba', stock 10); retorna sus rutas."""
+    archivo_original = database.ARCHIVO_DB
+    with tempfile.TemporaryDirectory() as directorio:
+        local, remota = os.path.join(directorio, 'local.db'), os.path.join(directorio, 'remota.db')
+        database.ARCHIVO_DB = local
+        try:
+            database.crear_tablas()
+            database.agregar_producto("Yerba", "1 kg", 10, 2500, "Otros")
+        finally:
+            database.cerrar_pool_lectura()
+            database.ARCHIVO_DB = archivo_original
+        assert crear_replica(local, remota), "no se pudo crear la réplica"
+        yield local, remota
+
+
+def _ejecutar(ruta, sql, parametros=()):
+    conn = sqlite3.connect(ruta)
+    try:
+        conn.execute(sql, parametros)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _productos(ruta):
+    conn = sqlite3.connect(ruta)
+    try:
+        return conn.execute("SELECT nombre, descripcion, cantidad, precio, categoria, sku FROM productos ORDER BY nombre").fetchall()
+    finally:
+        conn.close()
+
+
+def _copiar(origen, destino):
+    """Copia una base (con la API de backup, incluye lo que está en el WAL)."""
+    conn_origen, conn_destino = sqlite3.connect(origen), sqlite3.connect(destino)
+    try:
+        conn_origen.backup(conn_destino)
+    finally:
+        conn_origen.close()
+        conn_destino.close()
+
+
+def _sincronizar_con_commit_perdido(local, remota, perdida):
+    """Sincroniza y deja la réplica 'perdida' como antes, como si su COMMIT no hubiera llegado al disco."""
+    copia = perdida + '.antes'
+    _copiar(perdida, copia)
+    assert sincronizar(local, remota) is not None, "la sincronización falló"
+    _copiar(copia, perdida)
+
+
+def _sincronizar_y_comparar(local, remota):
+    """Sincroniza dos veces (la segunda no debe fallar) y retorna los productos, que deben coincidir."""
+    assert sincronizar(local, remota) is not None, "la sincronización falló"
+    assert sincronizar(local, remota) is not None, "la segunda sincronización falló"
+    productos = _productos(local)
+    assert productos == _productos(remota), f"las réplicas no coinciden: {productos} / {_productos(remota)}"
+    return productos
+
+
+@caso
+def mismo_sku_en_altas_de_ambas_replicas(local, remota):
+    alta = "INSERT INTO productos (nombre, descripcion, cantidad, precio, categoria, sku) VALUES (?, ?, ?, ?, ?, ?)"
+    _ejecutar(local, alta, ("Mate", "Calabaza", 4, 1500, "Otros", "SKU1"))
+    _ejecutar(remota, alta, ("Mate", "Calabaza", 3, 1500, "Otros", "SKU1"))
+    productos = _sincronizar_y_comparar(local, remota)
+    assert [fila[0] for fila in productos] == ["Mate", "Yerba"], f"las altas no se emparejaron por SKU: {productos}"
+
+
+@caso
+def mismo_sku_en_productos_distintos(local, remota):
+    _ejecutar(local, "UPDATE productos SET sku = 'SKU2' WHERE nombre = 'Yerba'")
+    time.sleep(0.01) # El cambio remoto es el más reciente: se queda con el SKU
+    _ejecutar(remota, "INSERT INTO productos (nombre, descripcion, cantidad, precio, categoria, sku) VALUES ('Café', '500 g', 6, 3000, 'Otros', 'SKU2')")
+    productos = _sincronizar_y_comparar(local, remota)
+    assert [(fila[0], fila[5]) for fila in productos] == [("Café", "SKU2"), ("Yerba", None)], f"SKU repetido: {productos}"
+
+
+@caso
+def ventas_en_ambas_replicas(local, remota):
+    _ejecutar(local, "UPDATE productos SET cantidad = cantidad - 3 WHERE nombre = 'Yerba'")
+    _ejecutar(local, "UPDATE productos SET cantidad = cantidad + 1 WHERE nombre = 'Yerba'") # Devolución
+    _ejecutar(remota, "UPDATE productos SET cantidad = cantidad - 2 WHERE nombre = 'Yerba'")
+    productos = _sincronizar_y_comparar(local, remota)
+    assert productos[0][2] == 6, f"se perdieron ventas: stock {productos[0][2]} en lugar de 6 (10 - 3 + 1 - 2)"
+    _ejecutar(remota, "UPDATE productos SET cantidad = cantidad - 1 WHERE nombre = 'Yerba'")
+    assert _sincronizar_y_comparar(local, remota)[0][2] == 5, "una venta posterior no se sincronizó"
+
+
+@caso
+def commit_perdido_en_la_remota(local, remota):
+    _ejecutar(local, "UPDATE productos SET cantidad = cantidad - 3 WHERE nombre = 'Yerba'")
+    _ejecutar(remota, "INSERT INTO productos (nombre, descripcion, cantidad, precio, categoria) VALUES ('Café', '500 g', 6, 3000, 'Otros')")
+    _sincronizar_con_commit_perdido(local, remota, remota)
+    productos = _sincronizar_y_comparar(local, remota)
+    assert [(fila[0], fila[2]) for fila in productos] == [("Café", 6), ("Yerba", 7)], f"se perdió un cambio: {productos}"
+
+
+@caso
+def commit_perdido_en_la_local(local, remota):
+    _ejecutar(local, "UPDATE productos SET cantidad = cantidad - 3 WHERE nombre = 'Yerba'")
+    _ejecutar(remota, "INSERT INTO productos (nombre, descripcion, cantidad, precio, categoria) VALUES ('Café', '500 g', 6, 3000, 'Otros')")
+    _sincronizar_con_commit_perdido(local, remota, local)
+    _ejecutar(local, "UPDATE productos SET precio = 2700 WHERE nombre = 'Yerba'") # Reusa la secuencia perdida
+    productos = _sincronizar_y_comparar(local, remota)
+    assert [(fila[0], fila[2], fila[3]) for fila in productos] == [("Café", 6, 3000), ("Yerba", 7, 2700)], \
+        f"se perdió un cambio: {productos}"
+
+
+def verificar(detallado=False):
+    """
+    Ejecuta todos los casos, cada uno con un par de réplicas nuevo.
+    Retorna la lista de (caso, detalle del error) de los casos que fallaron.
+    """
+    fallidos = []
+    for funcion in CASOS:
+        try:
+            with contextlib.redirect_stdout(open(os.devnull, 'w', encoding='utf-8')):
+                with _par_de_replicas() as (local, remota):
+                    funcion(local, remota)
+        except Exception as e:
+            fallidos.append((funcion.__name__, traceback.format_exc() if detallado else f"{type(e).__name__}: {e}"))
+    return fallidos
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sincronización incremental entre réplicas de inventario.db.")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+    p = subparsers.add_parser('sincronizar', help="Sincroniza dos réplicas en ambos sentidos")
+    p.add_argument('local')
+    p.add_argument('remota')
+    p = subparsers.add_parser('crear-replica', help="Copia una base como nueva réplica")
+    p.add_argument('origen')
+    p.add_argument('destino')
+    p = subparsers.add_parser('verificar', help="Verifica la sincronización con réplicas temporales")
+    p.add_argument('--detallado', action='store_true', help="Muestra la traza completa de cada fallo")
+    args = parser.parse_args()
+
+    if args.comando == 'sincronizar':
+        sincronizar(args.local, args.remota)
+    elif args.comando == 'crear-replica':
+        crear_replica(args.origen, args.destino)
+    else:
+        fallidos = verificar(args.detallado)
+        if fallidos:
+            print(Fore.RED + f"❌ {len(fallidos)} de {len(CASOS)} caso(s) fallaron." + Style.RESET_ALL)
+            for nombre, detalle in fallidos:
+                print(Fore.RED + f"   - {nombre}: {detalle}" + Style.RESET_ALL)
+        else:
+            print(Fore.GREEN + f"✅ {len(CASOS)} caso(s) correctos." + Style.RESET_ALL)
+        sys.exit(1 if fallidos else 0)
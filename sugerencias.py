@@ -0,0 +1,193 @@
+"""
+Este módulo mantiene en memoria un índice ordenado de prefijos sobre los nombres
+de producto y las categorías, para sugerir productos mientras se escribe sin
+consultar la base de datos (la búsqueda normal usa LIKE y recorre la tabla).
+El índice se construye una vez al iniciar la aplicación leyendo la tabla con un
+cursor (sin cargarla entera en una lista) y se actualiza después de cada alta,
+modificación o baja hecha con las funciones de database.py.
+Los nombres se normalizan (minúsculas, sin tildes y con espacios simples) y se
+buscan con bisect: cada consulta cuesta O(log n + resultados).
+"""
+import array
+import bisect
+import sqlite3
+import threading
+import unicodedata
+
+from colorama import Fore, Style, init
+
+import database
+
+# Inicializar colorama para mensajes de consola
+init(autoreset=True)
+
+# Sugerencias que se devuelven por defecto
+LIMITE_SUGERENCIAS = 10
+# Filas leídas por lote al construir el índice
+TAMANO_LOTE = 5000
+
+
+def normalizar(texto):
+    """Pasa el texto a minúsculas, quita las tildes y deja un solo espacio entre palabras."""
+    if texto.isascii(): # Caso más común y mucho más rápido: no hay tildes que quitar
+        return " ".join(texto.lower().split())
+    descompuesto = unicodedata.normalize('NFKD', texto.casefold())
+    sin_tildes = "".join(c for c in descompuesto if not unicodedata.combining(c))
+    return " ".join(sin_tildes.split())
+
+
+class IndicePrefijos:
+    """
+    Índice de prefijos en arreglos ordenados paralelos: claves normalizadas (lista),
+    IDs de producto (array de enteros de 64 bits) y nombres originales (lista; si el
+    nombre ya está normalizado se guarda el mismo objeto, sin costo extra).
+    Las categorías son pocas y se guardan aparte con la cantidad de productos de cada una.
+    """
+
+    def __init__(self):
+        self._claves = []
+        self._ids = array.array('q')
+        self._nombres = []
+        self._categorias = {}  # clave normalizada -> [nombre original, cantidad de productos]
+        self._bloqueo = threading.Lock()
+
+    def __len__(self):
+        return len(self._claves)
+
+    def construir(self, filas):
+        """Reemplaza el contenido del índice con las filas (id, nombre, categoria) recibidas."""
+        entradas = []
+        categorias = {}
+        for id_producto, nombre, categoria in filas:
+            clave = normalizar(nombre)
+            entradas.append((clave, id_producto, clave if clave == nombre else nombre))
+            self._sumar_categoria(categorias, categoria, 1)
+        entradas.sort()
+        with self._bloqueo:
+            self._claves = [entrada[0] for entrada in entradas]
+            self._ids = array.array('q', (entrada[1] for entrada in entradas))
+            self._nombres = [entrada[2] for entrada in entradas]
+            self._categorias = categorias
+
+    @staticmethod
+    def _sumar_categoria(categorias, categoria, delta):
+        if not categoria:
+            return
+        clave = normalizar(categoria)
+        datos = categorias.setdefault(clave, [categoria, 0])
+        datos[1] += delta
+        if datos[1] <= 0:
+            del categorias[clave]
+
+    def agregar(self, id_producto, nombre, categoria):
+        """Inserta un producto manteniendo el orden."""
+        clave = normalizar(nombre)
+        with self._bloqueo:
+            posicion = bisect.bisect_right(self._claves, clave)
+            self._claves.insert(posicion, clave)
+            self._ids.insert(posicion, id_producto)
+            self._nombres.insert(posicion, clave if clave == nombre else nombre)
+            self._sumar_categoria(self._categorias, categoria, 1)
+
+    def quitar(self, id_producto, nombre, categoria):
+        """Quita un producto. Retorna True si estaba en el índice."""
+        clave = normalizar(nombre)
+        with self._bloqueo:
+            posicion = bisect.bisect_left(self._claves, clave)
+            while posicion < len(self._claves) and self._claves[posicion] == clave:
+                if self._ids[posicion] == id_producto:
+                    del self._claves[posicion]
+                    del self._ids[posicion]
+                    del self._nombres[posicion]
+                    self._sumar_categoria(self._categorias, categoria, -1)
+                    return True
+                posicion += 1
+        return False
+
+    def actualizar(self, id_producto, anterior, nuevo):
+        """
+        Aplica un cambio de producto: 'anterior' y 'nuevo' son (nombre, categoria) o None.
+        Tiene la firma de los observadores de database.registrar_observador_productos.
+        """
+        if anterior == nuevo:
+            return
+        if anterior:
+            self.quitar(id_producto, *anterior)
+        if nuevo:
+            self.agregar(id_producto, *nuevo)
+
+    def sugerir(self, prefijo, limite=LIMITE_SUGERENCIAS):
+        """
+        Retorna hasta 'limite' productos cuyo nombre empieza con 'prefijo' (ignorando
+        mayúsculas y tildes), en orden alfabético, como lista de tuplas (id, nombre).
+        """
+        clave = normalizar(prefijo)
+        if not clave:
+            return []
+        with self._bloqueo:
+            posicion = bisect.bisect_left(self._claves, clave)
+            resultado = []
+            while posicion < len(self._claves) and len(resultado) < limite and self._claves[posicion].startswith(clave):
+                resultado.append((self._ids[posicion], self._nombres[posicion]))
+                posicion += 1
+            return resultado
+
+    def sugerir_categorias(self, prefijo):
+        """Retorna las categorías que empiezan con 'prefijo' como lista de (nombre, cantidad de productos)."""
+        clave = normalizar(prefijo)
+        with self._bloqueo:
+            return sorted(tuple(datos) for c, datos in self._categorias.items() if c.startswith(clave))
+
+
+# Índice compartido por la aplicación (None hasta llamar a iniciar_indice)
+indice = None
+
+
+def _leer_productos(cursor):
+    """Recorre la tabla de productos en lotes, sin materializarla completa."""
+    cursor.execute("SELECT id, nombre, categoria FROM productos")
+    while True:
+        lote = cursor.fetchmany(TAMANO_LOTE)
+        if not lote:
+            return
+        yield from lote
+
+
+def iniciar_indice():
+    """
+    Construye el índice compartido con los productos actuales y lo registra como
+    observador de database.py para mantenerlo al día. Retorna el índice, o None si hubo un error.
+    """
+    global indice
+    nuevo = IndicePrefijos()
+    if database.BACKEND == 'python':
+        # Sin SQLite: los productos se leen del almacén (tuplas id, nombre, descripcion, cantidad, precio, categoria)
+        nuevo.construir((fila[0], fila[1], fila[5]) for fila in database.obtener_todos_los_productos(formato='tupla'))
+    else:
+        conn = database.tomar_conexion_lectura()
+        if conn is None:
+            return None
+        try:
+            cursor = conn.cursor()
+            cursor.row_factory = None  # Tuplas simples: más rápidas de construir
+            nuevo.construir(_leer_productos(cursor))
+        except sqlite3.Error as e:
+            print(Fore.RED + f"❌ Error al construir el índice de sugerencias: {e}" + Style.RESET_ALL)
+            return None
+        finally:
+            database.devolver_conexion_lectura(conn)
+    if indice is not None:
+        database.quitar_observador_productos(indice.actualizar)
+    indice = nuevo
+    database.registrar_observador_productos(indice.actualizar)
+    return indice
+
+
+def sugerir(prefijo, limite=LIMITE_SUGERENCIAS):
+    """Sugiere productos con el índice compartido (lista vacía si no se inició)."""
+    return indice.sugerir(prefijo, limite) if indice is not None else []
+
+
+def sugerir_categorias(prefijo):
+    """Sugiere categorías con el índice compartido (lista vacía si no se inició)."""
+    return indice.sugerir_categorias(prefijo) if indice is not None else []